@@ -0,0 +1,172 @@
+"""End-to-end timings of the library's hot paths against the local mock server (tests/mockserver.py).
+
+Usage: python benchmarks/bench_client.py [--latency SECONDS] [--error-rate P] [--workers N]
+                                         [--repeat N] [--upload-mb MB] [--only NAME ...]
+                                         [--http2] [--idle-timeout SECONDS]
+                                         [--record CASSETTE | --replay CASSETTE [--replay-latency SCALE]]
+
+The server runs in a subprocess, so the peak RSS reported is the client's alone. Each benchmark
+prints its throughput, latency percentiles and the process's peak RSS once it's done (peak RSS
+only ever goes up, so a jump shows which benchmark caused it).
+
+Rate limiting is off unless --rate-limit is given, since it would otherwise dominate the timings.
+
+--record saves every exchange of the run to a cassette (see gradescrape/cassette.py), and --replay
+runs the same benchmarks from one without starting the server, e.g. to time the client's own
+overhead alone (--replay-latency 0, the default) or reproduce a recorded run's pacing (1.0).
+Uploaded payloads are seeded rather than random, so a replay sends the bodies that were recorded.
+"""
+import argparse
+import datetime
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import gradescrape
+from gradescrape.transport import TransportAdapter, HTTP2Adapter
+from gradescrape.cassette import Cassette, RecordLayer, ReplayAdapter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DUE = datetime.datetime(2021, 9, 10, 23, 59)
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+
+def start_server(args):
+    cmd = [sys.executable, os.path.join(HERE, os.pardir, "tests", "mockserver.py"), "--latency", str(args.latency),
+           "--jitter", str(args.jitter), "--error-rate", str(args.error_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    return proc, proc.stdout.readline().strip()
+
+def peak_rss_mb() -> float:
+    # kilobytes on linux, bytes on macos
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def percentile(sorted_values, pct):
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def run(name, fn, n, workers):
+    """Calls fn(i) for i in range(n) on workers threads, timing each call. Calls that raise
+    (e.g. on injected errors the library doesn't retry) are counted, not timed."""
+    def timed(i):
+        t = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            return None
+        return time.perf_counter() - t
+    t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(timed, range(n)))
+    wall = time.perf_counter() - t
+    lat = sorted(r for r in results if r is not None) or [float("nan")]
+    print(f"{name:<32} {n:>6} {n / wall:>9.1f} {percentile(lat, 50) * 1000:>9.1f} {percentile(lat, 95) * 1000:>9.1f} "
+          f"{percentile(lat, 99) * 1000:>9.1f} {results.count(None):>7} {peak_rss_mb():>9.1f}", flush=True)
+
+def retrying(fn, *args, **kwargs):
+    # setup has to succeed even with --error-rate
+    for _ in range(9):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            pass
+    return fn(*args, **kwargs)
+
+def payload(rng, n) -> bytes:
+    return rng.getrandbits(8 * n).to_bytes(n, "little")
+
+def session(url, args):
+    if args.replay:
+        transport = ReplayAdapter(args.cassette, args.replay_latency)
+    else:
+        transport = HTTP2Adapter() if args.http2 else TransportAdapter(idle_timeout=args.idle_timeout)
+        if args.record:
+            # saved once at the end, rather than by every login benchmark's session
+            transport = RecordLayer(transport, args.cassette, save_on_close=False)
+    ses = gradescrape.Session(base_url=url, rate_limiter=True if args.rate_limit else None, transport=transport)
+    if args.workers > 1:
+        ses.set_pool_size(args.workers)
+    return ses
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--jitter", type=float, default=0.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--upload-mb", type=int, default=50)
+    p.add_argument("--rate-limit", action="store_true")
+    p.add_argument("--http2", action="store_true", help="use transport.HTTP2Adapter (needs httpx)")
+    p.add_argument("--idle-timeout", type=float, default=None)
+    p.add_argument("--only", nargs="*")
+    p.add_argument("--record", metavar="CASSETTE", help="record the run to this cassette file")
+    p.add_argument("--replay", metavar="CASSETTE", help="replay a recorded run instead of starting the server")
+    p.add_argument("--replay-latency", type=float, default=0.0,
+                   help="fraction of each recorded response time to wait when replaying")
+    args = p.parse_args()
+
+    if args.replay:
+        args.cassette = Cassette.load(args.replay)
+        proc, url = None, "http://replay.invalid"
+    else:
+        args.cassette = Cassette(args.record) if args.record else None
+        proc, url = start_server(args)
+    tmp = tempfile.mkdtemp(prefix="gradescrape-bench-")
+    try:
+        ses = session(url, args)
+        retrying(ses.login, "bench@example.com", "password")
+        courses = {n: ses.get_course(n) for n in (10, 100, 1000)}
+        scratch = ses.get_course(1)
+        upload = os.path.join(tmp, "upload.bin")
+        rng = random.Random(0)
+        with open(upload, "wb") as f:
+            for _ in range(args.upload_mb):
+                f.write(payload(rng, 1024 * 1024))
+        pdf = b"%PDF-1.4\n" + payload(rng, 256 * 1024)
+        prog = retrying(scratch.create_prog_assignment, "bench prog", 10, RELEASE, DUE)
+        pdf_assgn = retrying(scratch.create_pdf_assignment, "bench pdf", "bench.pdf", pdf, RELEASE, DUE)
+        n = args.repeat
+
+        def login(i):
+            session(url, args).login("bench@example.com", "password")
+        benches = [("login", login, n)]
+        for rows, c in courses.items():
+            benches.append((f"list_assignments ({rows} rows)", lambda i, c=c: c.list_assignments(refresh=True),
+                            max(5, n * 10 // rows)))
+        benches += [
+            ("get_settings (prog)", lambda i: prog.get_settings(), n),
+            ("get_settings (pdf)", lambda i: pdf_assgn.get_settings(), n),
+            ("update_settings (prog)", lambda i: prog.update_settings(**prog.get_settings()), n),
+            ("update_outline", lambda i: pdf_assgn.update_outline([{"title": f"Q{j}", "weight": 1 + (i + j) % 2} for j in range(20)]), n),
+            ("create_prog_assignment", lambda i: scratch.create_prog_assignment(f"prog {i}", 10, RELEASE, DUE), n),
+            ("create_pdf_assignment", lambda i: scratch.create_pdf_assignment(f"pdf {i}", "t.pdf", pdf, RELEASE, DUE), n),
+            (f"update_autograder_zip ({args.upload_mb} MB)", lambda i: prog.update_autograder_zip(upload), max(1, n // 10)),
+        ]
+
+        if args.replay:
+            print(f"replaying {args.cassette!r}, latency scale {args.replay_latency}, {args.workers} workers")
+        else:
+            print(f"server {url}, latency {args.latency * 1000:.0f} ms, error rate {args.error_rate}, {args.workers} workers")
+        print(f"{'benchmark':<32} {'ops':>6} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS MB':>9}")
+        for name, fn, count in benches:
+            if args.only and not any(o in name for o in args.only):
+                continue
+            run(name, fn, count, args.workers)
+        print("transport", ses.transport.stats())
+        if args.record:
+            args.cassette.save()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        for f in os.listdir(tmp):
+            os.remove(os.path.join(tmp, f))
+        os.rmdir(tmp)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Parse time and peak memory per page type and parser backend.
+
+Usage: python benchmarks/bench_parse.py [rows ...]
+
+Peak memory is what tracemalloc sees, i.e. Python-side allocations; lxml/lexbor C buffers are not counted.
+
+Pages are synthetic but shaped like Gradescope's: a csrf <meta> in the head, a big
+instructor assignments table, and an assignment /edit form.
+"""
+import sys
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from gradescrape import extract, util
+
+CID = 1234
+
+def head():
+    return ('<html><head><title>Gradescope</title><meta name="csrf-param" content="authenticity_token">'
+            '<meta name="csrf-token" content="abc123"><link rel="stylesheet" href="/app.css"></head>')
+
+def assignments_page(rows):
+    trs = "".join(
+        f'<tr><td><a href="/courses/{CID}/assignments/{i}">Assignment {i}</a></td>'
+        f'<td><a href="/courses/{CID}/assignments/{i}/review_grades">Review</a></td>'
+        f'<td>{i % 40}.0</td><td>Sep 3 2021 08:00 PM</td><td>Sep 10 2021 11:59 PM</td></tr>'
+        for i in range(rows))
+    nav = "".join(f'<li><a href="/courses/{CID}/x{i}">nav {i}</a></li>' for i in range(200))
+    return head() + f'<body><ul>{nav}</ul><table id="assignments-instructor-table">{trs}</table></body></html>'
+
+def edit_page():
+    filler = "".join(f'<div class="help"><p>Help text {i}</p><span>more</span></div>' for i in range(500))
+    return head() + '''<body>''' + filler + '''<form>
+<input name="assignment[title]" value="HW1"><input name="assignment[total_points]" value="10.0">
+<input name="assignment[release_date_string]" value="Sep 3 2021 08:00 PM">
+<input type="checkbox" name="assignment[manual_grading]" checked>
+<input type="radio" name="assignment[memory_limit]" value="768" checked>
+<select name="assignment[autograder_timeout]"><option value="300">5</option><option value="600" selected>10</option></select>
+<textarea name="assignment[ignored_files]"></textarea></form></body></html>'''
+
+def measure(fn, html, repeat=20):
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - t) / repeat, peak
+
+def full_soup(html):
+    return BeautifulSoup(html, features="lxml")
+
+def edit_settings(soup):
+    return (util.form_from_value(soup, "assignment[title]"), util.form_from_checkbox(soup, "assignment[manual_grading]"),
+            util.form_from_radio(soup, "assignment[memory_limit]"), util.form_from_select(soup, "assignment[autograder_timeout]"))
+
+def snapshot_settings(snap):
+    return (snap.value("assignment[title]"), snap.checkbox("assignment[manual_grading]"),
+            snap.radio("assignment[memory_limit]"), snap.select("assignment[autograder_timeout]"))
+
+def main(rows):
+    cases = []
+    for n in rows:
+        page = assignments_page(n)
+        cases.append((f"csrf ({n} rows)", page, {
+            "full soup": lambda h: full_soup(h).find("meta", attrs={"name": "csrf-token"})['content'],
+            **{b: (lambda h, b=b: extract.csrf_token(h, b)) for b in backends()},
+        }))
+        cases.append((f"assignments ({n} rows)", page, {
+            "full soup": lambda h: full_soup(h).find("table", id="assignments-instructor-table").find_all("a"),
+            **{b: (lambda h, b=b: extract.assignment_table(h, CID, b)) for b in backends()},
+        }))
+    cases.append(("edit form", edit_page(), {
+        "full soup": lambda h: edit_settings(full_soup(h)),
+        "form_from_*": lambda h: edit_settings(util.FormSnapshot(h)),
+        "snapshot": lambda h: snapshot_settings(util.FormSnapshot(h)),
+    }))
+
+    print(f"{'page':<24} {'method':<12} {'ms/parse':>10} {'peak KiB':>10}")
+    for name, html, fns in cases:
+        for label, fn in fns.items():
+            secs, peak = measure(fn, html)
+            print(f"{name:<24} {label:<12} {secs * 1000:>10.2f} {peak / 1024:>10.0f}")
+
+def backends():
+    ret = ["lxml", "bs4"]
+    try:
+        import selectolax
+        ret.append("selectolax")
+    except ImportError:
+        pass
+    return ret
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10, 100, 1000])
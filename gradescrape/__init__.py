@@ -1,4 +1,39 @@
-from .assignment import Assignment, AutograderAssignment, PDFAssignment
-from .session import Session
-from .course import Course
-from . import util
\ No newline at end of file
+import importlib
+import typing
+
+# The public classes are imported on first use rather than here, so that `import gradescrape`
+# (which the gradescrape command does) doesn't pull in requests, bs4 and lxml until they're needed.
+_exports = {
+    "Assignment": "assignment",
+    "AutograderAssignment": "assignment",
+    "PDFAssignment": "assignment",
+    "Session": "session",
+    "Course": "course",
+    "AsyncSession": "aio",
+    "AsyncCourse": "aio",
+}
+__all__ = list(_exports) + ["util"]
+
+if typing.TYPE_CHECKING:
+    from .assignment import Assignment, AutograderAssignment, PDFAssignment
+    from .session import Session
+    from .course import Course
+    from .aio import AsyncSession, AsyncCourse
+    from . import util
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module("." + _exports[name], __name__), name)
+    else:
+        # submodules, e.g. gradescrape.util
+        try:
+            value = importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,23 +1,160 @@
 from typing import TYPE_CHECKING
 import typing
 import datetime
+import os
 import requests
 from .util import *
+from .outline import Outline, parse_outline_page
+from .catalog import CatalogEntry
+from . import extract
+from .download import SubmissionDownloader, DownloadReport
+from .scores import ScoreTable, export_scores
+from .upload import SubmissionUploader, UploadReport
+from .regrade import RegradeWatcher
+from .multipart import as_path
 if TYPE_CHECKING:
     from .course import Course
 
 __all__ = ["Assignment", "PDFAssignment", "AutograderAssignment"]
 class Assignment:
+    """
+    An assignment of a course. Get these from Course.get_assignment() and friends, which hand out one
+    object per assignment id, so whatever it has loaded is shared.
+
+    settings, type and (for PDFAssignments) outline are loaded on first access and memoized; title,
+    release_date and due_date come from the course's catalog. Updates made through this object drop
+    what they made stale, and invalidate() drops everything, e.g. after changes made elsewhere.
+    """
+    # subclasses add no slots of their own, so Course.get_assignment can narrow a plain Assignment in place
+    __slots__ = ("ses", "course", "aid", "_memo", "__weakref__")
+    # what Gradescope serves submissions as: "pdf" or "zip". Unknown for a plain Assignment.
+    submission_format: typing.Optional[str] = None
+
     def __init__(self, course, aid: int):
         self.ses = course.ses
         self.course: Course = course
         self.aid: int = aid
+        # values of the lazy properties loaded so far
+        self._memo: dict = {}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.aid}>"
+
     def get_url(self):
         return self.course.get_url() + f"/assignments/{self.aid}"
 
+    def invalidate(self):
+        """Forgets the memoized settings, type and outline, so they are reloaded on next access."""
+        self._memo.clear()
+
+    def _updated(self, title: str=None, release_date: datetime.datetime=None, due_date: datetime.datetime=None):
+        # after a settings write: drop the memo and bring the catalog entry (if the catalog is loaded) up to date
+        self._memo.clear()
+        entry = self.course.catalog.by_id.get(self.aid)
+        if entry is not None:
+            self.course.catalog.add(CatalogEntry(self.aid, title or entry.name, entry.type,
+                                                 release_date or entry.release_date, due_date or entry.due_date))
+
+    @lazy
+    def settings(self) -> typing.Dict[str, typing.Any]:
+        """get_settings(), loaded once. Treat it as read-only; edit a get_settings() instead."""
+        edit = self.ses.get_form(self.get_url() + "/edit")
+        cls = type(self)
+        if cls is Assignment:
+            # only programming assignments have a memory limit
+            cls = AutograderAssignment if edit.has("assignment[memory_limit]") else PDFAssignment
+        self._memo["type"] = "ProgrammingAssignment" if issubclass(cls, AutograderAssignment) else "PDFAssignment"
+        return cls.settings_from_form(edit)
+
+    @lazy
+    def type(self) -> str:
+        """"ProgrammingAssignment" or "PDFAssignment". For a plain Assignment whose type the catalog doesn't
+        know, this loads the settings."""
+        if isinstance(self, AutograderAssignment):
+            return "ProgrammingAssignment"
+        if isinstance(self, PDFAssignment):
+            return "PDFAssignment"
+        entry = self.course.catalog.by_id.get(self.aid)
+        if entry is not None and entry.type is not None:
+            return entry.type
+        self.settings
+        return self._memo["type"]
+
+    def _entry(self) -> typing.Optional[CatalogEntry]:
+        return self.course.catalog.get_by_id(self.aid)
+
+    @property
+    def title(self) -> str:
+        entry = self._entry()
+        return entry.name if entry is not None else self.settings["title"]
+
+    @property
+    def release_date(self) -> typing.Optional[datetime.datetime]:
+        entry = self._entry()
+        return entry.release_date if entry is not None else self.settings["release_date"]
+
+    @property
+    def due_date(self) -> typing.Optional[datetime.datetime]:
+        entry = self._entry()
+        return entry.due_date if entry is not None else self.settings["due_date"]
+
+    def list_submissions(self) -> typing.List[dict]:
+        """Lists the submissions on the review grades page, as dicts with "sid", "name", "email", "score"
+        and "status". See extract.submission_rows."""
+        html = self.ses.get_html(self.get_url() + "/review_grades")
+        return extract.submission_rows(html, self.course.cid, self.aid, self.ses.parser_backend)
+
+    def download_submissions(self, dest: str, max_workers: int=4, fmt: str=None,
+                             submissions: typing.Iterable[dict]=None, on_result=None) -> DownloadReport:
+        """Downloads every submission (or just submissions, as from list_submissions()) into the
+        directory dest, as <submission id>.pdf or .zip, max_workers at a time.
+
+        Interrupted runs pick up where they left off: rerunning with the same dest skips finished
+        files and resumes partial ones. fmt overrides the file type, and is required for a plain
+        Assignment. on_result is called with each download.DownloadResult as it finishes.
+        Returns a download.DownloadReport; failures are recorded there rather than raised.
+        """
+        fmt = fmt or self.submission_format
+        if fmt is None:
+            raise ValueError('pass fmt="pdf" or fmt="zip", or use a PDFAssignment or AutograderAssignment')
+        return SubmissionDownloader(self, dest, fmt, max_workers).run(submissions, on_result)
+
+    def export_scores(self) -> ScoreTable:
+        """Streams the assignment's scores export into NumPy columns (scores, students as a categorical,
+        submission times as datetime64). Needs numpy. See scores.py."""
+        return export_scores(self)
+
 class PDFAssignment(Assignment):
+    __slots__ = ()
+    submission_format = "pdf"
+
+    @lazy
+    def outline(self) -> Outline:
+        """get_outline(), loaded once."""
+        return self.get_outline()
+
+    def upload_submissions(self, mapping: typing.Dict[typing.Any, str], max_workers: int=4, manifest: str=None,
+                           max_retries: int=3, progress=None, on_result=None) -> UploadReport:
+        """Uploads PDFs on students' behalf, e.g. scanned paper exams.
+
+        mapping         -- {student: path}, students given by email, name or Gradescope owner id.
+        manifest        -- JSONL file the results are appended to. Rerunning with the same manifest
+                           skips the uploads that already succeeded.
+        progress        -- callback taking (bytes_sent, total_bytes, bytes_per_second) for the whole batch.
+        on_result       -- called with each upload.UploadResult as it finishes.
+
+        Files are streamed, max_workers at a time, and retried on connection errors and 429/5xx, without
+        creating a second submission when the first one went through after all. A name that more than one
+        student has fails with ValueError; give those students by email or owner id. Returns an upload.UploadReport; failures are recorded there rather than raised. See upload.py.
+        """
+        uploader = SubmissionUploader(self, manifest, max_workers, max_retries, progress=progress)
+        return uploader.run(mapping, on_result)
+
+    def get_outline(self) -> Outline:
+        """Reads the current outline off /outline/edit, question ids and all. See outline.py."""
+        return parse_outline_page(self.ses.get_html(self.get_url() + "/outline/edit"))
 
-    def update_outline(self, outline: list):
+    def update_outline(self, outline: list, current: Outline=None, renames: typing.Dict[str, str]=None):
         """Patches the outline. Use the format listed below.
         
         [
@@ -40,49 +177,30 @@ class PDFAssignment(Assignment):
                 "weight": 20.0,
             }
         ]
-        """
 
-        data = { 
-            "assignment": {
-                "identification_regions": {
-                    "name": None,
-                    "sid": None
-                }
-            },
-            "question_data": []
-        }
+        The outline is validated first (raising ValueError), then diffed against the live one
+        (or current, if the caller already has it): if nothing changed, no request is made and
+        None is returned. Otherwise questions that already exist keep their ids, so their rubrics
+        and grades survive. Returns the PATCH response.
 
-        for q in outline:
-            qz = {
-                'title': q['title'],
-                'crop_rect_list': [{"x1": 0, "x2": 100, "y1": 90, "y2": 100, "page_number": None}],
-            }
-            children = []
-            real_weight = 0
-            for subq in q.get('children', []):
-                sqz = {
-                    'title': subq['title'],
-                    'weight': float(subq['weight']),
-                    'crop_rect_list': [{"x1": 0, "x2": 100, "y1": 90, "y2": 100, "page_number": None}],
-                }
-                real_weight += sqz['weight']
-                children.append(sqz)
-            if children:
-                qz['children'] = children
-                qz['weight'] = real_weight
-            else:
-                qz['weight'] = float(q['weight'])
-            data['question_data'].append(qz)
-        return self.update_outline_raw(data)
+        Questions are matched to live ones by title. A question whose title changed is otherwise
+        removed (with its rubric and grades) and added afresh, so to rename one, give its live "id" in
+        the spec or pass renames={old title: new title}; nested questions go by path, like "Q1/a".
+        """
+        desired = Outline.from_spec(outline)
+        if current is None:
+            current = self.get_outline()
+        diff = current.diff(desired, renames)
+        if not diff:
+            return None
+        return self.update_outline_raw(diff.merged.to_raw())
 
-            
     def update_outline_raw(self, outline_raw: dict):
         # Patches the outline. Expects the raw structure that gradescope itself uses.
 
-        csrf_token, page=self.ses.get_csrf(self.get_url() + "/outline/edit", True)
-        return self.ses.req.patch(self.get_url() + "/outline/", json=outline_raw, headers={"X-CSRF-Token": csrf_token})
-
-        #raise NotImplementedError()
+        r = self.ses.request_csrf("PATCH", self.get_url() + "/outline/", csrf_url=self.get_url() + "/outline/edit", json=outline_raw)
+        self._memo.pop("outline", None)
+        return r
 
     def update_settings(self, title: str=None, 
                         release_date: datetime.datetime=None, due_date: datetime.datetime=None,
@@ -99,7 +217,14 @@ class PDFAssignment(Assignment):
                         scoring_type="positive",
                         template_pdf_name=None,
                         template_pdf_data=None,
+                        progress=None,
                         ) -> Assignment:
+        """Updates the assignment's settings. See get_settings() for the current values.
+
+        template_pdf_data, if template_pdf_name is given, can be bytes, a path (str or os.PathLike) or a binary file object,
+        and is streamed rather than read into memory. progress is an optional callback taking
+        (bytes_sent, total_bytes, bytes_per_second), called as the request body is uploaded.
+        """
         
         if any([title is None]):
             raise ValueError("title are mandatory arguments!")
@@ -111,10 +236,7 @@ class PDFAssignment(Assignment):
         #
 
         # TODO: make the above mandatory settings optional
-        csrf_token, page = self.ses.get_csrf(self.get_url() + "/edit", True) # csrf token
-
         data = {
-            'authenticity_token': csrf_token,
             'utf8': "\u2713",
             '_method': "patch",
             'assignment[title]': title, # assignment title
@@ -144,31 +266,99 @@ class PDFAssignment(Assignment):
         if template_pdf_name is None:
             files = {"template_pdf": ("", b'', 'application/octet-stream')}
         else:
-            files = {"template_pdf": (template_pdf_name, template_pdf_data, 'application/octet-stream')}
+            files = {"template_pdf": (template_pdf_name, as_path(template_pdf_data), 'application/octet-stream')}
+
+
+        ret = self.ses.post_soup(self.get_url(), data=data, files=files, allow_redirects=False, _return_request_object=True,
+                                 _csrf=self.get_url() + "/edit", _progress=progress)
+        self._updated(title, release_date, due_date)
+        return ret
 
+    def get_settings(self) -> typing.Dict[str, typing.Any]:
+        """Gets settings as a dict, in the shape update_settings() takes.
+        Like AutograderAssignment.get_settings, the intended use is
+
+        settings = assign.get_settings()
+        settings["due_date"] = new_due_date
+        assign.update_settings(**settings)
 
-        return self.ses.post_soup(self.get_url(), data=data, files=files, allow_redirects=False, _return_request_object=True)
+        The template pdf is not included, so that an update with these settings leaves it alone.
+        """
+        return self.settings_from_form(self.ses.get_form(self.get_url() + "/edit"))
+
+    @staticmethod
+    def settings_from_form(edit: FormSnapshot) -> typing.Dict[str, typing.Any]:
+        """get_settings(), for an /edit page that has already been fetched."""
+        late = edit.checkbox("allow_late_submissions")
+        group = edit.checkbox("assignment[group_submission]")
+        return {
+            "title": edit.value("assignment[title]"),
+            "release_date": edit.date("assignment[release_date_string]"),
+            "due_date": edit.date("assignment[due_date_string]"),
+            "allow_late_submissions": late,
+            "late_due_date": edit.date("assignment[hard_due_date_string]") if late else None,
+            "student_submission": edit.radio("assignment[student_submission]", default="true") == "true",
+            "manual_grading": edit.checkbox("assignment[manual_grading]"),
+            "anon_grading": edit.checkbox("assignment[submissions_anonymized]"),
+            "group_submission": group,
+            "group_size": edit.value("assignment[group_size]", int) if group else None,
+            "submission_type": edit.radio("assignment[submission_type]", default="image"),
+            "rubric_select_one": edit.checkbox("assignment[rubric_item_groups_mutually_exclusive]"),
+            "ceiling": edit.checkbox("assignment[ceiling]", default=True),
+            "floor": edit.checkbox("assignment[floor]", default=True),
+            "rubric_visibility_setting": edit.radio("assignment[rubric_visibility_setting]", default="show_all_rubric_items"),
+            "scoring_type": edit.radio("assignment[scoring_type]", default="positive"),
+        }
 
 class AutograderAssignment(Assignment):
-    def update_autograder_zip(self, autograder_zip: bytes, zip_name:str="autograder.zip"):
+    __slots__ = ()
+    submission_format = "zip"
+
+    def regrade_all(self, **watch_kwargs) -> RegradeWatcher:
+        """Reruns the autograder on every submission, e.g. after update_autograder_zip(). Returns a
+        regrade.RegradeWatcher, which yields each submission's new result as it finishes:
+
+        for res in assgn.regrade_all(timeout=3600):
+            print(res.name, res.score)
+
+        watch_kwargs (min_interval, max_interval, backoff, settle, timeout) go to the watcher.
+        """
+        r = self.ses.request_csrf("POST", self.get_url() + "/regrade_all", csrf_url=self.get_url() + "/review_grades",
+                                  data={}, allow_redirects=False)
+        r.raise_for_status()
+        return RegradeWatcher(self, **watch_kwargs)
+
+    def update_autograder_zip(self, autograder_zip, zip_name:str=None, progress=None):
         """Upload a new autograder zip file. 
 
+        autograder_zip can be bytes, a path (str or os.PathLike), or a binary file object. Paths and files are streamed
+        a chunk at a time, so large zips never have to fit in memory. zip_name defaults to the
+        file's name, or "autograder.zip".
+
+        progress is an optional callback taking (bytes_sent, total_bytes, bytes_per_second),
+        called as the upload goes.
+
         Example usage:
-        with open("autograder.zip", "rb") as f: 
-            assgn.update_autograder_zip(f.read(), "autograder.zip")
+        assgn.update_autograder_zip("build/autograder.zip")
         """
+        if zip_name is None:
+            if isinstance(autograder_zip, (str, os.PathLike)):
+                zip_name = os.path.basename(autograder_zip)
+            else:
+                zip_name = "autograder.zip"
 
-        csrf_token, page = self.ses.get_csrf(self.get_url() + "/configure_autograder", True) # csrf token
+        configure_url = self.get_url() + "/configure_autograder"
+        # loading the form also refreshes the cached csrf token that _csrf= fills in
+        form = self.ses.get_form(configure_url)
 
         data = {
-            'authenticity_token': csrf_token,
             'utf8': "\u2713",
             '_method': "patch",
             'configuration': "zip",
-            'assignment[image_name]': page.find("input", attrs={"name": "assignment[image_name]"}).get("value", "")
+            'assignment[image_name]': form.value("assignment[image_name]") or ""
         }
-        files = {"autograder_zip": (zip_name, autograder_zip, 'application/zip')}
-        return self.ses.post_soup(self.get_url(), data=data, files=files)
+        files = {"autograder_zip": (zip_name, as_path(autograder_zip), 'application/zip')}
+        return self.ses.post_soup(self.get_url(), data=data, files=files, _progress=progress, _csrf=configure_url)
     
     def update_settings(self, title: str=None, total_points: float=None, 
                         release_date: datetime.datetime=None, due_date: datetime.datetime=None,
@@ -180,10 +370,7 @@ class AutograderAssignment(Assignment):
         if any([title is None, total_points is None, release_date is None, due_date is None]):
             raise ValueError("title, total_points, release_date, due_dare are mandatory arguments!")
         # TODO: make the above mandatory settings optional
-        csrf_token, page = self.ses.get_csrf(self.get_url() + "/edit", True) # csrf token
-
         data = {
-            'authenticity_token': csrf_token,
             'utf8': "\u2713",
             '_method': "patch",
             #'configuration': "zip",
@@ -212,7 +399,10 @@ class AutograderAssignment(Assignment):
         for sub_method in ("upload", "github", "bitbucket"):
             data['assignment[submission_methods[' + sub_method + ']]'] = int(sub_method in submission_methods)
 
-        return self.ses.post_soup(self.get_url(), data=data, allow_redirects=False, _return_request_object=True)
+        ret = self.ses.post_soup(self.get_url(), data=data, allow_redirects=False, _return_request_object=True,
+                                 _csrf=self.get_url() + "/edit")
+        self._updated(title, release_date, due_date)
+        return ret
         #r = requests.post(self.get_url(), data=data, cookies=self.ses.cookies)
         #r.raise_for_status()
         #return r
@@ -227,33 +417,31 @@ class AutograderAssignment(Assignment):
 
         to say, edit specific settings.
         """
-        edit = self.ses.get_soup(self.get_url() + "/edit")
+        return self.settings_from_form(self.ses.get_form(self.get_url() + "/edit"))
+
+    @staticmethod
+    def settings_from_form(edit: FormSnapshot) -> typing.Dict[str, typing.Any]:
+        """get_settings(), for an /edit page that has already been fetched."""
         data = {
-            "title": form_from_value(edit, "assignment[title]"),
-            "total_points": form_from_value(edit, "assignment[total_points]", float),
-            "release_date": form_from_date(edit, "assignment[release_date_string]"),
-            "due_date": form_from_date(edit, "assignment[due_date_string]"),
-            "allow_late_submissions": form_from_checkbox(edit, "allow_late_submissions"),
-            "late_due_date": form_from_date(edit, "assignment[hard_due_date_string]"),
-            "manual_grading": form_from_checkbox(edit, "assignment[manual_grading]"),
-            "leaderboard_enabled": form_from_checkbox(edit, "assignment[leaderboard_enabled]"),
-            "leaderboard_max_entries": form_from_value(edit, "assignment[leaderboard_max_entries]", int),
-            "group_submission": form_from_checkbox(edit, "assignment[group_submission]"),
-            "group_size": form_from_value(edit, "assignment[group_size]", int),
-            "ignored_files": form_from_textarea(edit, "assignment[ignored_files]"),
-            "memory_limit": int(form_from_radio(edit, "assignment[memory_limit]")),
-            "autograder_timeout": int(form_from_select(edit, "assignment[autograder_timeout]"))
+            "title": edit.value("assignment[title]"),
+            "total_points": edit.value("assignment[total_points]", float),
+            "release_date": edit.date("assignment[release_date_string]"),
+            "due_date": edit.date("assignment[due_date_string]"),
+            "allow_late_submissions": edit.checkbox("allow_late_submissions"),
+            "late_due_date": edit.date("assignment[hard_due_date_string]"),
+            "manual_grading": edit.checkbox("assignment[manual_grading]"),
+            "leaderboard_enabled": edit.checkbox("assignment[leaderboard_enabled]"),
+            "leaderboard_max_entries": edit.value("assignment[leaderboard_max_entries]", int),
+            "group_submission": edit.checkbox("assignment[group_submission]"),
+            "group_size": edit.value("assignment[group_size]", int),
+            "ignored_files": edit.textarea("assignment[ignored_files]"),
+            "memory_limit": int(edit.radio("assignment[memory_limit]")),
+            "autograder_timeout": int(edit.select("assignment[autograder_timeout]"))
         }
-        #"submission_methods": form_from_
         data['submission_methods'] = []
         for sub_method in ("upload", "github", "bitbucket"):
-            enabled = form_from_checkbox(edit, 'assignment[submission_methods[' + sub_method + ']]')
+            enabled = edit.checkbox('assignment[submission_methods[' + sub_method + ']]')
             if enabled:
                 data['submission_methods'].append(sub_method)
         
-        return data
-
-
-
-    def get_url(self):
-        return f"{BASE_URL}/courses/{self.course.cid}/assignments/{self.aid}"
\ No newline at end of file
+        return data
\ No newline at end of file
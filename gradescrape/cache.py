@@ -0,0 +1,196 @@
+import collections
+import json
+import re
+import sqlite3
+import threading
+import time
+import typing
+from urllib.parse import urlparse
+import requests
+from requests.structures import CaseInsensitiveDict
+from .transport import Layer
+
+__all__ = ["ResponseCache", "CacheLayer", "DEFAULT_ROUTES"]
+
+# path regex -> seconds a cached page counts as fresh. Pages on routes not listed here aren't cached.
+DEFAULT_ROUTES = {
+    r"^/account$": 300,                           # course list, i.e. Session.get_courses
+    r"^/courses/\d+/assignments/?$": 60,          # Course.list_assignments
+    r"^/courses/\d+/assignments/\d+/edit$": 60,   # get_settings
+}
+
+COURSE_RE = re.compile(r"^/courses/(\d+)")
+
+class Entry:
+    __slots__ = ("status", "headers", "body", "url", "stored")
+    def __init__(self, status, headers, body, url, stored):
+        self.status: int = status
+        self.headers: dict = headers # with lowercased names
+        self.body: bytes = body
+        self.url: str = url
+        self.stored: float = stored
+
+    def validators(self) -> dict:
+        h = {}
+        if "etag" in self.headers:
+            h["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            h["If-Modified-Since"] = self.headers["last-modified"]
+        return h
+
+
+class ResponseCache:
+    """
+    Cache of GET responses for the read-heavy routes.
+
+    max_entries     -- size of the in-memory LRU.
+    routes          -- {path regex: ttl seconds}; see DEFAULT_ROUTES. Only matching routes are cached.
+    path            -- optional SQLite file backing the LRU, so the cache survives restarts.
+
+    Once an entry is past its ttl it is revalidated with If-None-Match / If-Modified-Since when the server
+    gave us an ETag or Last-Modified, so an unchanged page costs a 304 instead of a download and a reparse.
+    Any non-GET request to a course drops every cached page under that course.
+    """
+    def __init__(self, max_entries: int=256, routes: typing.Dict[str, float]=None, path: str=None):
+        self.max_entries: int = max_entries
+        self.routes = [(re.compile(pat), ttl) for pat, ttl in (routes if routes is not None else DEFAULT_ROUTES).items()]
+        self.lru: "collections.OrderedDict[str, Entry]" = collections.OrderedDict()
+        self.lock = threading.RLock()
+        self.db: sqlite3.Connection = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS entries "
+                            "(key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, url TEXT, stored REAL)")
+            self.db.commit()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.revalidations: int = 0
+        self.invalidations: int = 0
+
+    def ttl(self, url: str) -> float:
+        """How long pages at url stay fresh; 0 if they shouldn't be cached at all."""
+        path = urlparse(url).path or "/"
+        for pat, ttl in self.routes:
+            if pat.search(path):
+                return ttl
+        return 0
+
+    def get(self, key: str) -> typing.Optional[Entry]:
+        with self.lock:
+            if key in self.lru:
+                self.lru.move_to_end(key)
+                return self.lru[key]
+            if self.db is None:
+                return None
+            row = self.db.execute("SELECT status, headers, body, url, stored FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = Entry(row[0], json.loads(row[1]), row[2], row[3], row[4])
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: str, entry: Entry):
+        with self.lock:
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                (key, entry.status, json.dumps(entry.headers), entry.body, entry.url, entry.stored))
+                self.db.commit()
+
+    def _remember(self, key, entry):
+        self.lru[key] = entry
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def invalidate(self, url: str):
+        """Drops everything cached under the course url belongs to, or everything if it isn't in a course."""
+        m = COURSE_RE.match(urlparse(url).path)
+        with self.lock:
+            if m is None:
+                self.clear()
+                return
+            prefix = m.group(0)
+            def affected(key):
+                path = urlparse(key).path
+                return path == prefix or path.startswith(prefix + "/")
+            for key in [k for k in self.lru if affected(k)]:
+                del self.lru[key]
+                self.invalidations += 1
+            if self.db is not None:
+                for (key,) in self.db.execute("SELECT key FROM entries").fetchall():
+                    if affected(key):
+                        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.lru)
+            self.lru.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM entries")
+                self.db.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations,
+                "invalidations": self.invalidations, "entries": len(self.lru)}
+
+
+class CacheLayer(Layer):
+    """Layer serving GETs out of a ResponseCache and invalidating it on writes."""
+    def __init__(self, inner, cache: ResponseCache):
+        super().__init__(inner)
+        self.cache: ResponseCache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            r = self.inner.send(request, **kwargs)
+            self.cache.invalidate(request.url)
+            return r
+
+        ttl = self.cache.ttl(request.url)
+        # Cache-Control: no-cache is how a caller asks for the live page, e.g. Session.is_logged_in
+        if ttl <= 0 or "Range" in request.headers or "no-cache" in request.headers.get("Cache-Control", ""):
+            return self.inner.send(request, **kwargs)
+
+        key = request.url
+        entry = self.cache.get(key)
+        if entry is not None and time.time() - entry.stored < ttl:
+            with self.cache.lock:
+                self.cache.hits += 1
+            return self.build_response(request, entry)
+
+        if entry is not None:
+            request = request.copy()
+            request.headers.update(entry.validators())
+        r = self.inner.send(request, **kwargs)
+
+        if entry is not None and r.status_code == 304:
+            r.close()
+            entry.stored = time.time()
+            self.cache.put(key, entry)
+            with self.cache.lock:
+                self.cache.revalidations += 1
+            return self.build_response(request, entry)
+
+        with self.cache.lock:
+            self.cache.misses += 1
+        if r.status_code == 200 and "no-store" not in r.headers.get("Cache-Control", ""):
+            # reading .content here means cached routes are never streamed, which is fine for html pages
+            headers = {k.lower(): v for k, v in r.headers.items()}
+            self.cache.put(key, Entry(r.status_code, headers, r.content, r.url, time.time()))
+        return r
+
+    def build_response(self, request, entry: Entry) -> requests.Response:
+        r = requests.Response()
+        r.status_code = entry.status
+        r.headers = CaseInsensitiveDict(entry.headers)
+        r._content = entry.body
+        r._content_consumed = True
+        r.url = entry.url
+        r.request = request
+        r.reason = "OK"
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        r.connection = self
+        return r
@@ -0,0 +1,460 @@
+"""Recording traffic to a cassette file, and replaying it without a network.
+
+A cassette is a list of request/response interactions. Record one by putting a RecordLayer over the
+real transport; replay it by giving the session a ReplayAdapter instead of a transport at all:
+
+    cas = Cassette("run.jsonl.gz")
+    ses = Session(base_url=server.url, transport=RecordLayer(TransportAdapter(), cas))
+    ...
+    cas.save()
+
+    ses = Session(transport=ReplayAdapter(Cassette.load("run.jsonl.gz")))
+
+Without a rate limiter a replay takes milliseconds. If the recording session had one, give the
+replaying session one too (and pass latency=1.0) to replay at the recorded pace, retries and all.
+(cassette_transport(path) does either, depending on whether path exists yet.)
+
+Interactions are looked up by method, path and a hash of the request body, in a dict, so replay
+is a constant-time lookup however long the cassette. The host isn't part of the key, so a cassette
+recorded against one base url (say, a mock server on a random port) replays under any other.
+Requests with the same key get their recorded responses in the order they were recorded, so a page
+polled until it changes replays the same way; the last response repeats once they run out.
+
+Before anything is written, interactions are scrubbed: request headers (cookies included) aren't
+kept, the SCRUB_FIELDS form fields (csrf token, login email and password) are left out of the body
+hash, and Set-Cookie headers and csrf tokens in pages are dropped. A scrub callable can rewrite
+response bodies further, e.g. to anonymize student names.
+
+Cassettes are JSON lines, one interaction per line after a header line, gzipped if the file
+name ends in .gz. Text bodies are stored as text and anything else as base64.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import typing
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from .transport import Layer, TransportAdapter
+
+__all__ = ["SCRUB_FIELDS", "CassetteMiss", "Interaction", "Cassette", "RecordLayer", "ReplayAdapter",
+           "cassette_transport"]
+
+FORMAT_VERSION = 1
+# form, query and json fields that are secret or differ from run to run, so are neither stored nor hashed
+SCRUB_FIELDS = frozenset(["authenticity_token", "session[email]", "session[password]"])
+# response headers not worth storing: per-connection, per-response noise, or secrets
+DROP_HEADERS = frozenset(["set-cookie", "date", "server", "connection", "keep-alive", "transfer-encoding",
+                          "content-encoding", "x-request-id", "x-runtime"])
+CSRF_PATTERNS = [
+    re.compile(rb'(<meta name="csrf-token" content=")[^"]*'),
+    re.compile(rb'(name="authenticity_token"[^>]*?value=")[^"]*'),
+]
+SCRUBBED = b"scrubbed"
+
+Key = typing.Tuple[str, str, typing.Optional[str]]
+
+
+class CassetteMiss(requests.ConnectionError):
+    """A replayed request that the cassette has no recording of."""
+
+
+def normalize_path(url: str, scrub_fields=SCRUB_FIELDS) -> str:
+    """The path and sorted query of url, without scrubbed query fields: what interactions are keyed on."""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in scrub_fields)
+    return path + "?" + urlencode(query) if query else path
+
+
+class _MultipartHasher:
+    """Hashes a multipart/form-data body fed to it in chunks of any size, leaving out the boundary
+    (which is random) and the parts named in scrub_fields. Only part headers are ever buffered."""
+    def __init__(self, boundary: bytes, scrub_fields):
+        self.delim = b"\r\n--" + boundary
+        self.scrub_fields = scrub_fields
+        self.sha = hashlib.sha1()
+        # the first delimiter has no CRLF before it
+        self.buf = b"\r\n"
+        self.state = "preamble"
+        self.hashing = False
+
+    def update(self, data: bytes):
+        self.buf += data
+        while True:
+            if self.state == "end":
+                self.buf = b""
+                return
+            if self.state == "headers":
+                if self.buf.startswith(b"--"):
+                    self.state = "end"
+                    continue
+                i = self.buf.find(b"\r\n\r\n")
+                if i < 0:
+                    return
+                headers, self.buf = self.buf[2:i], self.buf[i + 4:]
+                m = re.search(rb'name="([^"]*)"', headers)
+                self.hashing = not (m and m.group(1).decode("utf-8", "replace") in self.scrub_fields)
+                if self.hashing:
+                    self.sha.update(b"\0" + headers + b"\0")
+                self.state = "content"
+            i = self.buf.find(self.delim)
+            if i < 0:
+                # keep enough to spot a delimiter split across chunks
+                keep = len(self.delim) - 1
+                if len(self.buf) > keep:
+                    self._content(self.buf[:-keep])
+                    self.buf = self.buf[-keep:]
+                return
+            self._content(self.buf[:i])
+            self.buf = self.buf[i + len(self.delim):]
+            self.state = "headers"
+
+    def _content(self, data: bytes):
+        if self.state == "content" and self.hashing:
+            self.sha.update(data)
+
+    def hexdigest(self) -> str:
+        return self.sha.hexdigest()
+
+
+class _PlainHasher:
+    def __init__(self):
+        self.sha = hashlib.sha1()
+
+    def update(self, data: bytes):
+        self.sha.update(data)
+
+    def hexdigest(self) -> str:
+        return self.sha.hexdigest()
+
+
+def _hasher(content_type: str, scrub_fields):
+    m = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if "multipart/" in (content_type or "") and m:
+        return _MultipartHasher(m.group(1).encode(), scrub_fields)
+    return _PlainHasher()
+
+def _body_bytes(body) -> bytes:
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+def hash_body(body: bytes, content_type: str=None, scrub_fields=SCRUB_FIELDS) -> typing.Optional[str]:
+    """The hash a request body is keyed on, with scrubbed fields left out of form, json and multipart bodies."""
+    if not body:
+        return None
+    content_type = content_type or ""
+    if "application/x-www-form-urlencoded" in content_type:
+        fields = [(k, v) for k, v in parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True)
+                  if k not in scrub_fields]
+        body = urlencode(fields).encode()
+    elif "json" in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            pass
+        else:
+            if isinstance(data, dict):
+                data = {k: v for k, v in data.items() if k not in scrub_fields}
+            body = json.dumps(data, sort_keys=True).encode()
+    h = _hasher(content_type, scrub_fields)
+    h.update(body)
+    return h.hexdigest()
+
+
+class _HashingBody:
+    """Wraps a streamed request body (a file-like object or an iterable of chunks), hashing it as it is sent."""
+    def __init__(self, body, hasher):
+        self.body = body
+        self.hasher = hasher
+        self._iter = None
+
+    def read(self, size: int=-1) -> bytes:
+        if hasattr(self.body, "read"):
+            chunk = self.body.read(size)
+        else:
+            if self._iter is None:
+                self._iter = iter(self.body)
+            chunk = next(self._iter, b"")
+        chunk = _body_bytes(chunk) if chunk else b""
+        self.hasher.update(chunk)
+        return chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def __len__(self):
+        return len(self.body)
+
+
+def _consume(body, hasher) -> str:
+    """Hashes a streamed body by reading it to the end."""
+    wrapped = _HashingBody(body, hasher)
+    for _ in wrapped:
+        pass
+    return hasher.hexdigest()
+
+
+class Interaction:
+    """One recorded exchange. elapsed is how long the response took to arrive in full, in seconds."""
+    __slots__ = ("method", "path", "body_hash", "status", "reason", "headers", "content", "elapsed")
+    def __init__(self, method: str, path: str, body_hash: typing.Optional[str], status: int, reason: str,
+                 headers: typing.Dict[str, str], content: bytes, elapsed: float):
+        self.method: str = method
+        self.path: str = path
+        self.body_hash: typing.Optional[str] = body_hash
+        self.status: int = status
+        self.reason: str = reason
+        self.headers: typing.Dict[str, str] = headers
+        self.content: bytes = content
+        self.elapsed: float = elapsed
+
+    @property
+    def key(self) -> Key:
+        return (self.method, self.path, self.body_hash)
+
+    def __repr__(self):
+        return f"<Interaction {self.method} {self.path} {self.status} {len(self.content)} bytes>"
+
+    def as_dict(self) -> dict:
+        d = {"method": self.method, "path": self.path, "body": self.body_hash, "status": self.status,
+             "reason": self.reason, "headers": self.headers, "elapsed": round(self.elapsed, 6)}
+        try:
+            d["text"] = self.content.decode("utf-8")
+        except UnicodeDecodeError:
+            d["b64"] = base64.b64encode(self.content).decode("ascii")
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Interaction":
+        content = d["text"].encode("utf-8") if "text" in d else base64.b64decode(d.get("b64", ""))
+        return cls(d["method"], d["path"], d.get("body"), d["status"], d.get("reason") or "",
+                   d.get("headers") or {}, content, d.get("elapsed") or 0.0)
+
+
+class Cassette:
+    """
+    A set of interactions, indexed by (method, path, body hash). See the module docstring.
+
+    path            -- file that save() writes to. Optional for a cassette that's only kept in memory.
+    scrub_fields    -- form/query/json fields left out of keys and never stored.
+    scrub           -- called with each recorded response body (bytes), returning it rewritten.
+    """
+    def __init__(self, path: str=None, scrub_fields=SCRUB_FIELDS,
+                 scrub: typing.Callable[[bytes], bytes]=None):
+        self.path: typing.Optional[str] = path
+        self.scrub_fields = frozenset(scrub_fields)
+        self.scrub: typing.Optional[typing.Callable[[bytes], bytes]] = scrub
+        self.interactions: typing.Dict[Key, typing.List[Interaction]] = {}
+        # key -> how many of its interactions have been replayed
+        self.cursors: typing.Dict[Key, int] = {}
+        self.lock = threading.Lock()
+        self.recorded: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "Cassette":
+        cas = cls(path, **kwargs)
+        with (gzip.open if path.endswith(".gz") else open)(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} cassette")
+            for line in f:
+                if line.strip():
+                    cas.add(Interaction.from_dict(json.loads(line)))
+        return cas
+
+    def save(self, path: str=None):
+        """Writes every interaction to path (default: self.path), replacing the file in one go."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("no path to save the cassette to")
+        with self.lock:
+            interactions = [i for seq in self.interactions.values() for i in seq]
+        tmp = path + ".tmp"
+        with (gzip.open if path.endswith(".gz") else open)(tmp, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"cassette": FORMAT_VERSION, "interactions": len(interactions)}) + "\n")
+            for i in interactions:
+                f.write(json.dumps(i.as_dict(), separators=(",", ":")) + "\n")
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return sum(len(seq) for seq in self.interactions.values())
+
+    def __repr__(self):
+        return f"<Cassette {self.path or '(memory)'} {len(self)} interactions>"
+
+    def add(self, interaction: Interaction):
+        with self.lock:
+            self.interactions.setdefault(interaction.key, []).append(interaction)
+
+    def key(self, request: requests.PreparedRequest) -> Key:
+        """The key of request, reading its body to the end if it is streamed."""
+        content_type = request.headers.get("Content-Type", "")
+        body = request.body
+        if body is not None and not isinstance(body, (bytes, str)):
+            body_hash = _consume(body, _hasher(content_type, self.scrub_fields))
+        else:
+            body_hash = hash_body(_body_bytes(body) if body else b"", content_type, self.scrub_fields)
+        return (request.method, normalize_path(request.url, self.scrub_fields), body_hash)
+
+    def next(self, key: Key) -> typing.Optional[Interaction]:
+        """The next recorded response for key, or None if there's none."""
+        with self.lock:
+            seq = self.interactions.get(key)
+            if not seq:
+                self.misses += 1
+                return None
+            n = self.cursors.get(key, 0)
+            self.cursors[key] = n + 1
+            self.hits += 1
+            return seq[min(n, len(seq) - 1)]
+
+    def rewind(self):
+        """Starts every key's replay from its first response again."""
+        with self.lock:
+            self.cursors.clear()
+
+    def record(self, key: Key, r: requests.Response, elapsed: float) -> Interaction:
+        """Scrubs and stores the response r got for a request with key."""
+        content = r.content
+        for pat in CSRF_PATTERNS:
+            content = pat.sub(rb"\g<1>" + SCRUBBED, content)
+        if self.scrub is not None:
+            content = self.scrub(content)
+        headers = {k: v for k, v in r.headers.items() if k.lower() not in DROP_HEADERS}
+        if "Content-Length" in headers:
+            # the body is stored decoded (and maybe scrubbed), so its length changed
+            headers["Content-Length"] = str(len(content))
+        if "Location" in headers:
+            # so a replayed redirect stays on whatever host the replaying session uses
+            loc = urlsplit(headers["Location"])
+            if (loc.scheme, loc.netloc) == urlsplit(r.request.url)[:2]:
+                headers["Location"] = loc.path + ("?" + loc.query if loc.query else "")
+        interaction = Interaction(key[0], key[1], key[2], r.status_code, r.reason or "", headers, content, elapsed)
+        self.add(interaction)
+        with self.lock:
+            self.recorded += 1
+        return interaction
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"interactions": sum(len(seq) for seq in self.interactions.values()), "keys": len(self.interactions),
+                    "recorded": self.recorded, "hits": self.hits, "misses": self.misses}
+
+
+class RecordLayer(Layer):
+    """
+    Records everything sent through the adapter below it into cassette. Use it as a session's
+    transport, on top of the adapter doing the I/O, so retries are recorded one by one too.
+
+    Responses are read in full before they're handed on (streamed ones included), so they can be stored.
+    """
+    def __init__(self, inner: BaseAdapter, cassette: Cassette, save_on_close: bool=True):
+        super().__init__(inner)
+        self.cassette: Cassette = cassette
+        self.save_on_close: bool = save_on_close
+
+    def send(self, request, **kwargs):
+        body = request.body
+        content_type = request.headers.get("Content-Type", "")
+        hasher = None
+        if body is not None and not isinstance(body, (bytes, str)):
+            request = request.copy()
+            hasher = _hasher(content_type, self.cassette.scrub_fields)
+            request.body = _HashingBody(body, hasher)
+        start = time.perf_counter()
+        r = self.inner.send(request, **kwargs)
+        r.content
+        elapsed = time.perf_counter() - start
+        if hasher is not None:
+            body_hash = hasher.hexdigest()
+        else:
+            body_hash = hash_body(_body_bytes(body) if body else b"", content_type, self.cassette.scrub_fields)
+        self.cassette.record((request.method, normalize_path(request.url, self.cassette.scrub_fields), body_hash),
+                             r, elapsed)
+        return r
+
+    def set_pool_size(self, maxsize: int):
+        if hasattr(self.inner, "set_pool_size"):
+            self.inner.set_pool_size(maxsize)
+
+    def stats(self) -> dict:
+        stats = self.inner.stats() if hasattr(self.inner, "stats") else {}
+        stats["cassette"] = self.cassette.stats()
+        return stats
+
+    def close(self):
+        super().close()
+        if self.save_on_close and self.cassette.path is not None:
+            self.cassette.save()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers requests from cassette, never touching the network. Raises CassetteMiss for a request
+    the cassette has no recording of.
+
+    latency     -- how much of each interaction's recorded time to wait before answering it:
+                   0 for none (the default), 1.0 to replay at the recorded speed, 0.5 for twice as fast...
+    """
+    def __init__(self, cassette: Cassette, latency: float=0.0):
+        super().__init__()
+        self.cassette: Cassette = cassette
+        self.latency: float = float(latency)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = self.cassette.key(request)
+        interaction = self.cassette.next(key)
+        if interaction is None:
+            raise CassetteMiss(f"no recording of {key[0]} {key[1]} (body {key[2]}) in {self.cassette!r}",
+                               request=request)
+        if self.latency > 0 and interaction.elapsed > 0:
+            time.sleep(interaction.elapsed * self.latency)
+        r = requests.Response()
+        r.status_code = interaction.status
+        r.reason = interaction.reason
+        r.headers = CaseInsensitiveDict(interaction.headers)
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        r._content = interaction.content
+        r._content_consumed = True
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        return r
+
+    def set_pool_size(self, maxsize: int):
+        pass
+
+    def stats(self) -> dict:
+        return {"cassette": self.cassette.stats()}
+
+    def close(self):
+        pass
+
+
+def cassette_transport(path: str, mode: str="auto", latency: float=0.0, inner: BaseAdapter=None,
+                       **cassette_kwargs) -> BaseAdapter:
+    """
+    A transport for Session(transport=...) that records to or replays from the cassette at path.
+
+    mode    -- "record" to record (over inner, by default a TransportAdapter) and save on ses.req.close(),
+               "replay" to replay, or "auto" to replay if path exists and record if not.
+    """
+    if mode == "auto":
+        mode = "replay" if os.path.exists(path) else "record"
+    if mode == "replay":
+        return ReplayAdapter(Cassette.load(path, **cassette_kwargs), latency)
+    if mode == "record":
+        return RecordLayer(inner if inner is not None else TransportAdapter(), Cassette(path, **cassette_kwargs))
+    raise ValueError(f"unknown cassette mode {mode!r}")
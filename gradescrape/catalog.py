@@ -0,0 +1,106 @@
+import datetime
+import threading
+import time
+import typing
+from . import extract
+if typing.TYPE_CHECKING:
+    from .course import Course
+
+__all__ = ["AssignmentCatalog", "CatalogEntry"]
+
+class CatalogEntry:
+    __slots__ = ("aid", "name", "type", "release_date", "due_date")
+    def __init__(self, aid: int, name: str, type: str=None,
+                 release_date: datetime.datetime=None, due_date: datetime.datetime=None):
+        self.aid: int = aid
+        self.name: str = name
+        # "ProgrammingAssignment" or "PDFAssignment" when we know it (i.e. we created it), else None.
+        # The assignments table doesn't say.
+        self.type: typing.Optional[str] = type
+        self.release_date = release_date
+        self.due_date = due_date
+
+    def __repr__(self):
+        return f"<CatalogEntry {self.aid} {self.name!r}>"
+
+
+class AssignmentCatalog:
+    """
+    In-memory index of a course's assignments, so name and id lookups don't each cost a page load.
+
+    The table is loaded on first use and reloaded once it is older than max_age seconds (None: never
+    reload on its own). Course.create_* add new assignments to it directly, and refresh() forces a reload,
+    e.g. after assignments were changed from the web UI.
+    """
+    def __init__(self, course: "Course", max_age: typing.Optional[float]=300):
+        self.course: "Course" = course
+        self.max_age = max_age
+        self.by_name: typing.Dict[str, CatalogEntry] = {}
+        self.by_id: typing.Dict[int, CatalogEntry] = {}
+        self.loaded_at: typing.Optional[float] = None
+        self.lock = threading.RLock()
+
+    def stale(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age
+
+    def refresh(self):
+        """Reloads the catalog from the course's assignments page."""
+        ses = self.course.ses
+        html = ses.get_html(self.course.get_url() + "/assignments")
+        self.load(extract.assignment_rows(html, self.course.cid, ses.parser_backend))
+
+    def load(self, rows: typing.List[dict]):
+        """Replaces the catalog with rows as returned by extract.assignment_rows."""
+        with self.lock:
+            by_name, by_id = {}, {}
+            for row in rows:
+                old = self.by_id.get(row["aid"])
+                entry = CatalogEntry(row["aid"], row["name"], old.type if old else None,
+                                     row["release_date"], row["due_date"])
+                by_name[entry.name] = entry
+                by_id[entry.aid] = entry
+            self.by_name, self.by_id = by_name, by_id
+            self.loaded_at = time.monotonic()
+
+    def ensure(self):
+        with self.lock:
+            if self.stale():
+                self.refresh()
+
+    def add(self, entry: CatalogEntry):
+        """Records an assignment we just created. Does nothing if the catalog hasn't been loaded,
+        since the first load will pick it up anyway."""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            old = self.by_id.pop(entry.aid, None)
+            if old is not None:
+                self.by_name.pop(old.name, None)
+            self.by_name[entry.name] = entry
+            self.by_id[entry.aid] = entry
+
+    def get_by_name(self, name: str) -> typing.Optional[CatalogEntry]:
+        self.ensure()
+        return self.by_name.get(name)
+
+    def get_by_id(self, aid: int) -> typing.Optional[CatalogEntry]:
+        self.ensure()
+        return self.by_id.get(aid)
+
+    def names(self) -> typing.Dict[str, int]:
+        self.ensure()
+        return {name: e.aid for name, e in self.by_name.items()}
+
+    def __len__(self):
+        self.ensure()
+        return len(self.by_id)
+
+    def __iter__(self):
+        self.ensure()
+        return iter(list(self.by_id.values()))
+
+    def __contains__(self, name):
+        self.ensure()
+        return name in self.by_name
@@ -0,0 +1,154 @@
+"""The gradescrape command.
+
+    gradescrape daemon start|stop|status
+    gradescrape list-assignments COURSE [--refresh]
+    gradescrape get-settings COURSE ASSIGNMENT
+    gradescrape set-due-date COURSE ASSIGNMENT DUE_DATE [--late-due-date DATE]
+    gradescrape deploy-autograder COURSE ASSIGNMENT SOURCE [--force]
+    gradescrape stats
+
+ASSIGNMENT is an assignment id or name, dates are ISO 8601 ("2021-09-10T23:59") and results are
+printed as JSON. Commands go to the daemon (see daemon.py) when one is running, and otherwise run in
+this process, logging in first. This module only imports the standard library, so talking to the
+daemon doesn't pay for importing requests and friends.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+__all__ = ["main", "send"]
+
+def socket_path() -> str:
+    # same as daemon.socket_path(), without importing the daemon
+    return os.environ.get("GRADESCRAPE_SOCKET") or \
+        os.path.join(os.environ.get("GRADESCRAPE_DIR") or os.path.expanduser("~/.gradescrape"), "daemon.sock")
+
+def send(command: str, args: dict=None, path: str=None, timeout: float=None) -> dict:
+    """Sends one command to the daemon and returns its reply. Raises OSError if no daemon is listening."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path or socket_path())
+        s.sendall(json.dumps({"command": command, "args": args or {}}).encode() + b"\n")
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    return json.loads(buf)
+
+def run_local(command: str, args: dict) -> dict:
+    from . import daemon
+    try:
+        result = daemon.run_command(daemon.Workspace(), command, args)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return json.loads(daemon.encode({"ok": True, "result": result}))
+
+def daemon_command(action: str, path: str, foreground: bool) -> int:
+    if action == "status":
+        try:
+            send("stats", path=path, timeout=5)
+        except OSError:
+            print("not running")
+            return 1
+        print(f"running on {path}")
+        return 0
+    if action == "stop":
+        try:
+            send("shutdown", path=path, timeout=5)
+        except OSError:
+            print("not running")
+            return 1
+        return 0
+
+    try:
+        send("stats", path=path, timeout=5)
+        print(f"already running on {path}")
+        return 0
+    except OSError:
+        pass
+    if foreground:
+        from . import daemon
+        daemon.serve(path, ready=lambda: print(f"listening on {path}", flush=True))
+        return 0
+    # detach, and wait for the child to be logged in and listening
+    subprocess.Popen([sys.executable, "-m", "gradescrape.cli", "daemon", "start", "--foreground", "--socket", path],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            send("stats", path=path, timeout=5)
+            print(f"running on {path}")
+            return 0
+        except OSError:
+            time.sleep(0.1)
+    print("daemon didn't come up; run `gradescrape daemon start --foreground` to see why", file=sys.stderr)
+    return 1
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="gradescrape", description="Automate Gradescope course administration.")
+    p.add_argument("--socket", default=None, help="daemon socket (default: $GRADESCRAPE_SOCKET or ~/.gradescrape/daemon.sock)")
+    p.add_argument("--no-daemon", action="store_true", help="run in this process even if a daemon is running")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    d = sub.add_parser("daemon", help="manage the background daemon")
+    d.add_argument("action", choices=("start", "stop", "status"))
+    d.add_argument("--foreground", action="store_true")
+    # also accepted after the action, which is how start launches the detached daemon
+    d.add_argument("--socket", dest="daemon_socket", default=None, help=argparse.SUPPRESS)
+
+    c = sub.add_parser("list-assignments", help="list a course's assignments")
+    c.add_argument("course", type=int)
+    c.add_argument("--refresh", action="store_true", help="reload the daemon's cached assignment list first")
+
+    c = sub.add_parser("get-settings", help="print an assignment's settings")
+    c.add_argument("course", type=int)
+    c.add_argument("assignment")
+
+    c = sub.add_parser("set-due-date", help="change an assignment's due date")
+    c.add_argument("course", type=int)
+    c.add_argument("assignment")
+    c.add_argument("due_date")
+    c.add_argument("--late-due-date", default=None)
+
+    c = sub.add_parser("deploy-autograder", help="upload an autograder, unless it is unchanged since the last deploy")
+    c.add_argument("course", type=int)
+    c.add_argument("assignment")
+    c.add_argument("source", help="autograder directory or zip")
+    c.add_argument("--force", action="store_true")
+
+    sub.add_parser("stats", help="request timings and cache statistics")
+    return p
+
+def main(argv=None) -> int:
+    args = parser().parse_args(argv)
+    path = getattr(args, "daemon_socket", None) or args.socket or socket_path()
+    if args.command == "daemon":
+        return daemon_command(args.action, path, args.foreground)
+
+    cmd_args = {k: v for k, v in vars(args).items() if k not in ("command", "socket", "no_daemon")}
+    if args.command == "deploy-autograder":
+        # the daemon has its own working directory
+        cmd_args["source"] = os.path.abspath(cmd_args["source"])
+    reply = None
+    if not args.no_daemon:
+        try:
+            reply = send(args.command, cmd_args, path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+    if reply is None:
+        reply = run_local(args.command, cmd_args)
+    if not reply["ok"]:
+        print(reply["error"], file=sys.stderr)
+        return 1
+    json.dump(reply["result"], sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,49 @@
 
 import datetime
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from .util import BASE_URL, to_gradescope_time, validate_late_submissions, validate_group_size, validate_leaderboard
 import typing
 from .assignment import Assignment, AutograderAssignment, PDFAssignment
+from . import extract
+from .catalog import AssignmentCatalog, CatalogEntry
+from .outline import Outline
+from .snapshot import SettingsTable, snapshot_settings
+from .scores import Gradebook, export_gradebook
+from .multipart import as_path
 if typing.TYPE_CHECKING:
     from .session import Session
-__all__ = ["Course"]
+__all__ = ["Course", "BulkResult"]
+
+# catalog type -> the class to hand out for it
+TYPE_CLASSES = {"ProgrammingAssignment": AutograderAssignment, "PDFAssignment": PDFAssignment}
+
 class Course:
-    def __init__(self, session, cid: int):
+    """A course. Get these from Session.get_course(), which hands out one object per course id."""
+    __slots__ = ("ses", "cid", "catalog", "short_name", "name", "term", "role", "_assignments", "_lock", "__weakref__")
+
+    def __init__(self, session, cid: int, catalog_max_age: typing.Optional[float]=300):
         self.ses: Session = session
         self.cid: int = cid
-        #self.name: str = None
-        #self.is_instr: str = None
-        #self.assignment: str = []
+        # name/id index used by get_assignment_by_name. See catalog.AssignmentCatalog.
+        self.catalog: AssignmentCatalog = AssignmentCatalog(self, catalog_max_age)
+        # identity map for get_assignment: assignment id -> its object, for as long as anyone holds on to it
+        self._assignments: "weakref.WeakValueDictionary[int, Assignment]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        # filled in by Session.get_courses; None for courses from get_course
+        self.short_name: typing.Optional[str] = None
+        self.name: typing.Optional[str] = None
+        self.term: typing.Optional[str] = None
+        # "instructor" or "student"
+        self.role: typing.Optional[str] = None
+
+    def __repr__(self):
+        return f"<Course {self.cid} {self.short_name!r}>" if self.short_name else f"<Course {self.cid}>"
 
     def get_url(self) -> str:
-        return f"{BASE_URL}/courses/{self.cid}"
+        return f"{self.ses.base_url}/courses/{self.cid}"
     
     #def reload_dashboard(self):
     #    """Reloads name, instructor, and assignment data from Gradescope.
@@ -25,42 +52,74 @@ class Course:
     #    for a in self.ses.get_soup(self.get_url()).find_all("a", href=True):
     #        pass
     
-    def list_assignments(self) -> typing.Dict[str, int]:
+    def list_assignments(self, refresh: bool=False) -> typing.Dict[str, int]:
         """Lists the current assignment names -> ids for the current course.
         Returns a mapping of assignment name to assignment id.
+
+        Served from the assignment catalog, which is only reloaded once it is stale (see
+        catalog.AssignmentCatalog) or when refresh is True.
         
         (It's a more likely use case to select an assignment by name to get the id rather
         than the other way around, and assignment names are guarenteed to be unique.)
         """
-        assgn_table = self.ses.get_soup(self.get_url() + f"/assignments")
-        d = {}
-        for a in assgn_table.find("table", id="assignments-instructor-table").find_all("a"):
-            href = a['href']
-            assgn_base = f"/courses/{self.cid}/assignments/"
-            if href.startswith(assgn_base):
-                rest = href[len(assgn_base):]
-                if "/" in rest:
-                    continue
-                try:
-                    aid = int(rest)
-                except ValueError:
-                    continue
-                d[a.text] = aid
-        return d
-
+        if refresh:
+            self.catalog.refresh()
+        return self.catalog.names()
+
+    def refresh(self):
+        """Reloads the assignment catalog, e.g. after assignments were added or renamed from the web UI."""
+        self.catalog.refresh()
+
+    def get_assignment(self, aid: int, assign_type=None) -> Assignment:
+        """The object for assignment aid. The same object is returned for as long as anyone holds on to
+        it, so its memoized settings and outline are shared rather than fetched again.
+
+        assign_type picks the class. None means the most specific one known: the class of the existing
+        object, or the catalog's idea of the type (without loading the catalog), or Assignment.
+        A plain Assignment asked for as a subclass is narrowed in place, keeping its identity."""
+        aid = int(aid)
+        with self._lock:
+            a = self._assignments.get(aid)
+            if assign_type is None:
+                entry = self.catalog.by_id.get(aid)
+                assign_type = TYPE_CLASSES.get(entry.type, Assignment) if entry is not None else Assignment
+                if a is not None and not issubclass(assign_type, type(a)):
+                    return a
+            if a is not None:
+                if isinstance(a, assign_type):
+                    return a
+                if issubclass(assign_type, type(a)):
+                    a.__class__ = assign_type
+                    return a
+            a = self._assignments[aid] = assign_type(self, aid)
+            return a
 
     def get_assignment_by_name(self, assign_name: str, assign_type=Assignment):
         """Gets the assignment object for a current assignment. 
-        The assignment object returned will be of the type specified in `assign_type`.
-        Returns None if assignment does not exist."""
+        The assignment object returned will be of the type specified in `assign_type`,
+        or if that's None, of the type the catalog knows it to be (falling back to Assignment).
+        Returns None if assignment does not exist.
+
+        Names are looked up in the course's catalog, which only reloads the assignments page once it is
+        older than catalog_max_age; call refresh() to pick up changes made elsewhere sooner."""
 
-        assignments = self.list_assignments()
-        if assign_name not in assignments:
+        entry = self.catalog.get_by_name(assign_name)
+        if entry is None:
             return None
-        return assign_type(self, assignments[assign_name])
+        return self.get_assignment(entry.aid, assign_type)
         #v = self.ses.get_soup(self.get_url() + f"/assignments/{aid}")
 
 
+    def snapshot_settings(self, max_workers: int=8, names: typing.Iterable[str]=None) -> SettingsTable:
+        """Fetches every assignment's settings concurrently into a column-wise SettingsTable,
+        for auditing a course. See snapshot.py for the export formats."""
+        return snapshot_settings(self, max_workers, names)
+
+    def export_gradebook(self, max_workers: int=8, names: typing.Iterable[str]=None) -> Gradebook:
+        """Fetches every assignment's scores export (or just those of names) concurrently and joins them
+        into a students x assignments Gradebook of NumPy arrays. Needs numpy. See scores.py."""
+        return export_gradebook(self, max_workers, names)
+
     def create_prog_assignment(self, title: str, total_points: float, 
                                 release_date: datetime.datetime, due_date: datetime.datetime,
                                 allow_late_submissions=False, late_due_date: datetime.datetime=None, student_submission=True,
@@ -97,12 +156,7 @@ class Course:
         """
 
 
-        # pull csrf token from the assignments page
-        page = self.ses.get_soup(self.get_url() + "/assignments")
-        csrf_token = page.find("meta", attrs={"name": "csrf-token"})['content'] 
-
         data = {
-            'authenticity_token': csrf_token, # csrf token
             'assignment[title]': title, # assignment title
             'assignment[total_points]': str(total_points), # total points of assignment
             'assignment[type]': "ProgrammingAssignment", # prog assignment
@@ -117,17 +171,19 @@ class Course:
         validate_group_size(group_size, group_submission, data)
         validate_leaderboard(leaderboard_max_entries, leaderboard_enabled, data)
 
-        r = self.ses.req.post(self.get_url() + "/assignments", data=data)
+        # csrf token comes from the session cache, falling back to scraping the assignments page
+        r = self.ses.request_csrf("POST", self.get_url() + "/assignments", csrf_url=self.get_url() + "/assignments", data=data)
         r.raise_for_status()
 
         aid = int(urlparse(r.url).path.split("/")[4])
-        return AutograderAssignment(self, aid)
+        self.catalog.add(CatalogEntry(aid, title, "ProgrammingAssignment", release_date, due_date))
+        return self.get_assignment(aid, AutograderAssignment)
 
-    def create_pdf_assignment(self, title: str, template_pdf_name: str, template_pdf_data: bytes, 
+    def create_pdf_assignment(self, title: str, template_pdf_name: str, template_pdf_data, 
                                 release_date: datetime.datetime, due_date: datetime.datetime, submission_type: str="image", 
                                 allow_late_submissions=False, late_due_date: datetime.datetime=None, student_submission=True,
                                 enforce_time_limit=False, time_limit=None, group_submission=False, group_size=None, anon_grading=False,
-                                template_visible=False) -> PDFAssignment:
+                                template_visible=False, progress=None) -> PDFAssignment:
 
         """
         Creates a new PDF assignment. Students usually submit PDFs to this assignment to be graded manually.
@@ -146,7 +202,8 @@ class Course:
         template_pdf_name       --  the display filename of the pdf template, like "Homework_1.pdf". Students will
                                     see this name when Gradescope tells them in the submit menu that there's a provided 
                                     pdf for them to reference.
-        template_pdf_data       --  the bytes data of the template PDF. Typically read from an open(..., "rb") call.
+        template_pdf_data       --  the template PDF, as bytes, a path (str or os.PathLike), or a binary file object. Paths and files
+                                    are streamed rather than read into memory.
         release_date            --  datetime.datetime of the release date of the assignment.
         due_date                --  datetime.datetime of the due date of the assignment
 
@@ -164,19 +221,21 @@ class Course:
         enforce_time_limit      -- whether to enforce the assignment's time limit. Defaulse False.
         group_submission        -- whether to allow groups in assignment submissions. Defaults False.
         anon_grading            -- whether to anonymize student submissions when grading
+        progress                -- optional callback taking (bytes_sent, total_bytes, bytes_per_second), called
+                                   as the template is uploaded.
         group_size              -- integer describing the size of the group, or None for no maximum or not applicable. Defaults None.
 
         
         Returns: Assignment object with the current session object embedded and the newly created assignment id.
         """
 
-        # Run GET on /assignments to fetch the csrf token. The csrf token is the same
-        # for all form submits on this page.
+        # The csrf token is the same for all form submits in the session, so it comes from
+        # Session's csrf cache (which scrapes /assignments if it has to).
         # Data is multipart/form-data.
 
-        # authenticity_token: scraped from /assignments
+        # authenticity_token: filled in by Session.request_csrf
         # template_pdf: the file template pdf, as a form file
-        # For code, use  {'template_pdf': ('template.pdf', open('template.pdf','rb'), 'application/pdf')}
+        # Sent as a streaming body, see multipart.py.
 
         # assignment[title]: str
         # assignment[student_submission]: false for instr, true for student. Only thing on form that uses true or false.
@@ -194,12 +253,8 @@ class Course:
         # strangely, gradescope forms send both 0 and 1 for enabled options. Let's hope the server-side
         # scripts specifically only check for the existence of ones.
 
-        page = self.ses.get_soup(self.get_url() + "/assignments")
-        csrf_token = page.find("meta", attrs={"name": "csrf-token"})['content'] 
-
-        files = {"template_pdf": (template_pdf_name, template_pdf_data, 'application/pdf')}
+        files = {"template_pdf": (template_pdf_name, as_path(template_pdf_data), 'application/pdf')}
         data = {
-            'authenticity_token': csrf_token,
             'assignment[title]': title,
             'assignment[student_submission]': str(bool(student_submission)).lower(),
             'assignment[release_date_string]':  to_gradescope_time(release_date),
@@ -219,8 +274,91 @@ class Course:
                 raise ValueError("enforce_time_limit requires time_limit to be an integer >= 1")
             data['assignment[time_limit_in_minutes]'] = int(time_limit)
         
-        r = self.ses.req.post(self.get_url() + "/assignments", data=data, files=files)
+        r = self.ses.request_csrf("POST", self.get_url() + "/assignments", csrf_url=self.get_url() + "/assignments", 
+                                  data=data, files=files, _progress=progress)
         r.raise_for_status()
 
         aid = int(urlparse(r.url).path.split("/")[4])
-        return PDFAssignment(self, aid)
\ No newline at end of file
+        self.catalog.add(CatalogEntry(aid, title, "PDFAssignment", release_date, due_date))
+        return self.get_assignment(aid, PDFAssignment)
+
+    def create_assignments_bulk(self, specs: typing.List[dict], max_workers: int=8) -> typing.List["BulkResult"]:
+        """
+        Creates many assignments at once on a bounded worker pool.
+
+        Each spec is a dict of keyword arguments for create_prog_assignment or create_pdf_assignment,
+        plus a "type" key of "prog" or "pdf" picking which one, and optionally a follow-up step:
+
+        {"type": "prog", "title": "HW1", "total_points": 10, "release_date": ..., "due_date": ...,
+         "autograder_zip": "build/hw1.zip"}
+        {"type": "pdf", "title": "Exam", "template_pdf_name": "exam.pdf", "template_pdf_data": pdf_bytes,
+         "release_date": ..., "due_date": ..., "outline": [...]}
+
+        "autograder_zip" is uploaded with update_autograder_zip and "outline" is patched in with
+        update_outline after the assignment is created.
+
+        A failing spec doesn't abort the batch: each item's exception is recorded on its result. If the
+        assignment was created but its follow-up step failed, the result has both the assignment and
+        the error, so the assignment can be fixed up rather than created a second time.
+        All items share the session's cached csrf token, which is fetched once up front.
+
+        Returns: a list of BulkResult, in the same order as specs.
+        """
+        self.ses.get_csrf(self.get_url() + "/assignments")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = [BulkResult(spec) for spec in specs]
+            futures = [pool.submit(self._provision, dict(res.spec), res) for res in results]
+            for res, fut in zip(results, futures):
+                try:
+                    fut.result()
+                except Exception as e:
+                    res.error = e
+        return results
+
+    def _provision(self, spec: dict, res: "BulkResult"):
+        """Creates the assignment for spec and runs its follow-up step, filling in res.assignment
+        as soon as the assignment exists."""
+        kind = spec.pop("type", None)
+        autograder_zip = spec.pop("autograder_zip", None)
+        zip_name = spec.pop("zip_name", None)
+        outline = spec.pop("outline", None)
+        if outline is not None:
+            # catch a bad outline before creating anything
+            Outline.from_spec(outline)
+        if kind == "prog":
+            if outline is not None:
+                raise ValueError("outline only applies to pdf assignments")
+            assgn = res.assignment = self.create_prog_assignment(**spec)
+            if autograder_zip is not None:
+                assgn.update_autograder_zip(autograder_zip, zip_name)
+        elif kind == "pdf":
+            if autograder_zip is not None:
+                raise ValueError("autograder_zip only applies to programming assignments")
+            assgn = res.assignment = self.create_pdf_assignment(**spec)
+            if outline is not None:
+                # a new assignment has no questions yet, so there's nothing to read first.
+                # None means the outline was empty, so there was nothing to send.
+                r = assgn.update_outline(outline, current=Outline())
+                if r is not None:
+                    r.raise_for_status()
+        else:
+            raise ValueError(f"spec type should be 'prog' or 'pdf', not {kind!r}")
+
+
+class BulkResult:
+    """Outcome of one spec passed to Course.create_assignments_bulk. assignment is set whenever the
+    assignment got created, even if error says a later step failed."""
+    def __init__(self, spec: dict):
+        self.spec: dict = spec
+        self.assignment: Assignment = None
+        self.error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f"<BulkResult {self.spec.get('title')!r} ok aid={self.assignment.aid}>"
+        created = f" (created aid={self.assignment.aid})" if self.assignment is not None else ""
+        return f"<BulkResult {self.spec.get('title')!r} failed{created}: {self.error!r}>"
@@ -0,0 +1,99 @@
+"""Fanning out across many courses at once.
+
+crawl() loads each course's assignment catalog and, optionally, every assignment's settings, on a
+bounded pool of threads. Work is handed out round-robin across courses, so one course with a
+thousand assignments can't starve the rest, and per_course can additionally cap how many requests
+any one course has in flight. Each result is yielded as soon as it's ready:
+
+    for res in ses.crawl(settings=True):
+        if res.kind == "settings" and res.ok:
+            print(res.course.short_name, res.entry.name, res.data["due_date"])
+"""
+import collections
+import typing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .snapshot import fetch_settings
+if typing.TYPE_CHECKING:
+    from .catalog import CatalogEntry
+    from .course import Course
+
+__all__ = ["crawl", "CrawlResult"]
+
+class CrawlResult:
+    """
+    One finished piece of a crawl.
+
+    kind    -- "catalog": data is the course's list of catalog.CatalogEntry.
+               "settings": entry is the assignment, and data its settings as from get_settings(),
+               plus a "type" key.
+    error   -- the exception, if this piece failed. The rest of the crawl carries on regardless.
+    """
+    def __init__(self, course: "Course", kind: str, entry: "CatalogEntry"=None, data=None, error: Exception=None):
+        self.course: "Course" = course
+        self.kind: str = kind
+        self.entry: typing.Optional["CatalogEntry"] = entry
+        self.data = data
+        self.error: typing.Optional[Exception] = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        what = self.kind if self.entry is None else f"{self.kind} {self.entry.aid}"
+        return f"<CrawlResult {self.course.cid} {what}{' failed: ' + repr(self.error) if self.error else ''}>"
+
+
+def _catalog(course):
+    course.refresh()
+    return list(course.catalog.by_id.values())
+
+def _settings(course, entry):
+    kind, settings = fetch_settings(course, entry.aid)
+    return dict(settings, type=kind)
+
+def crawl(courses: typing.Iterable["Course"], settings: bool=False, max_workers: int=8,
+          per_course: typing.Optional[int]=None) -> typing.Iterator[CrawlResult]:
+    """Crawls courses, yielding CrawlResults as they complete. See the module docstring."""
+    # per course, the work not yet started: (kind, entry) pairs
+    queues: typing.Dict[int, collections.deque] = {}
+    by_cid: typing.Dict[int, "Course"] = {}
+    for c in courses:
+        by_cid[c.cid] = c
+        queues[c.cid] = collections.deque([("catalog", None)])
+    rotation = collections.deque(queues)
+    in_flight: typing.Dict[int, int] = collections.Counter()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        def fill():
+            # hand out work round-robin, skipping courses that are out of work or at their limit
+            idle = 0
+            while len(running) < max_workers and rotation and idle < len(rotation):
+                cid = rotation[0]
+                rotation.rotate(-1)
+                if not queues[cid] or (per_course is not None and in_flight[cid] >= per_course):
+                    idle += 1
+                    continue
+                idle = 0
+                kind, entry = queues[cid].popleft()
+                course = by_cid[cid]
+                fut = pool.submit(_catalog, course) if kind == "catalog" else pool.submit(_settings, course, entry)
+                running[fut] = (course, kind, entry)
+                in_flight[cid] += 1
+
+        fill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                course, kind, entry = running.pop(fut)
+                in_flight[course.cid] -= 1
+                try:
+                    data = fut.result()
+                except Exception as e:
+                    yield CrawlResult(course, kind, entry, error=e)
+                    continue
+                if kind == "catalog" and settings:
+                    queues[course.cid].extend(("settings", e) for e in data)
+                yield CrawlResult(course, kind, entry, data)
+            fill()
@@ -0,0 +1,205 @@
+"""A long-running local daemon holding a warm, logged-in Session, for the gradescrape CLI.
+
+Starting Python, importing requests/bs4/lxml, the TLS handshake and logging in cost far more than the
+one page load a typical ops command needs. The daemon pays for all of that once and then serves
+commands over a Unix socket (readable only by its owner), keeping the connection pool, csrf token,
+response cache and assignment catalogs warm in between:
+
+    $ gradescrape daemon start
+    $ gradescrape list-assignments 123456
+
+Wire format: the client sends one JSON object, {"command": name, "args": {...}}, on a single line,
+and gets one back: {"ok": true, "result": ...} or {"ok": false, "error": "..."}. Dates travel as
+ISO 8601 strings.
+
+Credentials come from the environment:
+    GRADESCRAPE_EMAIL, GRADESCRAPE_PASSWORD  -- used to log in (and log back in when the session expires)
+    GRADESCRAPE_STORE_KEY                     -- if set, the session is kept in a store.SessionStore too,
+                                                 so it survives daemon restarts
+    GRADESCRAPE_BASE_URL                      -- talk to somewhere other than gradescope.com
+"""
+import datetime
+import json
+import os
+import socketserver
+import threading
+import typing
+from .assignment import AutograderAssignment, PDFAssignment
+from .course import Course
+from .deploy import Deployer
+from .session import Session
+from .snapshot import fetch_settings
+from .util import BASE_URL
+
+__all__ = ["Workspace", "DaemonServer", "COMMANDS", "default_dir", "socket_path", "serve"]
+
+def default_dir() -> str:
+    return os.environ.get("GRADESCRAPE_DIR") or os.path.expanduser("~/.gradescrape")
+
+def socket_path() -> str:
+    return os.environ.get("GRADESCRAPE_SOCKET") or os.path.join(default_dir(), "daemon.sock")
+
+
+class Workspace:
+    """
+    What commands run against: a logged-in Session plus one Course per course id, so every course's
+    assignment catalog is loaded once and reused. The CLI builds one of these in-process when no
+    daemon is running.
+    """
+    def __init__(self, ses: Session=None, state_dir: str=None):
+        self.state_dir: str = state_dir or default_dir()
+        self.ses: Session = ses if ses is not None else self.login()
+        self.courses: typing.Dict[int, Course] = {}
+        self.lock = threading.Lock()
+        self._deployer: Deployer = None
+
+    def login(self) -> Session:
+        email, password = os.environ.get("GRADESCRAPE_EMAIL"), os.environ.get("GRADESCRAPE_PASSWORD")
+        base_url = os.environ.get("GRADESCRAPE_BASE_URL", BASE_URL)
+        if os.environ.get("GRADESCRAPE_STORE_KEY"):
+            from .store import SessionStore
+            store = SessionStore(os.path.join(self.state_dir, "session"))
+            return store.session(email, password, base_url=base_url, cache=True, rate_limiter=True)
+        if email is None or password is None:
+            raise ValueError("set GRADESCRAPE_EMAIL and GRADESCRAPE_PASSWORD to log in")
+        ses = Session(base_url=base_url, cache=True, rate_limiter=True)
+        ses.login(email, password)
+        ses.relogin = lambda: ses.login(email, password)
+        return ses
+
+    def course(self, cid) -> Course:
+        cid = int(cid)
+        with self.lock:
+            if cid not in self.courses:
+                self.courses[cid] = self.ses.get_course(cid)
+            return self.courses[cid]
+
+    def aid(self, course: Course, assignment) -> int:
+        """Assignment ids pass through; anything else is looked up as a name."""
+        if isinstance(assignment, int) or str(assignment).isdigit():
+            return int(assignment)
+        entry = course.catalog.get_by_name(assignment)
+        if entry is None:
+            raise KeyError(f"no assignment named {assignment!r} in course {course.cid}")
+        return entry.aid
+
+    @property
+    def deployer(self) -> Deployer:
+        with self.lock:
+            if self._deployer is None:
+                os.makedirs(self.state_dir, exist_ok=True)
+                self._deployer = Deployer(os.path.join(self.state_dir, "autograder_manifest.json"))
+            return self._deployer
+
+    def close(self):
+        if self._deployer is not None:
+            self._deployer.close()
+
+
+def list_assignments(ws: Workspace, course, refresh=False):
+    c = ws.course(course)
+    if refresh:
+        c.refresh()
+    return [{"aid": e.aid, "name": e.name, "release_date": e.release_date, "due_date": e.due_date}
+            for e in c.catalog]
+
+def get_settings(ws: Workspace, course, assignment):
+    c = ws.course(course)
+    kind, settings = fetch_settings(c, ws.aid(c, assignment))
+    return dict(settings, type=kind)
+
+def set_due_date(ws: Workspace, course, assignment, due_date, late_due_date=None):
+    c = ws.course(course)
+    aid = ws.aid(c, assignment)
+    kind, settings = fetch_settings(c, aid)
+    settings["due_date"] = datetime.datetime.fromisoformat(due_date)
+    if late_due_date is not None:
+        settings["allow_late_submissions"] = True
+        settings["late_due_date"] = datetime.datetime.fromisoformat(late_due_date)
+    assgn = c.get_assignment(aid, AutograderAssignment if kind == "ProgrammingAssignment" else PDFAssignment)
+    assgn.update_settings(**settings)
+    return {"aid": aid, "due_date": settings["due_date"], "late_due_date": settings["late_due_date"]}
+
+def deploy_autograder(ws: Workspace, course, assignment, source, force=False):
+    c = ws.course(course)
+    result = ws.deployer.deploy(c.get_assignment(ws.aid(c, assignment), AutograderAssignment), source, force=force)
+    return {"aid": result.assignment.aid, "sha256": result.sha256, "size": result.size, "uploaded": result.uploaded}
+
+def stats(ws: Workspace):
+    return {"requests": ws.ses.stats(), "cache": ws.ses.cache.stats() if ws.ses.cache is not None else None,
+            "deploy": ws.deployer.stats()}
+
+# command name -> function(workspace, **args)
+COMMANDS = {
+    "list-assignments": list_assignments,
+    "get-settings": get_settings,
+    "set-due-date": set_due_date,
+    "deploy-autograder": deploy_autograder,
+    "stats": stats,
+}
+
+def run_command(ws: Workspace, command: str, args: dict):
+    if command not in COMMANDS:
+        raise ValueError(f"unknown command {command!r}")
+    return COMMANDS[command](ws, **args)
+
+def _json_default(o):
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    raise TypeError(f"can't send {type(o).__name__} as json")
+
+def encode(msg: dict) -> bytes:
+    return json.dumps(msg, default=_json_default).encode() + b"\n"
+
+
+class Handler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            msg = json.loads(line)
+            if msg.get("command") == "shutdown":
+                self.wfile.write(encode({"ok": True, "result": None}))
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            reply = {"ok": True, "result": run_command(self.server.workspace, msg["command"], msg.get("args") or {})}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(encode(reply))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, workspace: Workspace):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        # the socket hands out a logged-in session, so nobody else gets to connect to it
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, Handler)
+        finally:
+            os.umask(umask)
+        self.path: str = path
+        self.workspace: Workspace = workspace
+
+    def server_close(self):
+        super().server_close()
+        self.workspace.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def serve(path: str=None, workspace: Workspace=None, ready: typing.Callable[[], typing.Any]=None):
+    """Logs in and serves commands on path until sent a shutdown command."""
+    server = DaemonServer(path or socket_path(), workspace or Workspace())
+    if ready is not None:
+        ready()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
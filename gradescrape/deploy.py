@@ -0,0 +1,268 @@
+"""Content-addressed autograder deployment.
+
+Every autograder upload makes Gradescope rebuild the assignment's docker image, which is slow, so
+redeploying from CI on every commit should only upload when the autograder actually changed.
+
+build_zip() turns a directory into a byte-for-byte reproducible zip (sorted entries, fixed timestamps
+and permissions, files compressed in parallel), so the zip's sha256 identifies its content. Deployer
+keeps a manifest of what was last deployed to each assignment and skips uploads whose hash matches.
+
+    with Deployer("autograders.json") as deployer:
+        for assgn in assignments:
+            deployer.deploy(assgn, "autograder/")
+        print(deployer.stats())
+"""
+import collections
+import datetime
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import typing
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+if typing.TYPE_CHECKING:
+    from .assignment import AutograderAssignment
+
+__all__ = ["build_zip", "sha256_file", "Deployer", "DeployResult"]
+
+DEFAULT_IGNORE = (".git", ".hg", ".svn", "__pycache__", "*.pyc", ".DS_Store", "*.swp")
+
+# 1980-01-01 00:00, the earliest time a zip can hold
+ZIP_DATE = (0 << 9) | (1 << 5) | 1
+ZIP_TIME = 0
+ZIP_MAX = 0xFFFFFFFF
+# files bigger than this are compressed in a streaming fashion by the writer, rather than
+# read whole into memory by a worker
+STREAM_THRESHOLD = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def _walk(src_dir, ignore):
+    """Sorted (archive name, path, mode) of every regular file under src_dir, skipping ignored names."""
+    def ignored(name):
+        return any(fnmatch.fnmatch(name, pat) for pat in ignore)
+    ret = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if not ignored(d)]
+        for f in files:
+            path = os.path.join(root, f)
+            if ignored(f) or not os.path.isfile(path):
+                continue
+            arcname = os.path.relpath(path, src_dir).replace(os.sep, "/")
+            mode = 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+            ret.append((arcname, path, mode))
+    ret.sort()
+    return ret
+
+def _compress(path, level):
+    with open(path, "rb") as f:
+        data = f.read()
+    c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return zlib.crc32(data), len(data), c.compress(data) + c.flush()
+
+def _local_header(name, crc, csize, usize):
+    return struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, 0x0800, 8, ZIP_TIME, ZIP_DATE,
+                       crc, csize, usize, len(name), 0) + name
+
+def _check_size(arcname, *sizes):
+    if any(s > ZIP_MAX for s in sizes):
+        raise ValueError(f"{arcname} is too big for a (non-zip64) zip file")
+
+def build_zip(src_dir: str, dest: str, ignore: typing.Iterable[str]=DEFAULT_IGNORE, level: int=6,
+              max_workers: int=None) -> str:
+    """
+    Builds a reproducible zip of src_dir at dest and returns its sha256 hex digest.
+
+    The same files always give the same bytes: entries are sorted, every timestamp is 1980-01-01,
+    permissions are normalized to 644/755 and nothing about the building machine is recorded.
+    Files are deflated on a thread pool (zlib releases the GIL), a bounded number at a time;
+    large files are streamed through the compressor instead of being read whole.
+    """
+    entries = _walk(src_dir, tuple(ignore))
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    central = []
+    with open(dest, "wb") as out, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # keep a bounded window of compressions in flight, written out in order
+        pending = collections.deque()
+        def submit(i):
+            arcname, path, mode = entries[i]
+            if os.path.getsize(path) > STREAM_THRESHOLD:
+                pending.append((entries[i], None))
+            else:
+                pending.append((entries[i], pool.submit(_compress, path, level)))
+        nxt = 0
+        while nxt < len(entries) or pending:
+            while nxt < len(entries) and len(pending) < max_workers * 2:
+                submit(nxt)
+                nxt += 1
+            (arcname, path, mode), fut = pending.popleft()
+            name = arcname.encode("utf-8")
+            offset = out.tell()
+            if fut is not None:
+                crc, usize, data = fut.result()
+                _check_size(arcname, usize, len(data), offset)
+                out.write(_local_header(name, crc, len(data), usize))
+                out.write(data)
+                csize = len(data)
+            else:
+                # write a placeholder header, stream the data, then patch crc and sizes in
+                out.write(_local_header(name, 0, 0, 0))
+                c = zlib.compressobj(level, zlib.DEFLATED, -15)
+                crc, usize, csize = 0, 0, 0
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        crc = zlib.crc32(chunk, crc)
+                        usize += len(chunk)
+                        data = c.compress(chunk)
+                        csize += len(data)
+                        out.write(data)
+                data = c.flush()
+                csize += len(data)
+                out.write(data)
+                _check_size(arcname, usize, csize, offset)
+                end = out.tell()
+                out.seek(offset + 14)
+                out.write(struct.pack("<III", crc, csize, usize))
+                out.seek(end)
+            central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | 20, 20, 0x0800, 8,
+                                       ZIP_TIME, ZIP_DATE, crc, csize, usize, len(name), 0, 0, 0, 0,
+                                       ((0o100000 | mode) << 16), offset) + name)
+        cd_offset = out.tell()
+        for c in central:
+            out.write(c)
+        cd_size = out.tell() - cd_offset
+        if len(central) > 0xFFFF or cd_offset > ZIP_MAX:
+            raise ValueError(f"{src_dir} has too much in it for a (non-zip64) zip file")
+        out.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(central), len(central), cd_size, cd_offset, 0))
+    return sha256_file(dest)
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DeployResult:
+    """What Deployer.deploy did for one assignment."""
+    def __init__(self, assignment, sha256: str, size: int, uploaded: bool, error: Exception=None):
+        self.assignment = assignment
+        self.sha256: str = sha256
+        self.size: int = size
+        self.uploaded: bool = uploaded
+        self.error: Exception = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        what = "failed: " + repr(self.error) if self.error else ("uploaded" if self.uploaded else "unchanged")
+        return f"<DeployResult {self.assignment.aid} {(self.sha256 or '')[:12]} {what}>"
+
+
+class Deployer:
+    """
+    Deploys autograders, skipping assignments whose last deployed zip has the same sha256.
+
+    manifest_path   -- JSON file recording "course id/assignment id" -> last deployed hash. Kept across runs;
+                       in CI, cache it between jobs.
+    build_dir       -- where zips built from directories go. Defaults to a temporary directory, removed
+                       by close() (or on leaving a with block); a build_dir you pass in is left alone.
+
+    Directories are built with build_zip() once per Deployer, however many assignments they go to.
+    """
+    def __init__(self, manifest_path: str="autograder_manifest.json", build_dir: str=None, **zip_kwargs):
+        self.manifest_path: str = manifest_path
+        self._tmp = None if build_dir else tempfile.TemporaryDirectory(prefix="gradescrape-")
+        self.build_dir: str = build_dir or self._tmp.name
+        self.zip_kwargs = zip_kwargs
+        self.lock = threading.Lock()
+        self._built: typing.Dict[str, typing.Tuple[str, str]] = {}
+        self._build_locks: typing.Dict[str, threading.Lock] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest: dict = json.load(f)
+        else:
+            self.manifest = {}
+
+        self.uploads: int = 0
+        self.skipped: int = 0
+        self.bytes_uploaded: int = 0
+        self.bytes_saved: int = 0
+
+    def prepare(self, source: str) -> typing.Tuple[str, str]:
+        """Returns (zip path, sha256) for a directory (built once and remembered) or an existing zip file."""
+        source = os.path.abspath(source)
+        with self.lock:
+            lock = self._build_locks.setdefault(source, threading.Lock())
+        with lock:
+            if source not in self._built:
+                if os.path.isdir(source):
+                    dest = os.path.join(self.build_dir, hashlib.sha256(source.encode()).hexdigest()[:16] + ".zip")
+                    self._built[source] = (dest, build_zip(source, dest, **self.zip_kwargs))
+                else:
+                    self._built[source] = (source, sha256_file(source))
+            return self._built[source]
+
+    def key(self, assignment: "AutograderAssignment") -> str:
+        return f"{assignment.course.cid}/{assignment.aid}"
+
+    def deploy(self, assignment: "AutograderAssignment", source: str, force: bool=False, progress=None) -> DeployResult:
+        """Uploads source (a directory or zip file) to assignment, unless it's already what's deployed there."""
+        path, digest = self.prepare(source)
+        size = os.path.getsize(path)
+        key = self.key(assignment)
+        with self.lock:
+            unchanged = self.manifest.get(key, {}).get("sha256") == digest
+            if unchanged and not force:
+                self.skipped += 1
+                self.bytes_saved += size
+                return DeployResult(assignment, digest, size, False)
+
+        assignment.update_autograder_zip(path, "autograder.zip", progress=progress)
+        with self.lock:
+            self.uploads += 1
+            self.bytes_uploaded += size
+            self.manifest[key] = {"sha256": digest, "size": size,
+                                  "deployed_at": datetime.datetime.now().isoformat(timespec="seconds")}
+            self._save()
+        return DeployResult(assignment, digest, size, True)
+
+    def deploy_many(self, targets: typing.Iterable[typing.Tuple["AutograderAssignment", str]],
+                    max_workers: int=4, force: bool=False) -> typing.List[DeployResult]:
+        """Deploys (assignment, source) pairs concurrently. Failures are recorded per result rather than raised."""
+        def one(target):
+            assignment, source = target
+            try:
+                return self.deploy(assignment, source, force)
+            except Exception as e:
+                return DeployResult(assignment, None, 0, False, e)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(one, targets))
+
+    def _save(self):
+        # write-and-rename, so a crash mid-write never leaves a truncated manifest
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def stats(self) -> dict:
+        return {"uploads": self.uploads, "skipped": self.skipped,
+                "bytes_uploaded": self.bytes_uploaded, "bytes_saved": self.bytes_saved}
+
+    def close(self):
+        """Removes the temporary build directory, if this Deployer made one."""
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,222 @@
+"""Bulk downloads of an assignment's submissions, resumable across runs.
+
+Assignment.download_submissions(dest) lists the submissions on the review grades page and fetches
+each one on a bounded pool of threads, streaming it to dest/<submission id>.<pdf|zip> a chunk at a
+time, so memory use doesn't grow with file or assignment size. Files are written to a ".part" file
+first and renamed into place once complete.
+
+Progress is kept in a manifest in dest (MANIFEST_NAME), one JSON record per line, appended as
+downloads start and finish. A rerun after an interruption skips every submission the manifest lists
+as done (and whose file is still there), and continues partial files where they stopped with an HTTP
+range request. If-Range makes the server send the whole file again if it changed in between.
+"""
+import json
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+if typing.TYPE_CHECKING:
+    from .assignment import Assignment
+
+__all__ = ["MANIFEST_NAME", "DownloadResult", "DownloadReport", "SubmissionDownloader"]
+
+MANIFEST_NAME = ".gradescrape-downloads.jsonl"
+CHUNK_SIZE = 256 * 1024
+
+class DownloadResult:
+    """What happened to one submission. resumed_from is how many bytes of it an earlier run had already fetched."""
+    def __init__(self, sid: int, path: str, size: int=0, skipped: bool=False, resumed_from: int=0, error: Exception=None):
+        self.sid: int = sid
+        self.path: str = path
+        self.size: int = size
+        self.skipped: bool = skipped
+        self.resumed_from: int = resumed_from
+        self.error: typing.Optional[Exception] = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        what = "failed: " + repr(self.error) if self.error else "skipped" if self.skipped else f"{self.size} bytes"
+        return f"<DownloadResult {self.sid} {what}>"
+
+
+class DownloadReport:
+    """
+    Totals for a download_submissions() run. Only failures are kept individually, so a report for
+    thousands of submissions stays small.
+
+    failed      -- submission id -> exception. Rerunning picks these up again.
+    bytes       -- bytes fetched by this run (so not counting skipped files or resumed prefixes).
+    """
+    def __init__(self, dest: str):
+        self.dest: str = dest
+        self.downloaded: int = 0
+        self.skipped: int = 0
+        self.resumed: int = 0
+        self.bytes: int = 0
+        self.failed: typing.Dict[int, Exception] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def add(self, res: DownloadResult):
+        if res.error is not None:
+            self.failed[res.sid] = res.error
+        elif res.skipped:
+            self.skipped += 1
+        else:
+            self.downloaded += 1
+            self.bytes += res.size - res.resumed_from
+            self.resumed += bool(res.resumed_from)
+
+    def __repr__(self):
+        return (f"<DownloadReport {self.downloaded} downloaded ({self.resumed} resumed), {self.skipped} skipped, "
+                f"{len(self.failed)} failed, {self.bytes} bytes>")
+
+
+class SubmissionDownloader:
+    """
+    Downloads an assignment's submissions into dest. See the module docstring.
+
+    fmt         -- file extension Gradescope serves the submissions as: "pdf" or "zip".
+    """
+    def __init__(self, assignment: "Assignment", dest: str, fmt: str, max_workers: int=4):
+        self.assignment: "Assignment" = assignment
+        self.ses = assignment.ses
+        self.dest: str = dest
+        self.fmt: str = fmt
+        self.max_workers: int = max_workers
+        self.manifest_path: str = os.path.join(dest, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        os.makedirs(dest, exist_ok=True)
+        # submission id -> its latest manifest record
+        self.manifest: typing.Dict[int, dict] = self._load()
+
+    def _load(self) -> typing.Dict[int, dict]:
+        records = {}
+        if not os.path.exists(self.manifest_path):
+            return records
+        with open(self.manifest_path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # the last line of a run that was killed mid-write
+                    continue
+                records[rec["sid"]] = rec
+        # compact, so resuming over and over doesn't grow the file. write-and-rename, like deploy.Deployer.
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            for rec in records.values():
+                f.write(json.dumps(rec) + "\n")
+        os.replace(tmp, self.manifest_path)
+        return records
+
+    def _record(self, rec: dict):
+        with self.lock:
+            self.manifest[rec["sid"]] = rec
+            with open(self.manifest_path, "a") as f:
+                f.write(json.dumps(rec) + "\n")
+
+    def path(self, sid: int) -> str:
+        return os.path.join(self.dest, f"{sid}.{self.fmt}")
+
+    def url(self, sid: int) -> str:
+        return self.assignment.get_url() + f"/submissions/{sid}.{self.fmt}"
+
+    def done(self, sid: int) -> bool:
+        rec = self.manifest.get(sid)
+        path = self.path(sid)
+        return rec is not None and rec.get("done") and os.path.exists(path) and os.path.getsize(path) == rec["size"]
+
+    def fetch(self, sub: dict) -> DownloadResult:
+        """Downloads one submission (a row from Assignment.list_submissions()), resuming a partial file if there is one."""
+        sid = sub["sid"]
+        path = self.path(sid)
+        if self.done(sid):
+            return DownloadResult(sid, path, self.manifest[sid]["size"], skipped=True)
+        part = path + ".part"
+        have = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = (self.manifest.get(sid) or {}).get("validator")
+        if not validator:
+            # without one we can't tell whether the file changed since, so start over
+            have = 0
+
+        # ranges count bytes of the encoded body, so ask for it unencoded (pdfs and zips barely compress anyway)
+        headers = {"Accept-Encoding": "identity"}
+        if have:
+            headers["Range"] = f"bytes={have}-"
+            headers["If-Range"] = validator
+        try:
+            r = self.ses.get_stream(self.url(sid), headers=headers)
+        except requests.HTTPError as e:
+            if e.response is not None:
+                e.response.close()
+            if not have or e.response is None or e.response.status_code != 416:
+                raise
+            # our partial file is bigger than the server's; start over
+            have = 0
+            r = self.ses.get_stream(self.url(sid), headers={"Accept-Encoding": "identity"})
+
+        with r:
+            if have and not (r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {have}-")):
+                # the server sent the whole file, e.g. because it changed
+                have = 0
+            if r.status_code == 206:
+                total = int(r.headers["Content-Range"].rsplit("/", 1)[-1])
+            else:
+                total = int(r.headers["Content-Length"]) if "Content-Length" in r.headers else None
+            if not have:
+                validator = r.headers.get("ETag") or r.headers.get("Last-Modified")
+                self._record({"sid": sid, "name": sub.get("name"), "email": sub.get("email"), "done": False,
+                              "validator": validator})
+            size = have
+            with open(part, "ab" if have else "wb") as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+        if total is not None and size != total:
+            raise IOError(f"submission {sid}: got {size} of {total} bytes")
+        os.replace(part, path)
+        self._record({"sid": sid, "name": sub.get("name"), "email": sub.get("email"), "done": True,
+                      "validator": validator, "file": os.path.basename(path), "size": size})
+        return DownloadResult(sid, path, size, resumed_from=have)
+
+    def _fetch(self, sub: dict) -> DownloadResult:
+        try:
+            return self.fetch(sub)
+        except Exception as e:
+            return DownloadResult(sub["sid"], self.path(sub["sid"]), error=e)
+
+    def run(self, submissions: typing.Iterable[dict]=None,
+            on_result: typing.Callable[[DownloadResult], typing.Any]=None) -> DownloadReport:
+        """Downloads submissions (default: all of them), at most max_workers at a time. Failures are recorded
+        in the report rather than raised. on_result, if given, is called with each DownloadResult as it finishes."""
+        if submissions is None:
+            submissions = self.assignment.list_submissions()
+        report = DownloadReport(self.dest)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def deliver(res):
+                report.add(res)
+                if on_result is not None:
+                    on_result(res)
+            def finish(done):
+                for fut in done:
+                    pending.discard(fut)
+                    deliver(fut.result())
+            # only a couple of tasks per worker are queued at a time, however many submissions there are
+            for sub in submissions:
+                if self.done(sub["sid"]):
+                    deliver(DownloadResult(sub["sid"], self.path(sub["sid"]), self.manifest[sub["sid"]]["size"], skipped=True))
+                    continue
+                while len(pending) >= 2 * self.max_workers:
+                    finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+                pending.add(pool.submit(self._fetch, sub))
+            while pending:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+        return report
@@ -0,0 +1,267 @@
+"""Targeted extraction of the few nodes we actually read off Gradescope pages.
+
+Building a full BeautifulSoup tree for a 1000-row assignments table just to read the table links
+(or worse, one meta tag) costs more than the request itself, so the hot paths go through here instead.
+
+Backends:
+  "lxml"        -- lxml.html with XPath, and an incremental pull parser for the csrf token
+                   that stops as soon as the <meta> tag has been seen. The default.
+  "bs4"         -- BeautifulSoup with a SoupStrainer so only the interesting tags are kept. This saves
+                   memory, but not much time: lxml still tokenizes the whole page for bs4, and for
+                   big tables building the kept tags costs as much as a full soup (a 1000-row
+                   assignments table takes longer than with a plain BeautifulSoup). It's here for
+                   environments without the others, not for speed.
+  "selectolax"  -- selectolax's lexbor parser, if installed (pip install selectolax).
+"""
+import collections.abc
+import datetime
+import re
+import typing
+from bs4 import BeautifulSoup, SoupStrainer
+from .util import from_gradescope_time
+
+__all__ = ["BACKENDS", "DEFAULT_BACKEND", "csrf_token", "assignment_rows", "assignment_table", "submission_rows", "select_options", "course_list"]
+
+BACKENDS = ("lxml", "bs4", "selectolax")
+DEFAULT_BACKEND = "lxml"
+
+def _check_backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown parser backend {backend!r}, expected one of {BACKENDS}")
+    return backend
+
+def csrf_token(html: str, backend: str=None) -> typing.Optional[str]:
+    """Returns the content of <meta name="csrf-token">, or None if the page doesn't have one."""
+    backend = _check_backend(backend)
+    if backend == "lxml":
+        from lxml import etree
+        parser = etree.HTMLPullParser(events=("start",), tag="meta")
+        # the meta tag lives in <head>, so don't bother parsing the body at all
+        end = html.find("</head>")
+        parser.feed(html if end < 0 else html[:end])
+        for _, el in parser.read_events():
+            if el.get("name") == "csrf-token":
+                return el.get("content")
+        return None
+    elif backend == "bs4":
+        soup = BeautifulSoup(html, features="lxml", parse_only=SoupStrainer("meta", attrs={"name": "csrf-token"}))
+        meta = soup.find("meta")
+        return meta.get("content") if meta else None
+    else:
+        from selectolax.lexbor import LexborHTMLParser
+        node = LexborHTMLParser(html).css_first('meta[name="csrf-token"]')
+        return node.attributes.get("content") if node else None
+
+def _id_after(href: str, base: str) -> typing.Optional[int]:
+    # the id in href, if it's base followed by a number and nothing else
+    if not href.startswith(base):
+        return None
+    rest = href[len(base):]
+    if "/" in rest:
+        return None
+    try:
+        return int(rest)
+    except ValueError:
+        return None
+
+class _Cells(collections.abc.Sequence):
+    """A row's cells, whose text is only extracted for the cells that are actually read."""
+    __slots__ = ("nodes", "text")
+    def __init__(self, nodes, text):
+        self.nodes = nodes
+        self.text = text
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.text(n) for n in self.nodes[i]]
+        return self.text(self.nodes[i])
+
+def _css_string(s: str) -> str:
+    """s as a quoted CSS string, for attribute selectors."""
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\a ") + '"'
+
+def _table_rows(html, backend, table_id=None):
+    """(links, cells) for each <tr> of the table with id table_id (or of every table): links as
+    (href, text) pairs, cells as the text of the row's own <td>s and <th>s, in order."""
+    if backend == "lxml":
+        import lxml.html
+        doc = lxml.html.fromstring(html)
+        rows = doc.xpath('//table[@id=$id]//tr', id=table_id) if table_id else doc.xpath('//table//tr')
+        # walking the elements beats an xpath query per row
+        return (([(a.get("href"), a.text_content()) for a in tr.iter("a") if a.get("href") is not None],
+                 # a <tr>'s children are its cells, and indexing it only makes proxies for the ones read
+                 _Cells(tr, lxml.html.HtmlElement.text_content))
+                for tr in rows)
+    elif backend == "bs4":
+        strainer = SoupStrainer("table", id=table_id) if table_id else SoupStrainer("table")
+        table = BeautifulSoup(html, features="lxml", parse_only=strainer)
+        return (([(a['href'], a.text) for a in tr.find_all("a", href=True)],
+                 _Cells(tr.find_all(("td", "th"), recursive=False), lambda td: td.text))
+                for tr in table.find_all("tr"))
+    else:
+        from selectolax.lexbor import LexborHTMLParser
+        return (([(a.attributes.get("href") or "", a.text()) for a in tr.css("a[href]")],
+                 _Cells([td for td in tr.iter() if td.tag in ("td", "th")], lambda td: td.text()))
+                for tr in LexborHTMLParser(html).css(f"table[id={_css_string(table_id)}] tr" if table_id else "table tr"))
+
+def _time(cell: str) -> typing.Optional["datetime.datetime"]:
+    try:
+        return from_gradescope_time(" ".join(cell.split()))
+    except ValueError:
+        return None
+
+def _date_columns(header: typing.List[str]) -> typing.Optional[typing.Tuple[int, int]]:
+    """(release, due) column indexes going by the header cells, or None if it doesn't name them."""
+    names = [" ".join(c.split()).lower() for c in header]
+    release = next((i for i, n in enumerate(names) if "releas" in n), None)
+    due = next((i for i, n in enumerate(names) if "due" in n.split()), None)
+    return None if release is None and due is None else (release, due)
+
+def assignment_rows(html: str, cid: int, backend: str=None) -> typing.List[dict]:
+    """Parses the instructor assignments table on /courses/{cid}/assignments into one dict per assignment,
+    with keys "aid", "name", "release_date" and "due_date" (None where the cell is empty or not a date).
+
+    The date columns are found once, from the header (Released/Due), or failing that, as the first
+    two cells of the first row that read as Gradescope times. Other cells are never parsed as dates."""
+    rows = _table_rows(html, _check_backend(backend), "assignments-instructor-table")
+    assgn_base = f"/courses/{cid}/assignments/"
+    ret = []
+    cols = None
+    # assignments tend to share release and due times, so each distinct cell is parsed once
+    times: typing.Dict[str, typing.Optional[datetime.datetime]] = {}
+    def parse(cell):
+        if cell not in times:
+            times[cell] = _time(cell)
+        return times[cell]
+    for links, cells in rows:
+        for href, text in links:
+            aid = _id_after(href, assgn_base)
+            if aid is not None:
+                break
+        else:
+            if cols is None and not links:
+                cols = _date_columns(cells)
+            continue
+        if cols is None:
+            found = [i for i, c in enumerate(cells) if _time(c) is not None]
+            cols = tuple((found + [None, None])[:2])
+        release, due = (None if i is None or i >= len(cells) else parse(cells[i]) for i in cols)
+        ret.append({"aid": aid, "name": text, "release_date": release, "due_date": due})
+    return ret
+
+def assignment_table(html: str, cid: int, backend: str=None) -> typing.Dict[str, int]:
+    """Parses the instructor assignments table on /courses/{cid}/assignments into name -> assignment id."""
+    return {row["name"]: row["aid"] for row in assignment_rows(html, cid, backend)}
+
+# what the review grades table says about a submission whose grading hasn't finished
+PENDING = re.compile(r"\b(queued|pending|running|processing|in progress|regrading|waiting)\b", re.I)
+
+def submission_rows(html: str, cid: int, aid: int, backend: str=None) -> typing.List[dict]:
+    """Parses the submissions table on /courses/{cid}/assignments/{aid}/review_grades into one dict per
+    submission, with keys
+        "sid"       -- the submission id
+        "name"      -- the link text, i.e. the student or group
+        "email"     -- the first cell that looks like one, or None
+        "score"     -- the first cell that reads as a number, or None
+        "status"    -- "pending" while (auto)grading is queued or running, else "graded" if there's a
+                       score and "ungraded" if not.
+    Students who haven't submitted have no link and are left out."""
+    base = f"/courses/{cid}/assignments/{aid}/submissions/"
+    ret = []
+    for links, cells in _table_rows(html, _check_backend(backend)):
+        for href, text in links:
+            sid = _id_after(href, base)
+            if sid is not None:
+                break
+        else:
+            continue
+        cells = [" ".join(c.split()) for c in cells]
+        email = next((c for c in cells if "@" in c and len(c.split()) == 1), None)
+        score = None
+        for c in cells:
+            try:
+                score = float(c)
+                break
+            except ValueError:
+                pass
+        status = "pending" if any(PENDING.search(c) for c in cells) else "graded" if score is not None else "ungraded"
+        ret.append({"sid": sid, "name": " ".join(text.split()), "email": email, "score": score, "status": status})
+    return ret
+
+def select_options(html: str, field_name: str, backend: str=None) -> typing.List[typing.Tuple[str, str]]:
+    """(value, text) for each <option> of the <select> named field_name, or [] if there's no such select."""
+    backend = _check_backend(backend)
+    if backend == "lxml":
+        import lxml.html
+        doc = lxml.html.fromstring(html)
+        options = [(o.get("value"), o.text_content()) for o in doc.xpath('(//select[@name=$n])[1]//option', n=field_name)]
+    elif backend == "bs4":
+        sel = BeautifulSoup(html, features="lxml", parse_only=SoupStrainer("select", attrs={"name": field_name})).find("select")
+        options = [(o.get("value"), o.text) for o in sel.find_all("option")] if sel else []
+    else:
+        from selectolax.lexbor import LexborHTMLParser
+        sel = LexborHTMLParser(html).css_first(f'select[name={_css_string(field_name)}]')
+        options = [(o.attributes.get("value"), o.text()) for o in sel.css("option")] if sel else []
+    # like a browser, an option without a value submits its text
+    return [(text if value is None else value, " ".join(text.split())) for value, text in options]
+
+def _course_list_nodes(html, backend):
+    """(kind, node) in document order, kind being "heading", "term" or "course". Nodes come back as
+    (text of the node, href, {child class: text}) so the caller needn't care about the backend."""
+    def cls_test(classes):
+        return "heading" if "pageHeading" in classes else "term" if "courseList--term" in classes else \
+            "course" if "courseBox" in classes else None
+    child_classes = ("courseBox--shortname", "courseBox--name")
+    if backend == "lxml":
+        import lxml.html
+        doc = lxml.html.fromstring(html)
+        def has(c):
+            return f'contains(concat(" ", normalize-space(@class), " "), " {c} ")'
+        for el in doc.xpath(f'//*[{has("pageHeading")} or {has("courseList--term")} or {has("courseBox")}]'):
+            kind = cls_test(el.get("class", "").split())
+            children = {c: el.xpath(f'string(.//*[{has(c)}])') for c in child_classes} if kind == "course" else {}
+            yield kind, (el.text_content(), el.get("href", ""), children)
+    elif backend == "bs4":
+        soup = BeautifulSoup(html, features="lxml")
+        for el in soup.find_all(lambda tag: cls_test(tag.get("class") or ()) is not None):
+            kind = cls_test(el.get("class"))
+            children = {}
+            if kind == "course":
+                for c in child_classes:
+                    found = el.find(class_=c)
+                    children[c] = found.text if found else ""
+            yield kind, (el.text, el.get("href", ""), children)
+    else:
+        from selectolax.lexbor import LexborHTMLParser
+        for el in LexborHTMLParser(html).css(".pageHeading, .courseList--term, .courseBox"):
+            kind = cls_test((el.attributes.get("class") or "").split())
+            children = {}
+            if kind == "course":
+                for c in child_classes:
+                    found = el.css_first("." + c)
+                    children[c] = found.text() if found else ""
+            yield kind, (el.text(), el.attributes.get("href") or "", children)
+
+def course_list(html: str, backend: str=None) -> typing.List[dict]:
+    """Parses the course list on /account into one dict per course, with keys "cid", "short_name",
+    "name", "term" and "role" ("instructor" or "student", going by the heading the course is listed under)."""
+    backend = _check_backend(backend)
+    ret, role, term = [], None, None
+    for kind, (text, href, children) in _course_list_nodes(html, backend):
+        text = " ".join(text.split())
+        if kind == "heading":
+            role = "instructor" if "instructor" in text.lower() else "student" if "student" in text.lower() else role
+        elif kind == "term":
+            term = text
+        else:
+            parts = href.rstrip("/").split("/")
+            # skips the "add a course" box, which is a button
+            if len(parts) < 2 or parts[-2] != "courses" or not parts[-1].isdigit():
+                continue
+            ret.append({"cid": int(parts[-1]), "short_name": " ".join(children["courseBox--shortname"].split()),
+                        "name": " ".join(children["courseBox--name"].split()), "term": term, "role": role})
+    return ret
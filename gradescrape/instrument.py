@@ -0,0 +1,184 @@
+"""Per-request instrumentation.
+
+Session keeps an Instrumentation around (Session.instrumentation) whose layer sits right above the
+network, so every exchange -- get_soup, post_soup, get_html and raw Session.req calls alike -- is
+recorded with its route template, status, size and timings, and the parse step of get_soup and friends
+is recorded separately. Records go to pluggable sinks:
+
+    HistogramSink   -- in-memory per-route samples; what Session.stats() reports from.
+    JSONLSink       -- one JSON object per line, for offline analysis.
+    SpanSink        -- spans on an OpenTelemetry-style tracer (anything with start_span()).
+
+    ses.instrumentation.add_sink(JSONLSink("trace.jsonl"))
+    ...
+    print(ses.stats())
+"""
+import collections
+import json
+import math
+import re
+import threading
+import time
+import typing
+from urllib.parse import urlparse
+from .transport import Layer, connection_timings
+
+__all__ = ["Record", "Instrumentation", "InstrumentLayer", "HistogramSink", "JSONLSink", "SpanSink", "route_template"]
+
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def route_template(url: str) -> str:
+    """/courses/123/assignments/456/edit -> /courses/{id}/assignments/{id}/edit"""
+    return ID_SEGMENT.sub("/{id}", urlparse(url).path or "/")
+
+class Record:
+    """
+    One measurement. phase is "http" for a network exchange and "parse" for turning a page into
+    something usable. Times are in seconds; dns/connect/tls are None when a pooled connection was
+    reused, and ttfb is the time until the response headers arrived.
+    """
+    __slots__ = ("phase", "method", "route", "url", "status", "bytes", "start",
+                 "dns", "connect", "tls", "ttfb", "total", "error")
+    def __init__(self, phase: str, method: str, url: str, start: float, **kwargs):
+        self.phase: str = phase
+        self.method: str = method
+        self.url: str = url
+        self.route: str = route_template(url)
+        self.start: float = start
+        for name in ("status", "bytes", "dns", "connect", "tls", "ttfb", "total", "error"):
+            setattr(self, name, kwargs.get(name))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class HistogramSink:
+    """Keeps the last max_samples totals (plus ttfb and bytes) per phase and route."""
+    def __init__(self, max_samples: int=10000):
+        self.max_samples: int = max_samples
+        self.samples: typing.Dict[tuple, collections.deque] = {}
+        self.counts: typing.Dict[tuple, collections.Counter] = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, rec: Record):
+        key = (rec.phase, rec.method, rec.route)
+        with self.lock:
+            if key not in self.samples:
+                self.samples[key] = collections.deque(maxlen=self.max_samples)
+                self.counts[key] = collections.Counter()
+            self.samples[key].append((rec.total, rec.ttfb, rec.bytes or 0))
+            c = self.counts[key]
+            c["count"] += 1
+            if rec.phase == "http":
+                c["errors"] += rec.error is not None or (rec.status or 0) >= 400
+                c["new_connections"] += rec.connect is not None
+
+    def summary(self) -> dict:
+        """{"METHOD /route": {"http": {...}, "parse": {...}}} with count, errors, p50/p95/p99 and mean."""
+        ret = {}
+        with self.lock:
+            items = [(k, list(v), dict(self.counts[k])) for k, v in self.samples.items()]
+        for (phase, method, route), samples, counts in sorted(items, key=lambda x: x[0][1:]):
+            totals = sorted(s[0] for s in samples)
+            stats = dict(counts, mean=sum(totals) / len(totals),
+                         p50=percentile(totals, 50), p95=percentile(totals, 95), p99=percentile(totals, 99))
+            if phase == "http":
+                ttfbs = sorted(s[1] for s in samples if s[1] is not None)
+                stats["ttfb_p50"] = percentile(ttfbs, 50)
+                stats["bytes"] = sum(s[2] for s in samples)
+            ret.setdefault(f"{method} {route}", {})[phase] = stats
+        return ret
+
+
+def percentile(sorted_values: list, pct: float) -> typing.Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[k]
+
+
+class JSONLSink:
+    """Appends each record to a file as a line of JSON."""
+    def __init__(self, path: str):
+        self.f = open(path, "a", buffering=1)
+        self.lock = threading.Lock()
+
+    def __call__(self, rec: Record):
+        line = json.dumps(rec.as_dict())
+        with self.lock:
+            self.f.write(line + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+class SpanSink:
+    """
+    Reports records as spans on an OpenTelemetry-style tracer, e.g.
+    SpanSink(opentelemetry.trace.get_tracer("gradescrape")). Anything with
+    start_span(name, start_time=ns, attributes={}) returning an object with end(end_time=ns) works.
+    """
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __call__(self, rec: Record):
+        start_ns = int(rec.start * 1e9)
+        attrs = {"http.method": rec.method, "http.route": rec.route, "gradescrape.phase": rec.phase}
+        if rec.status is not None:
+            attrs["http.status_code"] = rec.status
+        if rec.bytes is not None:
+            attrs["http.response_content_length"] = rec.bytes
+        for name in ("dns", "connect", "tls", "ttfb"):
+            if getattr(rec, name) is not None:
+                attrs["gradescrape." + name] = getattr(rec, name)
+        span = self.tracer.start_span(f"{rec.phase} {rec.method} {rec.route}", start_time=start_ns, attributes=attrs)
+        span.end(end_time=start_ns + int((rec.total or 0) * 1e9))
+
+
+class Instrumentation:
+    def __init__(self, sinks: typing.Iterable[typing.Callable[[Record], typing.Any]]=()):
+        self.histogram = HistogramSink()
+        self.sinks = [self.histogram] + list(sinks)
+
+    def add_sink(self, sink: typing.Callable[[Record], typing.Any]):
+        self.sinks.append(sink)
+
+    def emit(self, rec: Record):
+        for sink in self.sinks:
+            sink(rec)
+
+    def parsed(self, method: str, url: str, start: float, seconds: float):
+        """Records the parse of a page, timed by the caller."""
+        self.emit(Record("parse", method, url, start, total=seconds))
+
+
+class InstrumentLayer(Layer):
+    """Layer recording an http Record for every exchange that goes through it."""
+    def __init__(self, inner, instrumentation: Instrumentation):
+        super().__init__(inner)
+        self.instrumentation: Instrumentation = instrumentation
+
+    def send(self, request, **kwargs):
+        start = time.time()
+        t0 = time.perf_counter()
+        connection_timings(reset=True)
+        try:
+            r = self.inner.send(request, **kwargs)
+        except Exception as e:
+            self.instrumentation.emit(Record("http", request.method, request.url, start,
+                                             total=time.perf_counter() - t0, error=repr(e), **connection_timings()))
+            raise
+        ttfb = time.perf_counter() - t0
+        timings = connection_timings()
+        if not kwargs.get("stream"):
+            # requests would read the body right after this anyway; doing it here lets us time it
+            r.content
+        rec = Record("http", request.method, request.url, start, status=r.status_code,
+                     ttfb=ttfb, total=time.perf_counter() - t0, **timings)
+        if not kwargs.get("stream"):
+            rec.bytes = len(r.content)
+        elif "Content-Length" in r.headers:
+            rec.bytes = int(r.headers["Content-Length"])
+        self.instrumentation.emit(rec)
+        return r
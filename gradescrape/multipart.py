@@ -0,0 +1,169 @@
+"""Streaming multipart/form-data bodies.
+
+requests builds multipart bodies in memory, which for a 500 MB autograder zip means holding the file
+(and then a second copy of it inside the body) at once. MultipartEncoder instead reads each file a chunk
+at a time while the body is being sent, and knows its total length up front so the upload still goes
+out with a Content-Length rather than chunked.
+"""
+import io
+import os
+import pathlib
+import time
+import typing
+import uuid
+
+__all__ = ["FilePart", "MultipartEncoder", "file_parts", "as_path"]
+
+CHUNK_SIZE = 64 * 1024
+
+# percent-encoding of the characters that would end a quoted header parameter, as browsers (and
+# urllib3's format_multipart_header_param) do
+_PARAM_ESCAPES = {ord('"'): "%22", ord("\r"): "%0D", ord("\n"): "%0A"}
+
+# progress(bytes_sent, total_bytes, bytes_per_second)
+ProgressCallback = typing.Callable[[int, int, float], None]
+
+class FilePart:
+    """
+    One file field. source can be bytes or str (the content itself, as with requests), an os.PathLike
+    path, or a seekable binary file object; file objects are read from their current position, and
+    every time the part is sent it starts from there again.
+    """
+    def __init__(self, filename: str, source, content_type: str="application/octet-stream"):
+        if isinstance(source, str):
+            source = source.encode()
+        self.filename: str = filename
+        self.source = source
+        self.content_type: str = content_type
+        if isinstance(source, (bytes, bytearray)):
+            self.size: int = len(source)
+        elif isinstance(source, os.PathLike):
+            self.size = os.path.getsize(source)
+        elif hasattr(source, "read") and hasattr(source, "seek"):
+            self.start: int = source.tell()
+            source.seek(0, io.SEEK_END)
+            self.size = source.tell() - self.start
+            source.seek(self.start)
+        else:
+            raise TypeError("file data should be bytes, str, an os.PathLike path, or a seekable binary file object")
+
+    def open(self) -> typing.BinaryIO:
+        if isinstance(self.source, (bytes, bytearray)):
+            return io.BytesIO(self.source)
+        if isinstance(self.source, os.PathLike):
+            return open(self.source, "rb")
+        self.source.seek(self.start)
+        return self.source
+
+    def done(self, fh):
+        # only close what we opened ourselves
+        if isinstance(self.source, os.PathLike):
+            fh.close()
+
+
+def as_path(source):
+    """Makes a str source a pathlib.Path, for the upload methods whose file arguments take a path as str."""
+    return pathlib.Path(source) if isinstance(source, str) else source
+
+
+def file_parts(files: dict) -> typing.Dict[str, FilePart]:
+    """Converts a requests-style files dict ({field: (filename, data, content_type)}) into FileParts."""
+    ret = {}
+    for name, spec in files.items():
+        if isinstance(spec, FilePart):
+            ret[name] = spec
+        else:
+            ret[name] = FilePart(*spec)
+    return ret
+
+
+class MultipartEncoder:
+    """
+    A multipart/form-data body that is generated while it is read.
+
+    fields      -- plain form fields, {name: value}. Values are str()'d.
+    files       -- {name: FilePart}.
+    progress    -- optional callback, called after each chunk with (bytes_sent, total_bytes, bytes_per_second).
+
+    Pass it as the data= of a request along with headers={"Content-Type": encoder.content_type}.
+    """
+    def __init__(self, fields: dict, files: typing.Dict[str, FilePart], progress: ProgressCallback=None,
+                 chunk_size: int=CHUNK_SIZE):
+        self.boundary: str = uuid.uuid4().hex
+        self.content_type: str = f"multipart/form-data; boundary={self.boundary}"
+        self.progress = progress
+        self.chunk_size: int = chunk_size
+
+        self._segments = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            self._segments.append(self._header(name) + b"\r\n" + str(value).encode() + b"\r\n")
+        for name, part in files.items():
+            self._segments.append(self._header(name, part.filename, part.content_type) + b"\r\n")
+            self._segments.append(part)
+            self._segments.append(b"\r\n")
+        self._segments.append(f"--{self.boundary}--\r\n".encode())
+        self.len: int = sum(s.size if isinstance(s, FilePart) else len(s) for s in self._segments)
+
+        self.sent: int = 0
+        self.started: float = None
+        self._chunks = self._generate()
+        self._buf = b""
+
+    def _header(self, name, filename=None, content_type=None) -> bytes:
+        h = f'--{self.boundary}\r\nContent-Disposition: form-data; name="{str(name).translate(_PARAM_ESCAPES)}"'
+        if filename is not None:
+            h += f'; filename="{filename.translate(_PARAM_ESCAPES)}"\r\nContent-Type: {content_type}'
+        return (h + "\r\n").encode()
+
+    def _generate(self):
+        for seg in self._segments:
+            if not isinstance(seg, FilePart):
+                yield seg
+                continue
+            fh = seg.open()
+            try:
+                left = seg.size
+                while left > 0:
+                    chunk = fh.read(min(self.chunk_size, left))
+                    if not chunk:
+                        raise IOError(f"{seg.filename} was truncated while it was being uploaded")
+                    left -= len(chunk)
+                    yield chunk
+            finally:
+                seg.done(fh)
+
+    def throughput(self) -> float:
+        """Average upload rate so far, in bytes per second."""
+        if self.started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def read(self, size: int=-1) -> bytes:
+        if self.started is None:
+            self.started = time.monotonic()
+        if size is None or size < 0:
+            size = self.len
+        while len(self._buf) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        out, self._buf = self._buf[:size], self._buf[size:]
+        if out:
+            self.sent += len(out)
+            if self.progress is not None:
+                self.progress(self.sent, self.len, self.throughput())
+        return out
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __len__(self):
+        return self.len
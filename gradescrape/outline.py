@@ -0,0 +1,249 @@
+"""PDF assignment outlines as typed trees, and diffs between them.
+
+Gradescope's outline endpoint replaces the whole outline on every PATCH, and questions sent without
+their id are created afresh (losing their rubrics). PDFAssignment.update_outline therefore reads the
+live outline first, matches each desired question to a live one -- by title among its siblings, in
+order -- and only sends anything if something differs. When it does, matched questions carry their
+live id and crop regions, so Gradescope updates them in place.
+
+A desired question whose title no live sibling has is new, and a live one left unmatched is removed,
+rubric and grades included: a rename is never guessed, since giving an unrelated question the old
+one's id would hand it the old one's rubric and grades. To rename a question, say so, either with
+the live question's id in its spec ({"title": "Short answer", "id": 1234, ...}) or with
+renames={"Proofs": "Short answer"} (nested questions by path, like "Part 1/Proofs").
+
+Outlines are validated before any request is made: titles must be non-empty, weights finite and
+non-negative, questions nest at most two levels deep, and a parent's weight, if given, has to equal
+the sum of its children's.
+"""
+import json
+import math
+import typing
+
+__all__ = ["OutlineNode", "Outline", "OutlineDiff", "parse_outline_page"]
+
+# where new questions point the grader in the page, unless told otherwise
+DEFAULT_CROP = [{"x1": 0, "x2": 100, "y1": 90, "y2": 100, "page_number": None}]
+MAX_DEPTH = 2
+
+class OutlineNode:
+    """
+    One question (or subquestion). id is Gradescope's question id, None for questions that don't exist yet.
+    A question with children is worth the sum of their weights.
+    """
+    __slots__ = ("id", "title", "weight", "children", "crop_rect_list")
+    def __init__(self, title: str, weight: float=None, children: typing.List["OutlineNode"]=None,
+                 id: int=None, crop_rect_list: list=None):
+        self.id: typing.Optional[int] = id
+        self.title: str = title
+        self.children: typing.List[OutlineNode] = children or []
+        self.weight: float = sum(c.weight for c in self.children) if self.children else weight
+        self.crop_rect_list: typing.Optional[list] = crop_rect_list
+
+    def __repr__(self):
+        return f"<OutlineNode {self.id} {self.title!r} {self.weight}>"
+
+    def to_raw(self) -> dict:
+        ret = {"title": self.title, "weight": float(self.weight),
+               "crop_rect_list": self.crop_rect_list or DEFAULT_CROP}
+        if self.id is not None:
+            ret["id"] = self.id
+        if self.children:
+            ret["children"] = [c.to_raw() for c in self.children]
+        return ret
+
+    def to_spec(self) -> dict:
+        ret = {"title": self.title, "weight": self.weight}
+        if self.children:
+            ret["children"] = [c.to_spec() for c in self.children]
+        return ret
+
+
+def _node_from_spec(q, path, depth):
+    if not isinstance(q, dict):
+        raise ValueError(f"outline{path}: expected a dict, not {type(q).__name__}")
+    title = q.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError(f"outline{path}: title must be a non-empty string")
+    children = q.get("children") or []
+    if children and depth >= MAX_DEPTH:
+        raise ValueError(f"outline{path} ({title!r}): questions nest at most {MAX_DEPTH} levels deep")
+    children = [_node_from_spec(c, f"{path}[{i}]", depth + 1) for i, c in enumerate(children)]
+    weight = q.get("weight")
+    if weight is not None:
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            raise ValueError(f"outline{path} ({title!r}): weight {weight!r} is not a number") from None
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"outline{path} ({title!r}): weight must be finite and non-negative, not {weight}")
+    if children:
+        total = sum(c.weight for c in children)
+        if weight is not None and not math.isclose(weight, total, abs_tol=1e-9):
+            raise ValueError(f"outline{path} ({title!r}): weight {weight} doesn't match its children's total of {total}")
+    elif weight is None:
+        raise ValueError(f"outline{path} ({title!r}): questions without children need a weight")
+    qid = q.get("id")
+    if qid is not None and (isinstance(qid, bool) or not isinstance(qid, int)):
+        raise ValueError(f"outline{path} ({title!r}): id should be a Gradescope question id, not {qid!r}")
+    return OutlineNode(title, weight, children, qid, q.get("crop_rect_list"))
+
+def _node_from_raw(q):
+    return OutlineNode(q.get("title") or "", float(q.get("weight") or 0),
+                       [_node_from_raw(c) for c in q.get("children") or []],
+                       q.get("id"), q.get("crop_rect_list"))
+
+
+class Outline:
+    """A list of top-level OutlineNodes, plus the name/sid regions of the assignment, if known."""
+    def __init__(self, questions: typing.List[OutlineNode]=None, identification_regions: dict=None):
+        self.questions: typing.List[OutlineNode] = questions or []
+        self.identification_regions: dict = identification_regions or {"name": None, "sid": None}
+
+    @classmethod
+    def from_spec(cls, outline: list) -> "Outline":
+        """Validates and converts the list-of-dicts format update_outline() takes. Raises ValueError."""
+        if not isinstance(outline, list):
+            raise ValueError("outline should be a list of questions")
+        return cls([_node_from_spec(q, f"[{i}]", 1) for i, q in enumerate(outline)])
+
+    @classmethod
+    def from_raw(cls, questions: list, identification_regions: dict=None) -> "Outline":
+        """From Gradescope's own representation, as found on /outline/edit."""
+        return cls([_node_from_raw(q) for q in questions], identification_regions)
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def total_weight(self) -> float:
+        return sum(q.weight for q in self.questions)
+
+    def to_raw(self) -> dict:
+        """The body update_outline_raw() PATCHes."""
+        return {"assignment": {"identification_regions": self.identification_regions},
+                "question_data": [q.to_raw() for q in self.questions]}
+
+    def to_spec(self) -> list:
+        return [q.to_spec() for q in self.questions]
+
+    def diff(self, desired: "Outline", renames: typing.Dict[str, str]=None) -> "OutlineDiff":
+        """What it takes to get from this (live) outline to desired. The result's merged outline has
+        desired's structure with the ids and crop regions of the live questions it matched.
+
+        Questions match by id, if desired gives one, then by renames ({live path: new title}), then by
+        title. Raises ValueError for an id or rename that doesn't match any live question."""
+        d = OutlineDiff()
+        renames = dict(renames or {})
+        merged = _merge(self.questions, desired.questions, "", "", d, renames)
+        if renames:
+            raise ValueError(f"no live question to rename at {sorted(renames)}")
+        d.merged = Outline(merged, self.identification_regions)
+        return d
+
+
+class OutlineDiff:
+    """
+    changes     -- (kind, path, old, new) tuples, kind being "add", "remove", "title", "weight" or "move".
+                   path names the question, like "Q2/b".
+    merged      -- the outline to send: desired's questions, with live ids where they matched.
+    """
+    def __init__(self):
+        self.changes: typing.List[typing.Tuple[str, str, typing.Any, typing.Any]] = []
+        self.merged: Outline = None
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __str__(self):
+        lines = []
+        for kind, path, old, new in self.changes:
+            if kind == "add":
+                lines.append(f"+ {path} ({new})")
+            elif kind == "remove":
+                lines.append(f"- {path} ({old})")
+            else:
+                lines.append(f"~ {path}: {kind} {old!r} -> {new!r}")
+        return "\n".join(lines)
+
+
+def _merge(live, desired, prefix, live_prefix, d, renames):
+    # prefix is the path of desired's parent, live_prefix that of live's (they differ under a rename).
+    # Matched renames are popped off renames, so the caller can tell which ones found nothing.
+    match: typing.List[typing.Optional[int]] = [None] * len(desired)
+    used: typing.Set[int] = set()
+    # explicit ids first
+    by_id = {node.id: j for j, node in enumerate(live) if node.id is not None}
+    for i, want in enumerate(desired):
+        if want.id is None:
+            continue
+        j = by_id.get(want.id)
+        if j is None or j in used:
+            raise ValueError(f"outline: {prefix + want.title!r} has id {want.id}, which no question "
+                             f"{'under ' + repr(live_prefix[:-1]) if live_prefix else 'at the top level'} has")
+        match[i] = j
+        used.add(j)
+    # then asked-for renames, from a live question's path to a desired title
+    for j, node in enumerate(live):
+        new = renames.get(live_prefix + node.title)
+        if new is None or j in used:
+            continue
+        i = next((i for i, want in enumerate(desired) if match[i] is None and want.title == new), None)
+        if i is not None:
+            match[i] = j
+            used.add(j)
+            del renames[live_prefix + node.title]
+    # then titles, the n-th desired question called X going with the n-th live one called X
+    by_title: typing.Dict[str, typing.List[int]] = {}
+    for j, node in enumerate(live):
+        if j not in used:
+            by_title.setdefault(node.title, []).append(j)
+    for i, want in enumerate(desired):
+        candidates = by_title.get(want.title)
+        if match[i] is None and candidates:
+            match[i] = candidates.pop(0)
+            used.add(match[i])
+
+    ret, last = [], -1
+    for i, (want, j) in enumerate(zip(desired, match)):
+        path = prefix + want.title
+        if j is None:
+            d.changes.append(("add", path, None, want.weight))
+            ret.append(OutlineNode(want.title, want.weight, _merge([], want.children, path + "/", "", d, {}),
+                                   crop_rect_list=want.crop_rect_list))
+            continue
+        have = live[j]
+        if have.title != want.title:
+            d.changes.append(("title", path, have.title, want.title))
+        if j < last:
+            d.changes.append(("move", path, j, i))
+        last = max(last, j)
+        children = _merge(have.children, want.children, path + "/", live_prefix + have.title + "/", d, renames)
+        if not want.children and not math.isclose(have.weight, want.weight, abs_tol=1e-9):
+            d.changes.append(("weight", path, have.weight, want.weight))
+        ret.append(OutlineNode(want.title, want.weight, children, have.id, want.crop_rect_list or have.crop_rect_list))
+    for j, node in enumerate(live):
+        if j not in used:
+            d.changes.append(("remove", prefix + node.title, node.weight, None))
+    return ret
+
+
+def parse_outline_page(html: str) -> Outline:
+    """Reads the live outline off an /outline/edit page, from the props of its AssignmentOutline component."""
+    import lxml.html
+    doc = lxml.html.fromstring(html)
+    found = doc.xpath('//*[@data-react-class="AssignmentOutline"]/@data-react-props')
+    if not found:
+        raise ValueError("no outline found on the page")
+    props = json.loads(found[0])
+    questions = props.get("outline")
+    if questions is None:
+        questions = props.get("question_data") or props.get("questions") or []
+    regions = (props.get("assignment") or {}).get("identification_regions")
+    return Outline.from_raw(questions, regions)
@@ -0,0 +1,271 @@
+"""Declarative course configuration: diff a desired state against Gradescope and apply only the difference.
+
+A desired-state file is JSON (or YAML, if PyYAML is installed) shaped like
+
+{
+    "course": 123456,
+    "assignments": [
+        {
+            "type": "prog",
+            "title": "HW1",
+            "total_points": 10,
+            "release_date": "2021-09-03T20:00",
+            "due_date": "2021-09-10T23:59",
+            "memory_limit": 1024
+        },
+        {
+            "type": "pdf",
+            "title": "Midterm",
+            "template_pdf": "midterm.pdf",
+            "release_date": "2021-10-01T09:00",
+            "due_date": "2021-10-01T12:00",
+            "outline": [{"title": "Q1", "weight": 10}]
+        }
+    ]
+}
+
+Assignments are matched by title. Keys are the keyword arguments of the matching update_settings()
+(dates as ISO 8601 strings, in the course's time zone unless they carry an offset; see plan()'s tz);
+template_pdf paths are relative to the desired-state file. Only the keys that are given are compared, so anything left out keeps
+whatever value it has live. Assignments missing from the course are created. An assignment whose live
+settings can't be read (say, a PDF assignment declared as "prog") is reported in the plan's errors
+and left out of its changes, rather than failing the whole plan.
+
+    course = ses.get_course(desired["course"])
+    p = plan(course, load_desired("course.json"))
+    print(p)
+    apply(p)
+"""
+import datetime
+import inspect
+import json
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from .assignment import Assignment, AutograderAssignment, PDFAssignment
+from .outline import Outline
+if typing.TYPE_CHECKING:
+    from .course import Course
+
+__all__ = ["load_desired", "plan", "apply", "Plan", "Change"]
+
+TYPES = {"prog": AutograderAssignment, "pdf": PDFAssignment}
+# desired-state keys that aren't assignment settings
+SPECIAL_KEYS = ("type", "outline", "template_pdf")
+
+def load_desired(path: str) -> dict:
+    """Reads a desired-state file. Files ending in .yml/.yaml need PyYAML.
+    Relative template_pdf paths are made relative to the file's directory rather than the CWD."""
+    with open(path) as f:
+        if path.endswith((".yml", ".yaml")):
+            import yaml
+            desired = yaml.safe_load(f)
+        else:
+            desired = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for entry in desired.get("assignments", []):
+        if isinstance(entry.get("template_pdf"), str):
+            entry["template_pdf"] = os.path.join(base, entry["template_pdf"])
+    return desired
+
+def _parse_date(v):
+    if isinstance(v, str):
+        return datetime.datetime.fromisoformat(v)
+    return v
+
+def normalize(key: str, value, tz: datetime.tzinfo=None):
+    """Brings desired and live values into comparable form.
+
+    Dates are made timezone-aware in tz: naive ones (like everything Gradescope's forms show) are taken
+    to be in tz already, and aware ones are converted to it. tz=None means this machine's time zone."""
+    if key.endswith("date"):
+        value = _parse_date(value)
+        if value is None:
+            return None
+        if tz is None:
+            value = value.astimezone()
+        elif value.tzinfo is None:
+            value = value.replace(tzinfo=tz)
+        else:
+            value = value.astimezone(tz)
+        # Gradescope only keeps minutes
+        return value.replace(second=0, microsecond=0)
+    if key == "submission_methods":
+        return sorted(value)
+    if key == "total_points" and value is not None:
+        return float(value)
+    return value
+
+
+class Change:
+    """
+    One write the plan wants to make.
+
+    action      -- "create", "update" (settings) or "outline".
+    diff        -- for updates, {key: (live value, desired value)} of just the keys that differ;
+                   for outlines, the outline.OutlineDiff.
+    """
+    def __init__(self, action: str, title: str, desired: dict, assignment: Assignment=None,
+                 live: dict=None, diff=None):
+        self.action: str = action
+        self.title: str = title
+        self.desired: dict = desired
+        self.assignment: Assignment = assignment
+        self.live: dict = live
+        self.diff: dict = diff or {}
+        self.error: Exception = None
+
+    def __str__(self):
+        if self.action == "create":
+            return f"+ create {self.title!r}"
+        if self.action == "outline":
+            return f"~ outline {self.title!r}\n" + "\n".join("    " + line for line in str(self.diff).splitlines())
+        lines = [f"~ update {self.title!r}"]
+        for key, (old, new) in self.diff.items():
+            lines.append(f"    {key}: {old!r} -> {new!r}")
+        return "\n".join(lines)
+
+
+class Plan:
+    """
+    changes     -- the writes apply() would make.
+    unchanged   -- titles of assignments that already match.
+    errors      -- {title: exception} of assignments that couldn't be checked; they have no changes.
+    tz          -- the time zone dates were planned in (see plan()).
+    """
+    def __init__(self, course: "Course", changes: typing.List[Change], unchanged: typing.List[str],
+                 errors: typing.Dict[str, Exception]=None, tz: datetime.tzinfo=None):
+        self.course: "Course" = course
+        self.tz: datetime.tzinfo = tz
+        self.changes: typing.List[Change] = changes
+        self.unchanged: typing.List[str] = unchanged
+        self.errors: typing.Dict[str, Exception] = errors or {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __str__(self):
+        lines = [f"! {title!r}: {e!r}" for title, e in self.errors.items()]
+        lines += [str(c) for c in self.changes]
+        summary = f"{len(self.changes)} to change, {len(self.unchanged)} up to date"
+        if self.errors:
+            summary += f", {len(self.errors)} failed to check"
+        if not lines:
+            return f"No changes. {len(self.unchanged)} assignments up to date."
+        return "\n".join(lines) + f"\n{summary}."
+
+
+def _settings(entry: dict, tz: datetime.tzinfo=None) -> dict:
+    return {k: normalize(k, v, tz) for k, v in entry.items() if k not in SPECIAL_KEYS}
+
+def _setting_names(kind: str) -> typing.Set[str]:
+    """The settings a desired entry of this type may give: update_settings()'s keyword arguments,
+    plus the template's name for PDFs (which only matters on creation)."""
+    names = set(inspect.signature(TYPES[kind].update_settings).parameters) - {"self"}
+    return names | {"template_pdf_name"} if kind == "pdf" else names
+
+def plan(course: "Course", desired: dict, max_workers: int=8, tz: datetime.tzinfo=None) -> Plan:
+    """Fetches the live settings of every assignment named in desired (concurrently) and works out
+    the smallest set of writes that makes the course match.
+
+    tz is the course's time zone, which Gradescope shows and takes dates in. It defaults to this
+    machine's. Desired dates with an offset are converted to it; see normalize().
+
+    A malformed desired state (unknown type or keys, a bad outline) raises ValueError before anything
+    is fetched. Errors checking a single assignment are recorded in Plan.errors instead, so the rest
+    still get planned."""
+    course.refresh()
+    entries = desired.get("assignments", [])
+    for entry in entries:
+        if entry.get("type") not in TYPES:
+            raise ValueError(f"{entry.get('title')!r}: type should be one of {list(TYPES)}")
+        unknown = set(_settings(entry)) - _setting_names(entry["type"])
+        if unknown:
+            raise ValueError(f"{entry.get('title')!r}: unknown {entry['type']} settings {sorted(unknown)}")
+        if "outline" in entry:
+            try:
+                Outline.from_spec(entry["outline"])
+            except ValueError as e:
+                raise ValueError(f"{entry.get('title')!r}: {e}") from None
+
+    def check(entry):
+        title = entry["title"]
+        found = course.catalog.by_name.get(title)
+        if found is None:
+            return [Change("create", title, entry)]
+        assgn = course.get_assignment(found.aid, TYPES[entry["type"]])
+        changes = []
+        want = _settings(entry, tz)
+        if set(want) - {"title"}:
+            live = assgn.get_settings()
+            diff = {k: (live.get(k), v) for k, v in want.items() if normalize(k, live.get(k), tz) != v}
+            if diff:
+                changes.append(Change("update", title, entry, assgn, live, diff))
+        if "outline" in entry:
+            outline_diff = assgn.get_outline().diff(Outline.from_spec(entry["outline"]))
+            if outline_diff:
+                changes.append(Change("outline", title, entry, assgn, diff=outline_diff))
+        return changes
+
+    def one(entry):
+        try:
+            return check(entry)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(one, entries))
+    errors = {e["title"]: r for e, r in zip(entries, results) if isinstance(r, Exception)}
+    checked = [(e, cs) for e, cs in zip(entries, results) if not isinstance(cs, Exception)]
+    changes = [c for e, cs in checked for c in cs]
+    unchanged = [e["title"] for e, cs in checked if not cs]
+    return Plan(course, changes, unchanged, errors, tz)
+
+def _create(course: "Course", entry: dict, tz: datetime.tzinfo=None):
+    settings = _settings(entry, tz)
+    if entry["type"] == "prog":
+        create = course.create_prog_assignment
+    else:
+        create = course.create_pdf_assignment
+        settings["template_pdf_name"] = settings.get("template_pdf_name") or os.path.basename(entry["template_pdf"])
+        settings["template_pdf_data"] = entry["template_pdf"]
+    params = inspect.signature(create).parameters
+    assgn = create(**{k: v for k, v in settings.items() if k in params})
+    # whatever create_* doesn't take goes through update_settings
+    rest = {k: v for k, v in settings.items() if k not in params and not k.startswith("template_pdf")}
+    if rest:
+        live = assgn.get_settings()
+        live.update(rest)
+        assgn.update_settings(**live)
+    if "outline" in entry:
+        # None means the outline was empty, so there was nothing to send
+        r = assgn.update_outline(entry["outline"], current=Outline())
+        if r is not None:
+            r.raise_for_status()
+    return assgn
+
+def _apply_one(p: Plan, change: Change):
+    if change.action == "create":
+        change.assignment = _create(p.course, change.desired, p.tz)
+    elif change.action == "update":
+        settings = dict(change.live)
+        settings.update({k: new for k, (old, new) in change.diff.items()})
+        change.assignment.update_settings(**settings)
+    else:
+        change.assignment.update_outline_raw(change.diff.merged.to_raw()).raise_for_status()
+
+def apply(p: Plan, max_workers: int=8) -> typing.List[Change]:
+    """Carries out a plan's changes in parallel. Errors are recorded on each Change rather than raised,
+    so one bad assignment doesn't stop the rest. Returns the changes that failed."""
+    def one(change):
+        try:
+            _apply_one(p, change)
+        except Exception as e:
+            change.error = e
+    # settings and outline changes to the same assignment are independent writes, so everything can go at once
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(one, p.changes))
+    return [c for c in p.changes if c.error is not None]
@@ -0,0 +1,181 @@
+import email.utils
+import random
+import re
+import threading
+import time
+import typing
+from urllib.parse import urlparse
+from .transport import Layer
+
+__all__ = ["TokenBucket", "RateLimiter", "RateLimitLayer", "retryable"]
+
+RETRY_STATUSES = (429, 502, 503)
+# methods that are safe to send again after a 502/503, which may have come from a proxy after the
+# server already acted on the request. Anything else is only retried on a 429 with Retry-After,
+# where the server says it refused the request.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate: float, burst: float):
+        self.rate: float = rate
+        self.burst: float = burst
+        self.tokens: float = burst
+        self.stamp: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self) -> float:
+        """Takes a token, returning how long the caller has to wait before using it."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Client-side throttle for Gradescope traffic.
+
+    rate, burst         -- default budget per host, in requests/second and bucket size.
+    endpoints           -- extra budgets as {path regex: (rate, burst)}. A request has to get a token from
+                           its host bucket and from every endpoint bucket whose regex matches its path.
+    max_retries         -- how many times a 429/502/503 is retried before it's handed back to the caller.
+                           Only idempotent requests are retried after a 502/503; others (POST, PATCH)
+                           only after a 429 with a Retry-After header.
+    backoff_base,
+    backoff_max         -- exponential backoff (with full jitter) between retries, in seconds. A Retry-After
+                           header from the server takes precedence when it asks for longer, and is honoured
+                           in full: backoff_max only caps the backoff.
+    min_rate, max_rate  -- bounds for the adaptive host rate.
+    target_latency      -- the host rate grows additively while responses come back faster than this, and is
+                           cut multiplicatively on throttling responses or slower ones (AIMD).
+                           None turns adaptation off.
+    """
+    def __init__(self, rate: float=4.0, burst: float=8, endpoints: typing.Dict[str, typing.Tuple[float, float]]=None,
+                 max_retries: int=5, backoff_base: float=0.5, backoff_max: float=60,
+                 min_rate: float=0.5, max_rate: float=20.0, target_latency: typing.Optional[float]=2.0,
+                 increase: float=0.25, decrease: float=0.5):
+        self.rate: float = rate
+        self.burst: float = burst
+        self.endpoints = [(re.compile(pat), TokenBucket(r, b)) for pat, (r, b) in (endpoints or {}).items()]
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_max: float = backoff_max
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.target_latency = target_latency
+        self.increase: float = increase
+        self.decrease: float = decrease
+
+        self.hosts: typing.Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.retries: int = 0
+        self.throttled: int = 0
+        self.waited: float = 0.0
+
+    def host_bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = TokenBucket(self.rate, self.burst)
+            return self.hosts[host]
+
+    def acquire(self, url: str):
+        """Blocks until the request to url fits in every budget it falls under."""
+        u = urlparse(url)
+        buckets = [self.host_bucket(u.netloc)] + [b for pat, b in self.endpoints if pat.search(u.path)]
+        wait = max(b.reserve() for b in buckets)
+        if wait > 0:
+            with self.lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def backoff(self, attempt: int, retry_after: typing.Optional[float]) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def observe(self, url: str, status: int, latency: float):
+        """Feeds a response back into the adaptive host rate."""
+        if self.target_latency is None:
+            return
+        bucket = self.host_bucket(urlparse(url).netloc)
+        with bucket.lock:
+            # credit the time since the last take at the rate it was spent under
+            bucket._refill(time.monotonic())
+            if status in RETRY_STATUSES or latency > self.target_latency:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+    def stats(self) -> dict:
+        return {
+            "host_rates": {h: b.rate for h, b in self.hosts.items()},
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "seconds_waited": self.waited,
+        }
+
+
+def retryable(method: str, status: int, retry_after: typing.Optional[float]) -> bool:
+    """Whether a request that got status can be sent again without risking doing it twice."""
+    if status not in RETRY_STATUSES:
+        return False
+    return method.upper() in IDEMPOTENT_METHODS or (status == 429 and retry_after is not None)
+
+def parse_retry_after(value: typing.Optional[str]) -> typing.Optional[float]:
+    """Retry-After is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RateLimitLayer(Layer):
+    """Layer that runs every request through a RateLimiter, retrying throttled ones."""
+    def __init__(self, inner, limiter: RateLimiter):
+        super().__init__(inner)
+        self.limiter: RateLimiter = limiter
+
+    def send(self, request, **kwargs):
+        # streamed bodies (generators, open files) can only be sent once
+        replayable = request.body is None or isinstance(request.body, (bytes, str))
+        attempt = 0
+        while True:
+            self.limiter.acquire(request.url)
+            start = time.monotonic()
+            r = self.inner.send(request, **kwargs)
+            self.limiter.observe(request.url, r.status_code, time.monotonic() - start)
+            if r.status_code not in RETRY_STATUSES:
+                return r
+            with self.limiter.lock:
+                self.limiter.throttled += 1
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            if attempt >= self.limiter.max_retries or not replayable \
+                    or not retryable(request.method, r.status_code, retry_after):
+                return r
+            delay = self.limiter.backoff(attempt, retry_after)
+            r.close()
+            with self.limiter.lock:
+                self.limiter.retries += 1
+                self.limiter.waited += delay
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,126 @@
+"""Regrading every submission of an assignment, and watching the regrade finish.
+
+    for res in assgn.regrade_all():
+        print(res.sid, res.name, res.score)
+
+AutograderAssignment.regrade_all() presses "Regrade all submissions" and returns a RegradeWatcher,
+which yields a RegradeResult for each submission as soon as its grading is done.
+
+The watcher never asks about submissions one at a time: the review grades page lists every
+submission with its score or grading status, so each poll is a single page load however large the
+regrade. Polls start min_interval apart. The interval shrinks again while submissions keep finishing
+and grows by backoff (up to max_interval) while nothing changes, so a regrade that takes an hour
+costs a few hundred requests rather than thousands.
+
+Just after the trigger, the page may still show the old results until the regrade jobs have been
+queued, so a submission only counts as done once it has been seen pending, or once settle seconds
+have passed without it ever showing up as pending.
+"""
+import time
+import typing
+if typing.TYPE_CHECKING:
+    from .assignment import Assignment
+
+__all__ = ["RegradeResult", "RegradeWatcher"]
+
+class RegradeResult:
+    """One submission whose grading finished. seconds is how long after the trigger it was seen done."""
+    __slots__ = ("sid", "name", "email", "score", "status", "seconds")
+    def __init__(self, sid: int, name: str, email: typing.Optional[str], score: typing.Optional[float],
+                 status: str, seconds: float):
+        self.sid: int = sid
+        self.name: str = name
+        self.email: typing.Optional[str] = email
+        self.score: typing.Optional[float] = score
+        self.status: str = status
+        self.seconds: float = seconds
+
+    def __repr__(self):
+        return f"<RegradeResult {self.sid} {self.name!r} {self.score}>"
+
+
+class RegradeWatcher:
+    """
+    Follows a regrade of assignment to completion. Iterate over it for RegradeResults as submissions finish;
+    iteration stops when every submission is done, and raises TimeoutError if timeout seconds pass first.
+
+    min_interval,
+    max_interval    -- bounds of the time between polls, in seconds.
+    backoff         -- factor the interval grows by after a poll where nothing finished, and shrinks by after
+                       one where something did.
+    settle          -- see the module docstring.
+    """
+    def __init__(self, assignment: "Assignment", min_interval: float=2.0, max_interval: float=60.0,
+                 backoff: float=1.5, settle: float=10.0, timeout: typing.Optional[float]=None):
+        self.assignment: "Assignment" = assignment
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.backoff: float = backoff
+        self.settle: float = settle
+        self.timeout: typing.Optional[float] = timeout
+        self.started: float = time.monotonic()
+        # sid -> whether it has been seen pending, for the submissions not done yet.
+        # None until the first poll says which submissions there are.
+        self.waiting: typing.Optional[typing.Dict[int, bool]] = None
+        self.finished: int = 0
+        self.polls: int = 0
+        self.interval: float = min_interval
+
+    @property
+    def remaining(self) -> typing.Optional[int]:
+        return None if self.waiting is None else len(self.waiting)
+
+    def poll(self) -> typing.List[RegradeResult]:
+        """Loads the review grades page once and returns the submissions that finished since the last poll."""
+        rows = self.assignment.list_submissions()
+        self.polls += 1
+        elapsed = time.monotonic() - self.started
+        if self.waiting is None:
+            self.waiting = {row["sid"]: False for row in rows}
+        done = []
+        for row in rows:
+            sid = row["sid"]
+            if sid not in self.waiting:
+                continue
+            if row["status"] == "pending":
+                self.waiting[sid] = True
+            elif self.waiting[sid] or elapsed >= self.settle:
+                del self.waiting[sid]
+                done.append(RegradeResult(sid, row["name"], row["email"], row["score"], row["status"], elapsed))
+        # submissions deleted in the meantime won't finish
+        listed = {row["sid"] for row in rows}
+        for sid in [s for s in self.waiting if s not in listed]:
+            del self.waiting[sid]
+        self.finished += len(done)
+        return done
+
+    def _adapt(self, progressed: bool):
+        if progressed:
+            self.interval = max(self.min_interval, self.interval / self.backoff)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def __iter__(self) -> typing.Iterator[RegradeResult]:
+        while True:
+            done = self.poll()
+            if self.polls > 1:
+                self._adapt(bool(done))
+            yield from done
+            if not self.waiting:
+                return
+            wait = self.interval
+            if self.timeout is not None:
+                left = self.timeout - (time.monotonic() - self.started)
+                if left <= 0:
+                    raise TimeoutError(f"{len(self.waiting)} submissions of assignment {self.assignment.aid} "
+                                       f"still grading after {self.timeout}s")
+                wait = min(wait, left)
+            time.sleep(wait)
+
+    def wait(self) -> typing.List[RegradeResult]:
+        """Blocks until the regrade is done, returning every result."""
+        return list(self)
+
+    def stats(self) -> dict:
+        return {"polls": self.polls, "finished": self.finished, "remaining": self.remaining,
+                "seconds": time.monotonic() - self.started}
@@ -0,0 +1,257 @@
+"""Score exports as NumPy arrays.
+
+Assignment.export_scores() streams the assignment's scores.csv export and parses it a row at a time
+straight into typed column buffers, so neither the whole CSV nor a list of row dicts is ever held in
+memory. The result is a ScoreTable of columns: students as a categorical (an array of emails, plus an
+int32 index into it per row), scores as float64 (NaN where missing) and submission times as UTC
+datetime64[s] (NaT where missing).
+
+Course.export_gradebook() fetches every assignment's export concurrently and joins them on the
+student's email with sorted-array lookups into a Gradebook: a students x assignments score matrix.
+
+NumPy is needed for both, but (like for snapshot.SettingsTable) only imported when they're used.
+"""
+import array
+import csv
+import datetime
+import io
+import typing
+from concurrent.futures import ThreadPoolExecutor
+if typing.TYPE_CHECKING:
+    from .assignment import Assignment
+    from .course import Course
+
+__all__ = ["ScoreTable", "Gradebook", "parse_scores", "export_scores", "export_gradebook"]
+
+CHUNK_SIZE = 64 * 1024
+# how Gradescope's csv exports write submission times
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+# int64 min is how numpy spells NaT
+NAT = -2 ** 63
+
+class _Categories:
+    """Interns strings as int codes, in order of first appearance."""
+    def __init__(self):
+        self.codes: typing.Dict[str, int] = {}
+        self.values: typing.List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _float(s: str) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return float("nan")
+
+def _timestamp(s: str) -> int:
+    if not s:
+        return NAT
+    try:
+        return int(datetime.datetime.strptime(s, TIME_FORMAT).timestamp())
+    except ValueError:
+        return NAT
+
+
+class ScoreTable:
+    """
+    One assignment's scores, a row per student on the roster.
+
+    students        -- the distinct student emails (str array); student indexes into it, per row.
+    names           -- the students' names, lined up with students.
+    score           -- float64, NaN for students without a score.
+    max_points      -- float64.
+    submitted_at    -- datetime64[s] in UTC, NaT for students who didn't submit.
+    submission_id   -- int64, -1 for students who didn't submit.
+    statuses        -- the distinct values of the Status column ("Graded", "Missing", ...); status indexes into it.
+    """
+    def __init__(self, aid: int=None):
+        self.aid: typing.Optional[int] = aid
+        self.students = None
+        self.names = None
+        self.student = None
+        self.score = None
+        self.max_points = None
+        self.submitted_at = None
+        self.submission_id = None
+        self.statuses = None
+        self.status = None
+
+    def __len__(self):
+        return len(self.student)
+
+    def __repr__(self):
+        return f"<ScoreTable {self.aid} {len(self)} rows>"
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame({
+            "email": pd.Categorical.from_codes(self.student, self.students),
+            "name": self.names[self.student],
+            "score": self.score,
+            "max_points": self.max_points,
+            "submitted_at": self.submitted_at,
+            "submission_id": self.submission_id,
+            "status": pd.Categorical.from_codes(self.status, self.statuses),
+        })
+
+
+def parse_scores(lines: typing.Iterable[str], aid: int=None) -> ScoreTable:
+    """Parses a scores.csv export into a ScoreTable. lines is what csv.reader takes: a text file opened
+    with newline="" (so line breaks inside quoted fields survive), or an iterable of lines.
+    Columns are found by their header, so extra (e.g. per-question) columns don't matter."""
+    import numpy as np
+    reader = csv.reader(lines)
+    header = next(reader, None) or []
+    col = {name.strip(): i for i, name in enumerate(header)}
+    def index(name):
+        return col.get(name, len(header))
+
+    i_name, i_email, i_sid = index("Name"), index("Email"), index("SID")
+    i_score, i_max, i_status = index("Total Score"), index("Max Points"), index("Status")
+    i_sub, i_time = index("Submission ID"), index("Submission Time")
+
+    students, statuses, names = _Categories(), _Categories(), []
+    student, status = array.array("i"), array.array("i")
+    score, max_points = array.array("d"), array.array("d")
+    submitted_at, submission_id = array.array("q"), array.array("q")
+    for row in reader:
+        if not row:
+            continue
+        row += [""] * (len(header) + 1 - len(row))
+        # students without an email (rare, but possible for manually added ones) go by their SID
+        key = row[i_email] or row[i_sid] or row[i_name]
+        code = students.code(key)
+        if code == len(names):
+            names.append(row[i_name])
+        student.append(code)
+        score.append(_float(row[i_score]))
+        max_points.append(_float(row[i_max]))
+        status.append(statuses.code(row[i_status]))
+        submission_id.append(int(row[i_sub]) if row[i_sub].isdigit() else -1)
+        submitted_at.append(_timestamp(row[i_time]))
+
+    def column(buf, dtype):
+        # array.array -> numpy without going through python objects
+        return np.frombuffer(buf, dtype=dtype).copy() if len(buf) else np.zeros(0, dtype=dtype)
+
+    t = ScoreTable(aid)
+    t.students = np.array(students.values, dtype=str)
+    t.names = np.array(names, dtype=str)
+    t.student = column(student, np.int32)
+    t.score = column(score, np.float64)
+    t.max_points = column(max_points, np.float64)
+    t.submitted_at = column(submitted_at, np.int64).view("datetime64[s]")
+    t.submission_id = column(submission_id, np.int64)
+    t.statuses = np.array(statuses.values, dtype=str)
+    t.status = column(status, np.int32)
+    return t
+
+class _ChunkReader(io.RawIOBase):
+    """A readable binary stream over an iterator of byte chunks, such as Response.iter_content()."""
+    def __init__(self, chunks: typing.Iterator[bytes]):
+        self.chunks = chunks
+        self.buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.buf:
+            self.buf = next(self.chunks, b"")
+            if not self.buf:
+                return 0
+        n = min(len(b), len(self.buf))
+        b[:n], self.buf = self.buf[:n], self.buf[n:]
+        return n
+
+
+def export_scores(assignment: "Assignment") -> ScoreTable:
+    """Streams assignment's scores.csv export into a ScoreTable."""
+    with assignment.ses.get_stream(assignment.get_url() + "/scores.csv") as r:
+        # Rows are split by the csv module, which only breaks them at \r and \n outside quotes;
+        # Response.iter_lines would also split at \u2028, \x85 and the like inside a name.
+        # iter_content rather than r.raw, so compressed bodies and every transport work the same.
+        # csv exports come without a charset, and are utf-8 with a BOM.
+        text = io.TextIOWrapper(io.BufferedReader(_ChunkReader(r.iter_content(CHUNK_SIZE)), CHUNK_SIZE),
+                                encoding="utf-8-sig", newline="")
+        return parse_scores(text, assignment.aid)
+
+
+class Gradebook:
+    """
+    Every assignment's scores in a course, as students x assignments matrices.
+
+    students            -- sorted student emails (str array), the rows.
+    names               -- their names.
+    aids                -- assignment ids (int64), the columns; assignment_names lines up with them.
+    scores              -- float64 matrix, NaN where a student has no score.
+    max_points          -- float64 per assignment.
+    submitted_at        -- datetime64[s] matrix (UTC), NaT where a student didn't submit.
+    """
+    def __init__(self, students, names, aids, assignment_names, scores, max_points, submitted_at):
+        self.students = students
+        self.names = names
+        self.aids = aids
+        self.assignment_names = assignment_names
+        self.scores = scores
+        self.max_points = max_points
+        self.submitted_at = submitted_at
+
+    @property
+    def shape(self) -> typing.Tuple[int, int]:
+        return self.scores.shape
+
+    def __repr__(self):
+        return f"<Gradebook {self.shape[0]} students x {self.shape[1]} assignments>"
+
+    def column(self, aid: int) -> int:
+        """Index of assignment aid's column."""
+        import numpy as np
+        found = np.flatnonzero(self.aids == aid)
+        if not len(found):
+            raise KeyError(aid)
+        return int(found[0])
+
+    def to_pandas(self):
+        """The scores, as a DataFrame indexed by email with a column per assignment name."""
+        import pandas as pd
+        return pd.DataFrame(self.scores, index=pd.Index(self.students, name="email"), columns=self.assignment_names)
+
+    @classmethod
+    def join(cls, tables: typing.Sequence[ScoreTable], assignment_names: typing.Sequence[str]) -> "Gradebook":
+        """Outer-joins per-assignment ScoreTables on student email."""
+        import numpy as np
+        students = np.unique(np.concatenate([t.students for t in tables])) if tables else np.zeros(0, dtype=str)
+        names = np.empty(len(students), dtype=object)
+        scores = np.full((len(students), len(tables)), np.nan)
+        submitted_at = np.full((len(students), len(tables)), np.datetime64("NaT"), dtype="datetime64[s]")
+        max_points = np.full(len(tables), np.nan)
+        for j, t in enumerate(tables):
+            # where each of this table's students sits in the course-wide list, then per row
+            local = np.searchsorted(students, t.students)
+            names[local] = t.names
+            rows = local[t.student]
+            scores[rows, j] = t.score
+            submitted_at[rows, j] = t.submitted_at
+            known = t.max_points[~np.isnan(t.max_points)]
+            if len(known):
+                max_points[j] = known.max()
+        return cls(students, names.astype(str), np.array([t.aid for t in tables], dtype=np.int64),
+                   np.array(assignment_names, dtype=str), scores, max_points, submitted_at)
+
+
+def export_gradebook(course: "Course", max_workers: int=8, names: typing.Iterable[str]=None) -> Gradebook:
+    """Fetches the scores of every assignment in course (or just those in names) concurrently and joins them."""
+    entries = list(course.catalog)
+    if names is not None:
+        names = set(names)
+        entries = [e for e in entries if e.name in names]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tables = list(pool.map(lambda e: export_scores(course.get_assignment(e.aid)), entries))
+    return Gradebook.join(tables, [e.name for e in entries])
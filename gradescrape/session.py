@@ -1,28 +1,106 @@
 from bs4 import BeautifulSoup
 import requests
-from .util import BASE_URL 
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from .util import BASE_URL, FormSnapshot
+from . import extract
+from .multipart import MultipartEncoder, file_parts
+from .ratelimit import RateLimiter, RateLimitLayer
+from requests.adapters import BaseAdapter
+from .transport import innermost, TransportAdapter
+from .instrument import Instrumentation, InstrumentLayer
+from .cache import ResponseCache, CacheLayer
+import typing
 from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 from .course import Course
-
-
-# TODO: 
-# * Make Session (and all other requests)use a single requests.Session
-#  * Other general code cleanup
-# * Have configuration read scripts.
-# * Have some sort of get_assignment_by_name for a Course
+from .crawl import crawl, CrawlResult
 
 __all__ = ["Session"]
 
 class Session:
-    def __init__(self, ses: requests.Session=None):
+    def __init__(self, ses: requests.Session=None, base_url: str=BASE_URL, csrf_ttl: float=1800, parser_backend: str=None,
+                 rate_limiter=None, cache=None, trace_sinks=(), transport: BaseAdapter=None):
+        """
+        rate_limiter    -- a ratelimit.RateLimiter throttling all traffic to base_url (and retrying 429s
+                           and 502/503s where that's safe), or True for one with default budgets
+                           (4 requests/second). Off by default.
+        cache           -- a cache.ResponseCache for read paths, or True for an in-memory one with the
+                           default routes. Off by default.
+        trace_sinks     -- extra instrument sinks (e.g. instrument.JSONLSink) to record every request to,
+                           on top of the in-memory histogram behind stats().
+        transport       -- the adapter doing the actual I/O for base_url: a transport.TransportAdapter
+                           (pool sizes, keep-alive, idle timeout, compression) or transport.HTTP2Adapter.
+                           Defaults to a TransportAdapter, unless ses already has its own adapter mounted.
+                           cassette.RecordLayer / cassette.ReplayAdapter record traffic and play it back.
+        """
         self.req : requests.Session = ses if ses else requests.Session()
-        #if type(cookies) == list:
-        #    self.cookies = {}
-        #    for cookie in cookies:
-        #        #if cookie['name'] in ("signed_token", "remember_me", "_gradescope_session"):
-        #        self.cookies[cookie['name']] = cookie['value']
-        #else:
-        #    self.cookies = cookies
+        self.base_url: str = base_url.rstrip("/")
+        if transport is None and type(self.req.get_adapter(self.base_url)) is requests.adapters.HTTPAdapter:
+            transport = TransportAdapter()
+        if transport is not None:
+            self.req.mount(self.base_url, transport)
+        self.transport: BaseAdapter = self.req.get_adapter(self.base_url)
+
+        # innermost, so it times what actually goes over the wire (retries included, cache hits not)
+        self.instrumentation: Instrumentation = Instrumentation(trace_sinks)
+        self.add_layer(InstrumentLayer, self.instrumentation)
+
+        if rate_limiter is True:
+            rate_limiter = RateLimiter()
+        self.rate_limiter: RateLimiter = rate_limiter or None
+        if self.rate_limiter is not None:
+            self.add_layer(RateLimitLayer, self.rate_limiter)
+
+        if cache is True:
+            cache = ResponseCache()
+        self.cache: ResponseCache = cache or None
+        if self.cache is not None:
+            # above the rate limiter, so cache hits don't spend tokens
+            self.add_layer(CacheLayer, self.cache)
+        # which extract backend ("lxml", "bs4", "selectolax") targeted page reads use
+        self.parser_backend: str = extract._check_backend(parser_backend)
+
+        # Rails CSRF tokens are valid for the whole session, so one token can be reused
+        # across every form submit rather than scraping a fresh one before each write.
+        self.csrf_ttl: float = csrf_ttl
+        self.csrf_fetches: int = 0
+        self.csrf_fetches_saved: int = 0
+        self._csrf_token: str = None
+        self._csrf_time: float = 0
+        # guards the three fields above; never held across a request
+        self._csrf_lock = threading.Lock()
+        # the scrape in progress, if any, so concurrent misses wait for it rather than each fetching
+        self._csrf_fetch: Future = None
+
+        # identity map for get_course: course id -> its object, for as long as anyone holds on to it
+        self._courses: "weakref.WeakValueDictionary[int, Course]" = weakref.WeakValueDictionary()
+        self._courses_lock = threading.Lock()
+
+        # called (with no arguments) to log back in when a page load finds the session expired.
+        # See store.SessionStore.
+        self.relogin: typing.Callable[[], typing.Any] = None
+
+    def add_layer(self, layer_type, *args, **kwargs):
+        """Stacks a transport.Layer on top of the adapter handling base_url. Returns the new layer."""
+        layer = layer_type(self.req.get_adapter(self.base_url), *args, **kwargs)
+        self.req.mount(self.base_url, layer)
+        return layer
+
+    def set_pool_size(self, maxsize: int):
+        """Resizes the connection pool of the adapter doing the actual I/O for base_url."""
+        adapter = innermost(self.req.get_adapter(self.base_url))
+        if hasattr(adapter, "set_pool_size"):
+            adapter.set_pool_size(maxsize)
+        elif isinstance(adapter, requests.adapters.HTTPAdapter):
+            adapter.poolmanager.clear()
+            adapter._pool_maxsize = maxsize
+            adapter.init_poolmanager(adapter._pool_connections, maxsize, block=adapter._pool_block)
+        else:
+            raise TypeError(f"can't resize the pool of {type(adapter).__name__}")
 
     def login(self, username: str, password: str) -> requests.Response:
         """
@@ -30,7 +108,11 @@ class Session:
         SAML is difficult to script anyway.
         """
 
-        page = self.get_soup(BASE_URL)
+        self.invalidate_csrf()
+        if self.cache is not None:
+            # pages cached so far were rendered for whoever was logged in before
+            self.cache.clear()
+        page = self.get_soup(self.base_url)
         csrf_token = page.find("meta", attrs={"name": "csrf-token"})['content'] 
         data = {
             "authenticity_token": csrf_token,
@@ -41,52 +123,244 @@ class Session:
             "session[remember_me_sso]": "0"
         }
 
-        r = self.req.post(BASE_URL + "/login", data=data)
+        r = self.req.post(self.base_url + "/login", data=data)
         r.raise_for_status()
+        # the session (and with it the csrf token) is rotated on login
+        self.invalidate_csrf()
+        return r
+
+    def is_logged_in(self) -> bool:
+        """Cheap liveness probe: whether the account page loads without bouncing us to the login page."""
+        r = self.req.get(self.base_url + "/account", allow_redirects=False, headers={"Cache-Control": "no-cache"})
+        r.close()
+        return r.status_code == 200
+
+    def _get(self, *args, **kwargs) -> requests.Response:
+        r = self.req.get(*args, **kwargs)
+        if self.relogin is not None and logged_out(r):
+            r.close()
+            self.relogin()
+            r = self.req.get(*args, **kwargs)
+        try:
+            r.raise_for_status()
+        except requests.HTTPError:
+            # a streamed response would otherwise hold on to its connection
+            r.close()
+            raise
         return r
 
+    def get_stream(self, url: str, **kwargs) -> requests.Response:
+        """GETs url without reading the body yet, for downloads and exports too big to hold in memory.
+        Use the response as a context manager, reading it with iter_content() or .raw.
+
+        Logs back in first if the session has expired (see relogin). Raises requests.HTTPError for an
+        error status, with the response (already closed, so its connection isn't held) as e.response."""
+        return self._get(url, stream=True, **kwargs)
+
     def get_soup(self, *args, **kwargs) -> BeautifulSoup:
 
         ret_r = False
         if "_return_request_object" in kwargs:
             ret_r = True
             del kwargs["_return_request_object"]
-        r = self.req.get(*args, **kwargs)
-        r.raise_for_status()
+        r = self._get(*args, **kwargs)
+        soup = self._parse(r, lambda text: BeautifulSoup(text, features="lxml"))
+        self._remember_csrf(soup)
         if ret_r:
-            return BeautifulSoup(r.text, features="lxml"), r
+            return soup, r
 
-        return BeautifulSoup(r.text, features="lxml")
+        return soup
     
+    def get_html(self, *args, **kwargs) -> str:
+        """GETs a page and returns the raw html, for callers that only extract a few nodes
+        from it with gradescrape.extract rather than building a whole soup."""
+        return self._get_html(*args, **kwargs).text
+
+    def _get_html(self, *args, **kwargs) -> requests.Response:
+        r = self._get(*args, **kwargs)
+        token = self._parse(r, lambda text: extract.csrf_token(text, self.parser_backend))
+        if token:
+            self._remember_csrf_token(token)
+        return r
+
+    def get_form(self, *args, **kwargs) -> FormSnapshot:
+        """GETs a page and indexes its form controls in one pass. See util.FormSnapshot."""
+        return self._parse(self._get_html(*args, **kwargs), FormSnapshot)
+
     def post_soup(self, *args, **kwargs) -> BeautifulSoup:
+        """POSTs and parses the result.
+
+        Passing _csrf=url fills in the form's authenticity_token from the csrf cache
+        (scraping url if needed), retrying once with a fresh token if it was rejected.
+
+        files= are streamed from disk rather than read into memory (see multipart.py), and
+        _progress=callback reports on the upload as it goes.
+        """
         ret_r = False
         if "_return_request_object" in kwargs:
             ret_r = True
             del kwargs["_return_request_object"]
-        r = self.req.post(*args, **kwargs)
+        csrf_url = kwargs.pop("_csrf", None)
+        if csrf_url is None:
+            r = self.req.post(*args, **self._encode(self._streaming(kwargs)))
+        else:
+            r = self.request_csrf("POST", *args, csrf_url=csrf_url, **kwargs)
         r.raise_for_status()
+        soup = self._parse(r, lambda text: BeautifulSoup(text, features="lxml"))
         if ret_r:
-            return BeautifulSoup(r.text, features="lxml"), r
+            return soup, r
 
-        return BeautifulSoup(r.text, features="lxml")
+        return soup
 
+    def _parse(self, r: requests.Response, parse):
+        """Runs parse(r.text), recording how long it took as a "parse" record for r's route."""
+        start = time.time()
+        t0 = time.perf_counter()
+        ret = parse(r.text)
+        self.instrumentation.parsed(r.request.method, r.url, start, time.perf_counter() - t0)
+        return ret
 
-    def get_courses(self):
-        """List all courses that this user can access"""    
-        # TODO: handle logout scenario
-        soup = self.get_soup(BASE_URL)
+    def stats(self) -> dict:
+        """Per-route request counts and p50/p95/p99 timings (in seconds), with network ("http")
+        and parsing ("parse") reported separately. See instrument.HistogramSink.summary()."""
+        return self.instrumentation.histogram.summary()
 
-        #for a in cs.find_all("a", class_="courseBox"):
-        #    print(a['href'])
-        return soup #BeautifulSoup(r.text, features="lxml")
+
+    def get_courses(self, role: str=None) -> typing.List[Course]:
+        """Lists the courses this user can access, with their short_name, name, term and role
+        ("instructor" or "student") filled in. role= keeps only the courses with that role."""
+        html = self.get_html(self.base_url + "/account")
+        courses = []
+        for row in extract.course_list(html, self.parser_backend):
+            if role is not None and row["role"] != role:
+                continue
+            c = self.get_course(row["cid"])
+            c.short_name, c.name, c.term, c.role = row["short_name"], row["name"], row["term"], row["role"]
+            courses.append(c)
+        return courses
+
+    def crawl(self, courses: typing.Iterable[Course]=None, settings: bool=False, max_workers: int=8,
+              per_course: int=None) -> typing.Iterator[CrawlResult]:
+        """Fetches the assignment catalog (and with settings=True, every assignment's settings) of every
+        course this user teaches, or of courses, concurrently. Results are yielded as they complete.
+        See crawl.py."""
+        if courses is None:
+            courses = self.get_courses(role="instructor")
+        return crawl(courses, settings, max_workers, per_course)
     
     def get_course(self, cid) -> Course:
-        return Course(self, cid)
+        """The object for course cid. The same object is returned for as long as anyone holds on to it,
+        so its assignment catalog and assignments are shared by everyone asking for the course."""
+        cid = int(cid)
+        with self._courses_lock:
+            course = self._courses.get(cid)
+            if course is None:
+                course = self._courses[cid] = Course(self, cid)
+            return course
     
     def get_csrf(self, url, return_page=False) -> str:
-        page = self.get_soup(url)
+        """Returns a csrf token, scraping it from url only if the cached one is missing or stale.
+        return_page always fetches url, since the caller wants the page itself."""
         if return_page:
+            page = self.get_soup(url)
+            self.csrf_fetches += 1
             return page.find("meta", attrs={"name": "csrf-token"})['content'], page
+
+        with self._csrf_lock:
+            if self._csrf_token is not None and time.monotonic() - self._csrf_time < self.csrf_ttl:
+                self.csrf_fetches_saved += 1
+                return self._csrf_token
+            waiting = self._csrf_fetch
+            if waiting is None:
+                fetch = self._csrf_fetch = Future()
+                self.csrf_fetches += 1
+            else:
+                self.csrf_fetches_saved += 1
+        if waiting is not None:
+            # someone else is already scraping a token: wait for theirs
+            return waiting.result()
+        try:
+            # get_html puts the token in the cache as it parses the page
+            token = extract.csrf_token(self.get_html(url), self.parser_backend)
+            if token is None:
+                raise ValueError(f"no csrf token found on {url}")
+            fetch.set_result(token)
+        except BaseException as e:
+            fetch.set_exception(e)
+            raise
+        finally:
+            with self._csrf_lock:
+                self._csrf_fetch = None
+        return token
+
+    def invalidate_csrf(self):
+        """Drops the cached csrf token, e.g. after the session changes."""
+        with self._csrf_lock:
+            self._csrf_token = None
+            self._csrf_time = 0
+
+    def request_csrf(self, method, url, csrf_url, **kwargs) -> requests.Response:
+        """Sends a form or json request with a cached csrf token.
+        The token goes into data['authenticity_token'] for forms, or the X-CSRF-Token header otherwise.
+        If the server rejects the token (422 / InvalidAuthenticityToken), the cache is dropped and
+        the request is retried once with a freshly scraped token.
+
+        files= and _progress= are handled as in post_soup.
+
+        Does not call raise_for_status() on the result."""
+        kwargs = self._streaming(kwargs)
+        r = self.req.request(method, url, **self._encode(self._with_csrf(self.get_csrf(csrf_url), kwargs)))
+        if csrf_rejected(r):
+            self.invalidate_csrf()
+            r = self.req.request(method, url, **self._encode(self._with_csrf(self.get_csrf(csrf_url), kwargs)))
+        return r
+
+    def _streaming(self, kwargs):
+        # FileParts remember where each file starts, so a retry can send the same files again
+        if kwargs.get("files"):
+            kwargs = dict(kwargs, files=file_parts(kwargs["files"]))
+        return kwargs
+
+    def _encode(self, kwargs):
+        """Swaps data= and files= for a streaming MultipartEncoder body."""
+        kwargs = dict(kwargs)
+        progress = kwargs.pop("_progress", None)
+        files = kwargs.pop("files", None)
+        if not files:
+            return kwargs
+        body = MultipartEncoder(kwargs.pop("data", None) or {}, files, progress)
+        kwargs["data"] = body
+        kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Content-Type": body.content_type})
+        return kwargs
+
+    def _with_csrf(self, token, kwargs):
+        kwargs = dict(kwargs)
+        if kwargs.get("data") is not None:
+            kwargs["data"] = dict(kwargs["data"], authenticity_token=token)
         else:
-            return page.find("meta", attrs={"name": "csrf-token"})['content']
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"X-CSRF-Token": token})
+        return kwargs
+
+    def _remember_csrf(self, soup):
+        # every page we parse carries the session's token, so keep the cache warm for free
+        meta = soup.find("meta", attrs={"name": "csrf-token"})
+        if meta is not None and meta.get("content"):
+            self._remember_csrf_token(meta["content"])
+
+    def _remember_csrf_token(self, token):
+        with self._csrf_lock:
+            self._csrf_token = token
+            self._csrf_time = time.monotonic()
+
+
+CSRF_FAILURE = re.compile(r"InvalidAuthenticityToken|CSRF token authenticity", re.I)
+
+def csrf_rejected(r: requests.Response) -> bool:
+    """Whether the server refused the request's csrf token. Other 422s (e.g. settings that failed
+    validation) aren't retried: they'd fail again, and the write may not be safe to repeat."""
+    return r.status_code in (403, 422) and CSRF_FAILURE.search(r.text) is not None
 
+def logged_out(r: requests.Response) -> bool:
+    """Whether a GET ended up on the login page, i.e. the session has expired."""
+    return any(urlparse(x.url).path == "/login" for x in r.history + [r]) or \
+        any(urlparse(x.headers.get("Location", "")).path == "/login" for x in r.history + [r] if x.is_redirect)
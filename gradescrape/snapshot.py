@@ -0,0 +1,128 @@
+"""Course-wide settings snapshots, stored column-wise.
+
+A list of get_settings() dicts repeats every key for every assignment; a SettingsTable keeps one
+list per setting instead, and converts to NumPy arrays (dates as datetime64), a pandas DataFrame,
+CSV or Parquet for auditing. NumPy, pandas and pyarrow are optional and only imported by the
+methods that need them.
+"""
+import csv
+import datetime
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from .assignment import AutograderAssignment, PDFAssignment
+if typing.TYPE_CHECKING:
+    from .course import Course
+
+__all__ = ["SettingsTable", "snapshot_settings", "fetch_settings"]
+
+# columns every snapshot has, ahead of the settings themselves
+ID_COLUMNS = ("aid", "name", "type")
+
+class SettingsTable:
+    def __init__(self):
+        self.columns: typing.Dict[str, list] = {c: [] for c in ID_COLUMNS}
+        self.nrows: int = 0
+
+    def append(self, row: dict):
+        for key in row:
+            if key not in self.columns:
+                # settings only one assignment type has are None for the others
+                self.columns[key] = [None] * self.nrows
+        for key, col in self.columns.items():
+            value = row.get(key)
+            if isinstance(value, list):
+                value = ",".join(value)
+            col.append(value)
+        self.nrows += 1
+
+    def __len__(self):
+        return self.nrows
+
+    def __getitem__(self, column: str) -> list:
+        return self.columns[column]
+
+    def rows(self) -> typing.Iterator[dict]:
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+    def kind(self, column: str) -> str:
+        """Which of "datetime", "bool", "int", "float" or "str" the column holds, going by its non-None values."""
+        kinds = {type(v) for v in self.columns[column] if v is not None}
+        if kinds and kinds <= {datetime.datetime}:
+            return "datetime"
+        if kinds and kinds <= {bool}:
+            return "bool"
+        if kinds and kinds <= {int}:
+            return "int"
+        if kinds and kinds <= {int, float}:
+            return "float"
+        return "str"
+
+    def to_numpy(self) -> dict:
+        """{column: numpy array}. Dates become datetime64[m] (NaT where missing), numbers float64 or
+        int64 (float64 with NaN if any are missing), booleans bool, and everything else object."""
+        import numpy as np
+        ret = {}
+        for name, col in self.columns.items():
+            kind = self.kind(name)
+            if kind == "datetime":
+                ret[name] = np.array([np.datetime64(v, "m") if v is not None else np.datetime64("NaT") for v in col],
+                                     dtype="datetime64[m]")
+            elif kind in ("int", "float") and None in col:
+                ret[name] = np.array([np.nan if v is None else v for v in col], dtype=np.float64)
+            elif kind == "int":
+                ret[name] = np.array(col, dtype=np.int64)
+            elif kind == "float":
+                ret[name] = np.array(col, dtype=np.float64)
+            elif kind == "bool" and None not in col:
+                ret[name] = np.array(col, dtype=bool)
+            else:
+                ret[name] = np.array(col, dtype=object)
+        return ret
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame(self.to_numpy())
+
+    def to_csv(self, path: str):
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(self.columns)
+            for values in zip(*self.columns.values()):
+                w.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime.datetime) else v
+                            for v in values])
+
+    def to_parquet(self, path: str):
+        """Needs pyarrow."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table({name: pa.array(col) for name, col in self.columns.items()}), path)
+
+
+def fetch_settings(course: "Course", aid: int) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    """Fetches one assignment's settings without knowing its type beforehand.
+    Returns ("ProgrammingAssignment" or "PDFAssignment", get_settings() dict)."""
+    edit = course.ses.get_form(f"{course.get_url()}/assignments/{aid}/edit")
+    # only programming assignments have a memory limit
+    if edit.has("assignment[memory_limit]"):
+        return "ProgrammingAssignment", AutograderAssignment.settings_from_form(edit)
+    return "PDFAssignment", PDFAssignment.settings_from_form(edit)
+
+def snapshot_settings(course: "Course", max_workers: int=8, names: typing.Iterable[str]=None) -> SettingsTable:
+    """Fetches and parses the settings of every assignment in course (or just those in names) concurrently.
+    The assignment type is worked out from the edit page itself, so this needs no prior knowledge of it."""
+    entries = list(course.catalog)
+    if names is not None:
+        names = set(names)
+        entries = [e for e in entries if e.name in names]
+
+    def fetch(entry):
+        kind, settings = fetch_settings(course, entry.aid)
+        return dict(settings, aid=entry.aid, name=entry.name, type=kind)
+
+    table = SettingsTable()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for row in pool.map(fetch, entries):
+            table.append(row)
+    return table
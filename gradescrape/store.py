@@ -0,0 +1,121 @@
+"""Persisting logged-in sessions between runs.
+
+Logging in costs a page load, a parse and a POST (or, for SAML, a whole Selenium dance), which for a
+short cron job can be most of its runtime. A SessionStore keeps the session's cookies in an encrypted
+file, so later runs -- in any number of processes -- pick the session straight back up:
+
+    store = SessionStore("~/.gradescrape/session", key=os.environ["GRADESCRAPE_STORE_KEY"])
+    ses = store.session(username="...", password="...")
+
+    # or, for SAML logins:
+    ses = store.session(login=lambda ses: ses.req.cookies.update(login.interactive_school_login()))
+
+Reloaded sessions are checked with Session.is_logged_in(). If the stored one has expired, or expires
+while in use, exactly one process logs in again (the others wait on a lock and then reuse its session).
+
+Encryption uses Fernet from the cryptography package (pip install cryptography). Generate a key once
+with SessionStore.generate_key() and keep it somewhere safer than next to the store.
+"""
+import contextlib
+import json
+import os
+import typing
+import requests
+from .session import Session
+
+__all__ = ["SessionStore"]
+
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
+
+class SessionStore:
+    def __init__(self, path: str, key: typing.Union[str, bytes]=None):
+        """
+        path    -- where the encrypted cookie jar lives. A "<path>.lock" file is created next to it.
+        key     -- a Fernet key. Defaults to the GRADESCRAPE_STORE_KEY environment variable.
+        """
+        from cryptography.fernet import Fernet
+        key = key or os.environ.get("GRADESCRAPE_STORE_KEY")
+        if not key:
+            raise ValueError("SessionStore needs a key; make one with SessionStore.generate_key()")
+        self.path: str = os.path.expanduser(path)
+        self.fernet = Fernet(key)
+
+    @staticmethod
+    def generate_key() -> str:
+        from cryptography.fernet import Fernet
+        return Fernet.generate_key().decode()
+
+    @contextlib.contextmanager
+    def _lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read(self, ses: Session) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            cookies = json.loads(self.fernet.decrypt(f.read()))
+        ses.req.cookies.clear()
+        for c in cookies:
+            ses.req.cookies.set_cookie(requests.cookies.create_cookie(**c))
+        ses.invalidate_csrf()
+        return True
+
+    def _write(self, ses: Session):
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                    "secure": c.secure, "expires": c.expires, "rest": c._rest}
+                   for c in ses.req.cookies]
+        data = self.fernet.encrypt(json.dumps(cookies).encode())
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def load(self, ses: Session) -> bool:
+        """Loads the stored cookies into ses. Returns False if nothing has been stored yet."""
+        with self._lock(False):
+            return self._read(ses)
+
+    def save(self, ses: Session):
+        with self._lock(True):
+            self._write(ses)
+
+    def relogin(self, ses: Session, login: typing.Callable[[Session], typing.Any]):
+        """Logs ses in again and stores the result, unless another process already has.
+        Holds the store's exclusive lock throughout, so concurrent callers log in only once."""
+        with self._lock(True):
+            if self._read(ses) and ses.is_logged_in():
+                return
+            login(ses)
+            self._write(ses)
+
+    def session(self, username: str=None, password: str=None, login: typing.Callable[[Session], typing.Any]=None,
+                ses: Session=None, **kwargs) -> Session:
+        """
+        Returns a logged-in Session, reusing the stored one when it's still alive.
+
+        Either username and password, or a login callable that logs in the Session it's given, are used
+        when a fresh login is needed -- now, or later if the session expires in the middle of a run.
+        Other keyword arguments go to Session().
+        """
+        if login is None:
+            if username is None or password is None:
+                raise ValueError("SessionStore.session needs either username and password, or login")
+            login = lambda s: s.login(username, password)
+        ses = ses if ses is not None else Session(**kwargs)
+        if not (self.load(ses) and ses.is_logged_in()):
+            self.relogin(ses, login)
+        ses.relogin = lambda: self.relogin(ses, login)
+        return ses
@@ -0,0 +1,346 @@
+"""Adapter layers that sit under Session.req.
+
+Anything that has to see every request (rate limiting, caching, instrumentation, ...) is written as a
+Layer: a requests transport adapter that wraps the adapter below it. Session.add_layer() stacks a new
+layer on top of whatever is currently mounted for the session's base url, so all of the library's
+calls -- including the ones that use Session.req directly -- go through it.
+
+At the bottom of the stack is the adapter that does the I/O: by default a TransportAdapter, an
+HTTPAdapter with explicit pool sizing, TCP keep-alive and an idle timeout for pooled connections,
+whose connections time their own DNS lookup, TCP connect and TLS handshake. HTTP2Adapter is a
+drop-in alternative that multiplexes requests over HTTP/2 connections (needs pip install httpx[http2]).
+Either one counts how many requests reused a pooled connection:
+
+    ses = Session(transport=TransportAdapter(pool_maxsize=32, idle_timeout=30))
+    ...
+    print(ses.transport.stats())
+"""
+import email.message
+import socket
+import threading
+import time
+import typing
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_ACCEPT_ENCODING, get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+
+__all__ = ["Layer", "innermost", "TransportAdapter", "HTTP2Adapter", "TransportStats", "connection_timings"]
+
+class Layer(BaseAdapter):
+    def __init__(self, inner: BaseAdapter):
+        super().__init__()
+        self.inner: BaseAdapter = inner
+
+    def send(self, request, **kwargs):
+        return self.inner.send(request, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+def innermost(adapter: BaseAdapter) -> BaseAdapter:
+    """Follows a stack of layers down to the adapter that actually does the I/O."""
+    while isinstance(adapter, Layer):
+        adapter = adapter.inner
+    return adapter
+
+
+# Requests run start to finish on one thread, so the connection opened for a request (if any)
+# leaves its timings here for the layers above to pick up.
+_local = threading.local()
+
+def connection_timings(reset: bool=False) -> dict:
+    """The {"dns", "connect", "tls"} seconds of the connection this thread last opened (tls is None
+    for plain http), or {} if it reused one. reset=True clears them, to be called before sending a request."""
+    t = getattr(_local, "timings", None) or {}
+    if reset:
+        _local.timings = None
+    return t
+
+class _TimedConnection:
+    def _new_conn(self):
+        # Resolve once, timed, and then connect to the resolved addresses in turn, as create_connection
+        # would. A numeric address is parsed rather than looked up, so the host is only resolved once.
+        host = self._dns_host
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+            addrs = list(dict.fromkeys(sa[0] for *_, sa in infos))
+        except (OSError, UnicodeError):
+            # let urllib3 look it up and raise its own error for it
+            addrs = []
+        t1 = time.perf_counter()
+        addrs = addrs or [host]
+        try:
+            for i, addr in enumerate(addrs):
+                self._dns_host = addr
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception:
+                    if i == len(addrs) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+        _local.timings = {"dns": t1 - t0, "connect": time.perf_counter() - t1, "tls": None}
+        return sock
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        t = _local.timings
+        if t is not None:
+            # connect() is _new_conn() followed by the handshake
+            t["tls"] = max(0.0, time.perf_counter() - t0 - t["dns"] - t["connect"])
+
+class _TransportPool:
+    # set on the per-adapter subclasses TransportAdapter makes
+    adapter: "TransportAdapter" = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        idle_timeout = self.adapter.idle_timeout if self.adapter is not None else None
+        since = getattr(conn, "_gs_idle_since", None)
+        if idle_timeout is not None and since is not None and conn.sock is not None \
+                and time.monotonic() - since > idle_timeout:
+            # the server has likely dropped it already; better to reconnect now than to fail a request on it
+            conn.close()
+            self.adapter.metrics.count("idle_closed")
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._gs_idle_since = time.monotonic()
+        super()._put_conn(conn)
+
+class TimedHTTPConnectionPool(_TransportPool, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(_TransportPool, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TransportStats:
+    """Connection reuse counters. A request that didn't open a connection reused a pooled one."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: typing.Dict[str, float] = {"requests": 0, "new_connections": 0, "handshake_seconds": 0.0,
+                                                "idle_closed": 0}
+
+    def count(self, key: str, n: float=1):
+        with self.lock:
+            self.counts[key] += n
+
+    def record(self, timings: dict):
+        """Counts a request, given the connection_timings() it left behind."""
+        with self.lock:
+            self.counts["requests"] += 1
+            if timings:
+                self.counts["new_connections"] += 1
+                self.counts["handshake_seconds"] += sum(v for v in timings.values() if v is not None)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            ret = dict(self.counts)
+        ret["reused_connections"] = max(0, ret["requests"] - ret["new_connections"])
+        ret["reuse_ratio"] = ret["reused_connections"] / ret["requests"] if ret["requests"] else None
+        ret["mean_handshake"] = ret["handshake_seconds"] / ret["new_connections"] if ret["new_connections"] else None
+        return ret
+
+
+def _keepalive_options(idle: int, interval: int, count: int) -> list:
+    opts = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # the names differ per platform; skip whatever this one doesn't have
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPALIVE", idle), ("TCP_KEEPINTVL", interval), ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            opts.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return opts
+
+
+class TransportAdapter(HTTPAdapter):
+    """
+    The adapter Session mounts for its base url by default. Its connections record connection_timings().
+
+    pool_connections    -- how many hosts to keep pools for.
+    pool_maxsize        -- connections kept per host. Should be at least the number of threads making
+                           requests, or connections get opened and thrown away under load.
+    pool_block          -- wait for a free connection rather than open one beyond pool_maxsize.
+    keepalive           -- turn on TCP keep-alive probes, sent after keepalive_idle seconds of silence,
+                           so NATs and load balancers don't silently drop pooled connections.
+    idle_timeout        -- pooled connections unused for longer than this many seconds are closed and
+                           replaced rather than reused. None reuses them however old they are.
+    accept_encoding     -- the Accept-Encoding to send when the request doesn't set its own: None for
+                           requests' default (every encoding it can decode), "identity" to turn
+                           compression off, e.g. for a fast local network where it only costs CPU.
+    """
+    def __init__(self, pool_connections: int=10, pool_maxsize: int=10, pool_block: bool=False, max_retries: int=0,
+                 keepalive: bool=True, keepalive_idle: int=60, idle_timeout: typing.Optional[float]=None,
+                 accept_encoding: str=None):
+        self.keepalive: bool = keepalive
+        self.keepalive_idle: int = keepalive_idle
+        self.idle_timeout: typing.Optional[float] = idle_timeout
+        self.accept_encoding: typing.Optional[str] = accept_encoding
+        self.metrics: TransportStats = TransportStats()
+        super().__init__(pool_connections, pool_maxsize, max_retries, pool_block)
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["keepalive", "keepalive_idle", "idle_timeout", "accept_encoding"]
+
+    def __setstate__(self, state):
+        self.metrics = TransportStats()
+        super().__setstate__(state)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs.setdefault("socket_options", HTTPConnection.default_socket_options +
+                                   _keepalive_options(self.keepalive_idle, 15, 4))
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("TimedHTTPConnectionPool", (TimedHTTPConnectionPool,), {"adapter": self}),
+            "https": type("TimedHTTPSConnectionPool", (TimedHTTPSConnectionPool,), {"adapter": self}),
+        }
+
+    def set_pool_size(self, maxsize: int):
+        """Resizes the connection pool, dropping the connections currently in it."""
+        self.poolmanager.clear()
+        self._pool_maxsize = maxsize
+        self.init_poolmanager(self._pool_connections, maxsize, block=self._pool_block)
+
+    def send(self, request, **kwargs):
+        _set_accept_encoding(request, self.accept_encoding)
+        connection_timings(reset=True)
+        r = super().send(request, **kwargs)
+        self.metrics.record(connection_timings())
+        return r
+
+    def stats(self) -> dict:
+        return self.metrics.as_dict()
+
+
+def _set_accept_encoding(request, accept_encoding):
+    if accept_encoding is not None and request.headers.get("Accept-Encoding") == DEFAULT_ACCEPT_ENCODING:
+        request.headers["Accept-Encoding"] = accept_encoding
+
+
+class _HTTPXRaw:
+    """Just enough of urllib3's HTTPResponse for requests to read an httpx response's body and cookies."""
+    def __init__(self, resp):
+        self.resp = resp
+        msg = email.message.Message()
+        for k, v in resp.headers.multi_items():
+            msg[k] = v
+        # requests' cookie extraction reads Set-Cookie headers off raw._original_response.msg
+        self._original_response = self
+        self.msg = msg
+        self._iter = None
+
+    def stream(self, chunk_size=None, decode_content=True):
+        yield from self.resp.iter_bytes(chunk_size)
+
+    def read(self, amt=None, decode_content=True, **kwargs):
+        if amt is None:
+            return self.resp.read()
+        if self._iter is None:
+            self._iter = self.resp.iter_bytes(amt)
+        return next(self._iter, b"")
+
+    def close(self):
+        self.resp.close()
+
+    def release_conn(self):
+        self.resp.close()
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Sends requests over HTTP/2 with httpx (pip install httpx[http2]), so concurrent requests share a
+    few multiplexed connections instead of each needing its own. Mount it with Session(transport=HTTP2Adapter()).
+
+    max_connections     -- connections kept open per host; each carries many concurrent requests.
+    keepalive_expiry    -- seconds an idle connection is kept before being closed.
+    accept_encoding     -- as for TransportAdapter.
+    http2               -- False falls back to HTTP/1.1 (e.g. to compare the two).
+
+    TLS verification and proxies are fixed when the adapter is made (verify=, proxy=, plus any other
+    httpx.Client keyword arguments), rather than taken per request.
+    """
+    def __init__(self, max_connections: int=4, keepalive_expiry: float=30.0, accept_encoding: str=None,
+                 http2: bool=True, **client_kwargs):
+        import httpx
+        super().__init__()
+        self.accept_encoding: typing.Optional[str] = accept_encoding
+        self.metrics: TransportStats = TransportStats()
+        self.client = httpx.Client(http2=http2, follow_redirects=False,
+                                   limits=httpx.Limits(max_connections=max_connections,
+                                                       max_keepalive_connections=max_connections,
+                                                       keepalive_expiry=keepalive_expiry),
+                                   **client_kwargs)
+
+    def set_pool_size(self, maxsize: int):
+        # httpx can't resize a live pool, and with multiplexing a handful of connections is plenty anyway
+        pass
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        import httpx
+        _set_accept_encoding(request, self.accept_encoding)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is None:
+            timeout = httpx.Timeout(None)
+        body = request.body
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = iter(body)
+        connection_timings(reset=True)
+        started = {}
+        def trace(event, info):
+            # httpcore reports connection setup as started/complete event pairs
+            name, _, phase = event.rpartition(".")
+            if phase == "started":
+                started[name] = time.perf_counter()
+            elif phase == "complete" and name in started:
+                t = _local.timings or {"dns": None, "connect": 0.0, "tls": None}
+                elapsed = time.perf_counter() - started[name]
+                if name.endswith("connect_tcp"):
+                    t["connect"] = elapsed
+                elif name.endswith("start_tls"):
+                    t["tls"] = elapsed
+                else:
+                    return
+                _local.timings = t
+        try:
+            req = self.client.build_request(request.method, request.url, headers=dict(request.headers),
+                                            content=body, timeout=timeout, extensions={"trace": trace})
+            resp = self.client.send(req, stream=True)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        self.metrics.record(connection_timings())
+
+        r = requests.Response()
+        r.status_code = resp.status_code
+        r.reason = resp.reason_phrase
+        r.headers = CaseInsensitiveDict({k: ", ".join(resp.headers.get_list(k)) for k in resp.headers.keys()})
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.raw = _HTTPXRaw(resp)
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        requests.cookies.extract_cookies_to_jar(r.cookies, request, r.raw)
+        if not stream:
+            r._content = resp.read()
+            r._content_consumed = True
+            resp.close()
+        return r
+
+    def close(self):
+        self.client.close()
+
+    def stats(self) -> dict:
+        return self.metrics.as_dict()
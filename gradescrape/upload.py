@@ -0,0 +1,350 @@
+"""Bulk uploads of scanned submissions on students' behalf.
+
+PDFAssignment.upload_submissions({student: path}) uploads each file through the assignment's
+"Upload Submission" form on a bounded pool of threads. Students are given by email, name or
+Gradescope's id for them (the owner id of the form's student picker), and resolved against the
+roster on the manage submissions page, which is loaded once for the whole batch.
+
+A name that more than one student on the roster shares is refused rather than guessed at: give
+those students by email or owner id.
+
+Files are streamed from disk (see multipart.py), so memory doesn't grow with file size or batch size.
+Since a streamed body can't be replayed by the rate limiter, the uploader retries by itself, with
+exponential backoff with full jitter (or Retry-After). A POST that creates a submission is only sent
+again when it can't have been acted on: after a 429, or a connection that failed before any of the
+body went out. After a 5xx, a timeout or a connection dropped mid-upload the server may already have
+the submission, so the student's row on the review grades page is checked first (against the one
+read when the batch started) and the upload is only sent again if no new submission turned up.
+
+With a manifest path, every finished upload is appended to it as a line of JSON. A rerun with the
+same manifest skips students whose upload of the same file (by path and size) already succeeded, so
+a batch that partly failed can simply be run again.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from . import extract
+from .multipart import ProgressCallback, as_path
+from .ratelimit import parse_retry_after
+if typing.TYPE_CHECKING:
+    from .assignment import PDFAssignment
+
+__all__ = ["UploadResult", "UploadReport", "SubmissionUploader"]
+
+# responses after which the server may or may not have created the submission
+UNCERTAIN_STATUSES = (500, 502, 503, 504)
+EMAIL = re.compile(r"[^\s()<>,;]+@[^\s()<>,;]+")
+
+class UploadResult:
+    """What happened to one student's upload. submission_id is the new submission's id, when Gradescope said."""
+    def __init__(self, student, path: str, size: int=0, owner_id: int=None, submission_id: int=None,
+                 attempts: int=0, seconds: float=0.0, skipped: bool=False, error: Exception=None):
+        self.student = student
+        self.path: str = path
+        self.size: int = size
+        self.owner_id: typing.Optional[int] = owner_id
+        self.submission_id: typing.Optional[int] = submission_id
+        self.attempts: int = attempts
+        self.seconds: float = seconds
+        self.skipped: bool = skipped
+        self.error: typing.Optional[Exception] = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def record(self) -> dict:
+        """The manifest line for this result."""
+        return {"student": self.student, "path": self.path, "size": self.size, "owner_id": self.owner_id,
+                "submission_id": self.submission_id, "ok": self.ok, "attempts": self.attempts,
+                "seconds": round(self.seconds, 3), "error": None if self.ok else repr(self.error)}
+
+    def __repr__(self):
+        what = "failed: " + repr(self.error) if self.error else "skipped" if self.skipped else f"submission {self.submission_id}"
+        return f"<UploadResult {self.student!r} {what}>"
+
+
+class UploadReport:
+    """
+    Totals for an upload_submissions() run.
+
+    failed      -- student -> exception.
+    bytes       -- file bytes uploaded successfully by this run.
+    seconds     -- wall-clock time of the whole run; throughput is bytes / seconds.
+    """
+    def __init__(self):
+        self.uploaded: int = 0
+        self.skipped: int = 0
+        self.retries: int = 0
+        self.bytes: int = 0
+        self.seconds: float = 0.0
+        self.failed: typing.Dict[typing.Any, Exception] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second over the whole run."""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def add(self, res: UploadResult):
+        self.retries += max(0, res.attempts - 1)
+        if res.error is not None:
+            self.failed[res.student] = res.error
+        elif res.skipped:
+            self.skipped += 1
+        else:
+            self.uploaded += 1
+            self.bytes += res.size
+
+    def __repr__(self):
+        return (f"<UploadReport {self.uploaded} uploaded, {self.skipped} skipped, {len(self.failed)} failed, "
+                f"{self.bytes} bytes in {self.seconds:.1f}s ({self.throughput / 1e6:.2f} MB/s)>")
+
+
+class SubmissionUploader:
+    """
+    Uploads PDFs to a PDFAssignment on students' behalf. See the module docstring.
+
+    manifest_path   -- JSONL file of results, also used to skip finished uploads on a rerun. Optional.
+    max_retries     -- retries per file after the first attempt, for connection errors and 429/5xx
+                       (see the module docstring for when a failed POST is sent again).
+    backoff_base,
+    backoff_max     -- the retry delay is uniform in [0, min(backoff_max, backoff_base * 2 ** attempt)].
+    progress        -- callback taking (bytes_sent, total_bytes, bytes_per_second) for the batch as a whole.
+    """
+    def __init__(self, assignment: "PDFAssignment", manifest_path: str=None, max_workers: int=4,
+                 max_retries: int=3, backoff_base: float=1.0, backoff_max: float=30.0, progress: ProgressCallback=None):
+        self.assignment: "PDFAssignment" = assignment
+        self.ses = assignment.ses
+        self.manifest_path: typing.Optional[str] = manifest_path
+        self.max_workers: int = max_workers
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_max: float = backoff_max
+        self.progress: typing.Optional[ProgressCallback] = progress
+        self.lock = threading.Lock()
+        self._roster: typing.Dict[str, int] = None
+        # lowercased name -> owner ids, for names more than one student has
+        self._ambiguous: typing.Dict[str, typing.List[int]] = {}
+        # owner id -> submission id of each student's latest submission, from before the first upload
+        self._before: typing.Dict[int, int] = None
+        # student -> last successful manifest record
+        self.done: typing.Dict[str, dict] = {}
+        if manifest_path is not None and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec.get("ok"):
+                        self.done[str(rec["student"])] = rec
+
+        self._sent = 0
+        self._total = 0
+        self._started: float = None
+
+    def url(self) -> str:
+        return self.assignment.get_url() + "/submissions"
+
+    def roster(self) -> typing.Dict[str, int]:
+        """{owner id, lowercased email or name: owner id} for every student the upload form offers.
+        Names shared by more than one student are left out."""
+        with self.lock:
+            if self._roster is None:
+                html = self.ses.get_html(self.url())
+                roster = {}
+                names = {}
+                for value, text in extract.select_options(html, "submission[owner_id]", self.ses.parser_backend):
+                    if not value or not value.isdigit():
+                        continue
+                    oid = int(value)
+                    roster[value] = oid
+                    emails = EMAIL.findall(text)
+                    for email in emails:
+                        roster[email.lower()] = oid
+                    # "Ada Lovelace (ada@example.com)" -> "ada lovelace"
+                    name = " ".join(EMAIL.sub("", text).replace("()", "").split()).lower()
+                    if name:
+                        names.setdefault(name, []).append(oid)
+                for name, oids in names.items():
+                    if len(oids) == 1:
+                        roster.setdefault(name, oids[0])
+                    else:
+                        self._ambiguous[name] = oids
+                self._roster = roster
+            return self._roster
+
+    def resolve(self, student) -> int:
+        """The owner id of student (an email, name or owner id). Raises KeyError if the roster doesn't have
+        them, and ValueError if student is a name that more than one student on the roster has."""
+        roster = self.roster()
+        key = str(student).strip().lower()
+        if key in self._ambiguous:
+            raise ValueError(f"{len(self._ambiguous[key])} students on the roster of assignment {self.assignment.aid} "
+                             f"are called {student!r}; give their email or owner id instead")
+        if key not in roster:
+            raise KeyError(f"no student {student!r} on the roster of assignment {self.assignment.aid}")
+        return roster[key]
+
+    def submissions(self) -> typing.Dict[int, int]:
+        """{owner id: submission id} of every student with a submission, going by the review grades page.
+        Rows whose student can't be told apart by email or name are left out."""
+        roster = self.roster()
+        ret = {}
+        for row in self.assignment.list_submissions():
+            oid = roster.get((row["email"] or row["name"]).lower())
+            if oid is not None:
+                ret[oid] = row["sid"]
+        return ret
+
+    def _submissions_before(self) -> typing.Dict[int, int]:
+        if self._before is None:
+            before = self.submissions()
+            with self.lock:
+                if self._before is None:
+                    self._before = before
+        return self._before
+
+    def _landed(self, owner_id: int, before: typing.Optional[int]) -> typing.Optional[int]:
+        """The id of a submission for owner_id that's newer than before, if the last POST made one after all."""
+        sid = self.submissions().get(owner_id)
+        return sid if sid is not None and sid != before else None
+
+    def _report_progress(self, delta: int):
+        with self.lock:
+            self._sent += delta
+            sent, total, started = self._sent, self._total, self._started
+        if self.progress is not None:
+            elapsed = time.monotonic() - started
+            self.progress(min(sent, total), total, sent / elapsed if elapsed > 0 else 0.0)
+
+    def _send(self, owner_id: int, path: str, size: int, sent: typing.List[int]) -> requests.Response:
+        """POSTs the file once. sent[0] keeps count of how much of the file went out (and was reported as
+        progress), whether or not the request succeeds: the body's bytes, up to the file's size."""
+        def progress(n, total, bps):
+            n = min(n, size)
+            delta, sent[0] = n - sent[0], n
+            self._report_progress(delta)
+        return self.ses.request_csrf(
+            "POST", self.url(), csrf_url=self.url(), allow_redirects=False,
+            data={"submission[owner_id]": owner_id, "submission[method]": "upload"},
+            files={"pdf_attachment": (os.path.basename(path), as_path(path), "application/pdf")},
+            _progress=progress)
+
+    def upload(self, student, path: str) -> UploadResult:
+        """Uploads one file for student, retrying as described in the module docstring."""
+        start = time.monotonic()
+        size = os.path.getsize(path)
+        owner_id = self.resolve(student)
+        before = self._submissions_before().get(owner_id)
+        def done(sid, sent):
+            self._report_progress(size - sent)
+            if sid is not None:
+                # so a later upload for the same student checks against this submission
+                with self.lock:
+                    self._before[owner_id] = sid
+            return UploadResult(student, path, size, owner_id, sid, attempt, time.monotonic() - start)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            sent = [0]
+            try:
+                r = self._send(owner_id, path, size, sent)
+            except (requests.ConnectionError, requests.Timeout):
+                # with none of the body sent (say, the connection couldn't be opened) nothing was created
+                sid = self._landed(owner_id, before) if sent[0] else None
+                if sid is not None:
+                    return done(sid, sent[0])
+                if attempt > self.max_retries:
+                    self._report_progress(-sent[0])
+                    raise
+            else:
+                if r.status_code not in (429,) + UNCERTAIN_STATUSES or attempt > self.max_retries:
+                    break
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                r.close()
+                if r.status_code != 429:
+                    sid = self._landed(owner_id, before)
+                    if sid is not None:
+                        return done(sid, sent[0])
+            # whatever went out is sent again by the next attempt
+            self._report_progress(-sent[0])
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.backoff_max))
+            time.sleep(delay)
+
+        if not r.ok:
+            self._report_progress(-sent[0])
+            r.raise_for_status()
+        # Gradescope redirects to the new submission
+        m = re.search(r"/submissions/(\d+)", r.headers.get("Location", "") if r.is_redirect else r.url)
+        return done(int(m.group(1)) if m else None, sent[0])
+
+    def _upload(self, student, path: str) -> UploadResult:
+        start = time.monotonic()
+        try:
+            return self.upload(student, path)
+        except Exception as e:
+            return UploadResult(student, path, error=e, seconds=time.monotonic() - start)
+
+    def _skip(self, student, path: str) -> typing.Optional[UploadResult]:
+        rec = self.done.get(str(student))
+        if rec is None or rec["path"] != path or not os.path.exists(path) or os.path.getsize(path) != rec["size"]:
+            return None
+        return UploadResult(student, path, rec["size"], rec.get("owner_id"), rec.get("submission_id"), skipped=True)
+
+    def run(self, mapping: typing.Dict[typing.Any, str],
+            on_result: typing.Callable[[UploadResult], typing.Any]=None) -> UploadReport:
+        """Uploads {student: path}, at most max_workers at a time. Failures are recorded in the report
+        rather than raised. on_result, if given, is called with each UploadResult as it finishes."""
+        report = UploadReport()
+        todo = []
+        for student, path in mapping.items():
+            path = os.path.abspath(path)
+            skipped = self._skip(student, path)
+            if skipped is not None:
+                report.add(skipped)
+                if on_result is not None:
+                    on_result(skipped)
+            else:
+                todo.append((student, path))
+        self._total = sum(os.path.getsize(p) for _, p in todo if os.path.exists(p))
+        self._started = time.monotonic()
+        if todo:
+            # fail fast (and once) on a roster or submission list we can't read, rather than once per file
+            self._submissions_before()
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def finish(done):
+                for fut in done:
+                    pending.discard(fut)
+                    res = fut.result()
+                    report.add(res)
+                    if self.manifest_path is not None:
+                        with self.lock:
+                            with open(self.manifest_path, "a") as f:
+                                f.write(json.dumps(res.record()) + "\n")
+                    if on_result is not None:
+                        on_result(res)
+            for student, path in todo:
+                while len(pending) >= 2 * self.max_workers:
+                    finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+                pending.add(pool.submit(self._upload, student, path))
+            while pending:
+                finish(wait(pending, return_when=FIRST_COMPLETED)[0])
+        report.seconds = time.monotonic() - self._started
+        return report
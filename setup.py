@@ -5,7 +5,7 @@ with open("README.md", "r") as fh:
 
 #with open("requirements.txt") as f:
 #    reqs = f.read().splitlines()
-reqs = ['requests', 'beautifulsoup4']
+reqs = ['requests', 'beautifulsoup4', 'lxml']
 
 setuptools.setup(
     name="gradescrape",
@@ -19,10 +19,13 @@ setuptools.setup(
     url="https://github.com/guineawheek/gradescrape",
     packages=["gradescrape"],
     install_requires=reqs,
+    entry_points={
+        "console_scripts": ["gradescrape = gradescrape.cli:main"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: BSD License",
         "Operating System :: OS Independent",
     ],
-    python_requires = ">=3.6",
+    python_requires = ">=3.7",
 )
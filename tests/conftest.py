@@ -0,0 +1,8 @@
+import pytest
+from mockserver import MockGradescope
+
+
+@pytest.fixture
+def server():
+    with MockGradescope(courses={10: 4, 20: 0}) as srv:
+        yield srv
@@ -0,0 +1,593 @@
+"""A local stand-in for Gradescope, for testing and benchmarking gradescrape without a real account.
+The test suite runs against it (see conftest.py), as does benchmarks/bench_client.py.
+
+Usage: python tests/mockserver.py [--port N] [--latency SECONDS] [--error-rate P]
+
+or, from Python:
+
+    with MockGradescope(latency=0.05) as server:
+        ses = gradescrape.Session(base_url=server.url)
+        ses.login("user@example.com", "hunter2")
+
+Pages are shaped like Gradescope's (csrf <meta> in a head full of assets, navigation, help text) and
+cover what the library touches: the login page, /account, the instructor assignments table, /edit,
+/configure_autograder, /outline/edit, /review_grades, /submissions and scores.csv exports, assignment
+creation, settings and autograder updates, outline patches, submission downloads (with range requests),
+uploads on students' behalf and regrades. Writes check the session's csrf token and answer 422 to a wrong one, like Rails.
+
+Courses 10, 100 and 1000 start out with that many assignments (alternating programming and PDF);
+any other course id starts empty. Every assignment has a submission (of submission_size bytes)
+from each of the first `submissions` students on a shared roster, and one student who never
+submits. Any password logs in.
+
+latency         -- seconds added to every response, plus up to jitter seconds more.
+error_rate      -- fraction of requests answered with error_status instead (503, with a Retry-After of 0,
+                   by default).
+regrade_time    -- after "regrade all", each submission shows as queued for up to this many seconds,
+                   after a short delay before the jobs are queued at all.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import html
+import http.server
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlparse, parse_qs
+
+__all__ = ["MockGradescope"]
+
+DEFAULT_COURSES = {10: 10, 100: 100, 1000: 1000}
+CHUNK_SIZE = 64 * 1024
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+
+def gs_time(d: datetime.datetime) -> str:
+    return d.strftime("%b %-d %Y %I:%M %p")
+
+def head(token):
+    assets = "".join(f'<link rel="stylesheet" href="/assets/{i}.css"><script src="/assets/{i}.js"></script>' for i in range(12))
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Gradescope</title>'
+            f'<meta name="csrf-param" content="authenticity_token"><meta name="csrf-token" content="{token}">'
+            f'{assets}</head>')
+
+def page(token, body):
+    nav = "".join(f'<li class="sidebarNav--item"><a href="/courses/{i}">Course {i}</a></li>' for i in range(40))
+    return head(token) + f'<body><nav><ul>{nav}</ul></nav><main>{body}</main></body></html>'
+
+def filler(n):
+    return "".join(f'<div class="form--help"><p>Help text {i}.</p><span class="tooltip">More</span></div>' for i in range(n))
+
+def checkbox(name, on):
+    return f'<input type="hidden" name="{name}" value="0"><input type="checkbox" name="{name}" value="1"{" checked" if on else ""}>'
+
+def text(name, value):
+    # Gradescope leaves the value attribute off empty fields
+    return f'<input name="{name}" value="{value}">' if value else f'<input name="{name}">'
+
+def submission_data(sid, size):
+    # deterministic, so a test can check what it downloaded
+    block = hashlib.sha256(str(sid).encode()).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+def radios(name, options, selected):
+    return "".join(f'<input type="radio" name="{name}" value="{o}"{" checked" if o == selected else ""}>' for o in options)
+
+
+class Assignment:
+    def __init__(self, aid, title, kind, release, due, points=10.0):
+        self.aid, self.title, self.kind = aid, title, kind
+        self.settings = {
+            "assignment[title]": title,
+            "assignment[total_points]": str(points),
+            "assignment[release_date_string]": gs_time(release),
+            "assignment[due_date_string]": gs_time(due),
+            "allow_late_submissions": "0",
+            "assignment[hard_due_date_string]": "",
+            "assignment[manual_grading]": "0",
+            "assignment[leaderboard_enabled]": "0",
+            "assignment[leaderboard_max_entries]": "",
+            "assignment[group_submission]": "0",
+            "assignment[group_size]": "",
+            "assignment[ignored_files]": "",
+            "assignment[memory_limit]": "768",
+            "assignment[autograder_timeout]": "600",
+            "assignment[submission_methods[upload]]": "1",
+            "assignment[submission_methods[github]]": "1",
+            "assignment[submission_methods[bitbucket]]": "0",
+            "assignment[image_name]": f"gradescope/autograders/{aid}",
+            "assignment[student_submission]": "true",
+            "assignment[submission_type]": "image",
+            "assignment[submissions_anonymized]": "0",
+            "assignment[rubric_item_groups_mutually_exclusive]": "false",
+            "assignment[ceiling]": "1",
+            "assignment[floor]": "1",
+            "assignment[rubric_visibility_setting]": "show_all_rubric_items",
+            "assignment[scoring_type]": "positive",
+        }
+        self.outline = []
+        # owner id -> submission id, for submissions uploaded by an instructor
+        self.uploads = {}
+        # submission id -> (monotonic time its regrade is queued, and done)
+        self.regrading = {}
+
+    def row(self, cid):
+        s = self.settings
+        return (f'<tr><td class="table--primaryLink"><a href="/courses/{cid}/assignments/{self.aid}">{self.title}</a></td>'
+                f'<td>{s["assignment[total_points]"]}</td><td><span>{s["assignment[release_date_string]"]}</span></td>'
+                f'<td><span>{s["assignment[due_date_string]"]}</span></td>'
+                f'<td><a href="/courses/{cid}/assignments/{self.aid}/review_grades">Review Grades</a></td></tr>')
+
+    def edit_form(self):
+        s = self.settings
+        on = lambda k: str(s.get(k)).lower() in ("1", "true", "on")
+        fields = [
+            text("assignment[title]", s["assignment[title]"]),
+            text("assignment[release_date_string]", s["assignment[release_date_string]"]),
+            text("assignment[due_date_string]", s["assignment[due_date_string]"]),
+            checkbox("allow_late_submissions", on("allow_late_submissions")),
+            text("assignment[hard_due_date_string]", s["assignment[hard_due_date_string]"]),
+            checkbox("assignment[manual_grading]", on("assignment[manual_grading]")),
+            checkbox("assignment[group_submission]", on("assignment[group_submission]")),
+            text("assignment[group_size]", s["assignment[group_size]"]),
+        ]
+        if self.kind == "ProgrammingAssignment":
+            fields += [
+                text("assignment[total_points]", s["assignment[total_points]"]),
+                checkbox("assignment[leaderboard_enabled]", on("assignment[leaderboard_enabled]")),
+                text("assignment[leaderboard_max_entries]", s["assignment[leaderboard_max_entries]"]),
+                f'<textarea name="assignment[ignored_files]">{s["assignment[ignored_files]"]}</textarea>',
+                radios("assignment[memory_limit]", ("384", "768", "1024", "2048", "3072", "4096", "6144"), s["assignment[memory_limit]"]),
+                '<select name="assignment[autograder_timeout]">' + "".join(
+                    f'<option value="{t}"{" selected" if str(t) == s["assignment[autograder_timeout]"] else ""}>{t // 60} minutes</option>'
+                    for t in range(60, 2460, 60)) + '</select>',
+            ] + [checkbox(f"assignment[submission_methods[{m}]]", on(f"assignment[submission_methods[{m}]]"))
+                 for m in ("upload", "github", "bitbucket")]
+        else:
+            fields += [
+                radios("assignment[student_submission]", ("true", "false"), s["assignment[student_submission]"]),
+                radios("assignment[submission_type]", ("image", "pdf"), s["assignment[submission_type]"]),
+                checkbox("assignment[submissions_anonymized]", on("assignment[submissions_anonymized]")),
+                checkbox("assignment[rubric_item_groups_mutually_exclusive]", on("assignment[rubric_item_groups_mutually_exclusive]")),
+                checkbox("assignment[ceiling]", on("assignment[ceiling]")),
+                checkbox("assignment[floor]", on("assignment[floor]")),
+                radios("assignment[rubric_visibility_setting]", ("show_all_rubric_items", "show_only_applied_rubric_items",
+                                                                  "hide_all_rubric_items"), s["assignment[rubric_visibility_setting]"]),
+                radios("assignment[scoring_type]", ("positive", "negative"), s["assignment[scoring_type]"]),
+            ]
+        return f'<form class="assignmentForm" action="/courses" method="post">{filler(200)}{"".join(fields)}</form>'
+
+
+class State:
+    def __init__(self, courses, submissions=3, submission_size=64 * 1024):
+        self.lock = threading.Lock()
+        self.submissions = submissions
+        self.submission_size = submission_size
+        self.sessions = {}  # session id -> (csrf token, logged in)
+        self.courses = {}
+        self.next_aid = 100000
+        self.next_question_id = 500000
+        # roster entries to add (or to replace default ones with), owner id -> (name, email)
+        self.students = {}
+        # courses the user is enrolled in as a student, course id -> short name
+        self.enrolled = {}
+        for cid, n in courses.items():
+            self.courses[cid] = {}
+            for i in range(n):
+                kind = "ProgrammingAssignment" if i % 2 == 0 else "PDFAssignment"
+                self.add(cid, f"Assignment {i}", kind, RELEASE + datetime.timedelta(days=i), RELEASE + datetime.timedelta(days=i + 7))
+
+    def add(self, cid, title, kind, release, due):
+        aid = self.next_aid
+        self.next_aid += 1
+        self.courses.setdefault(cid, {})[aid] = Assignment(aid, title, kind, release, due)
+        return aid
+
+    def roster(self):
+        # owner id -> (name, email)
+        ret = {7000 + k: (f"Student {k}", f"student{k}@example.com") for k in range(self.submissions)}
+        ret.update(self.students)
+        ret[6999] = ("Student Missing", "missing@example.com")
+        return ret
+
+    def submission_ids(self, aid):
+        # student k's submission to aid
+        return range(aid * 1000, aid * 1000 + self.submissions)
+
+    def new_question_id(self):
+        self.next_question_id += 1
+        return self.next_question_id
+
+    def new_session(self, logged_in=False):
+        sid = uuid.uuid4().hex
+        self.sessions[sid] = (uuid.uuid4().hex, logged_in)
+        return sid
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # one write per response, so delayed ACKs don't add 40ms to every request
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    server: "MockGradescope"
+
+    def log_message(self, *args):
+        pass
+
+    # plumbing
+
+    def respond(self, status, body="", headers=(), content_type="text/html; charset=utf-8"):
+        data = body if isinstance(body, bytes) else body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers:
+            self.send_header(k, v)
+        if self._new_sid:
+            self.send_header("Set-Cookie", f"_gradescope_session={self._new_sid}; path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location):
+        self.respond(302, "", [("Location", location)])
+
+    def read_body(self) -> bytes:
+        """Reads the request body. Uploads (anything multipart) are read and thrown away a chunk at a time."""
+        left = int(self.headers.get("Content-Length") or 0)
+        if "multipart/" in self.headers.get("Content-Type", ""):
+            fields = b""
+            while left > 0:
+                chunk = self.rfile.read(min(CHUNK_SIZE, left))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                # the plain form fields come before the file parts
+                if len(fields) < CHUNK_SIZE:
+                    fields += chunk
+            self.server.count("upload_bytes", int(self.headers.get("Content-Length") or 0))
+            return fields
+        return self.rfile.read(left)
+
+    def form(self, body) -> dict:
+        ctype = self.headers.get("Content-Type", "")
+        if "multipart/" in ctype:
+            boundary = ctype.split("boundary=")[-1].encode()
+            ret = {}
+            for part in body.split(b"--" + boundary):
+                m = re.match(rb'\r\nContent-Disposition: form-data; name="([^"]*)"\r\n\r\n(.*)\r\n$', part, re.S)
+                if m:
+                    ret[m.group(1).decode()] = m.group(2).decode()
+            return ret
+        if "json" in ctype:
+            return json.loads(body or b"{}")
+        return {k: v[-1] for k, v in parse_qs(body.decode(), keep_blank_values=True).items()}
+
+    def session(self):
+        cookies = dict(c.strip().split("=", 1) for c in self.headers.get("Cookie", "").split(";") if "=" in c)
+        sid = cookies.get("_gradescope_session")
+        with self.server.state.lock:
+            if sid not in self.server.state.sessions:
+                sid = self._new_sid = self.server.state.new_session()
+            return sid, self.server.state.sessions[sid]
+
+    # dispatch
+
+    ROUTES = [
+        ("GET", r"/", "home"),
+        ("GET", r"/login", "home"),
+        ("POST", r"/login", "login"),
+        ("GET", r"/account", "account"),
+        ("GET", r"/courses/(\d+)/assignments", "assignments"),
+        ("POST", r"/courses/(\d+)/assignments", "create"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/edit", "edit"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/configure_autograder", "configure_autograder"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/outline/edit", "outline_edit"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/review_grades", "review_grades"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/submissions/(\d+)\.(?:pdf|zip)", "submission_file"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/scores\.csv", "scores_csv"),
+        ("GET", r"/courses/(\d+)/assignments/(\d+)/submissions", "manage_submissions"),
+        ("POST", r"/courses/(\d+)/assignments/(\d+)/submissions", "upload_submission"),
+        ("POST", r"/courses/(\d+)/assignments/(\d+)/regrade_all", "regrade_all"),
+        ("PATCH", r"/courses/(\d+)/assignments/(\d+)/outline/?", "outline_patch"),
+        ("POST", r"/courses/(\d+)/assignments/(\d+)", "update"),
+    ]
+
+    def handle_any(self):
+        self._new_sid = None
+        srv = self.server
+        path = urlparse(self.path).path
+        for method, pattern, name in self.ROUTES:
+            m = re.fullmatch(pattern, path)
+            if m and method == self.command:
+                break
+        else:
+            self.read_body()
+            return self.respond(404, "not found")
+        srv.count(f"{self.command} {name}")
+        if srv.latency or srv.jitter:
+            time.sleep(srv.latency + random.random() * srv.jitter)
+        if srv.error_rate and random.random() < srv.error_rate:
+            self.read_body()
+            srv.count("injected_errors")
+            return self.respond(srv.error_status, "error", [("Retry-After", "0")])
+
+        sid, (token, logged_in) = self.session()
+        if name not in ("home", "login") and not logged_in:
+            self.read_body()
+            return self.redirect("/login")
+        args = [int(g) for g in m.groups()]
+        if self.command != "GET":
+            body = self.read_body()
+            data = self.form(body)
+            sent = data.get("authenticity_token") or self.headers.get("X-CSRF-Token")
+            if sent != token:
+                return self.respond(422, "ActionController::InvalidAuthenticityToken")
+            return getattr(self, name)(sid, token, data, *args)
+        return getattr(self, name)(sid, token, *args)
+
+    do_GET = do_POST = do_PATCH = handle_any
+
+    def course(self, cid):
+        return self.server.state.courses.setdefault(cid, {})
+
+    def assignment(self, cid, aid):
+        return self.course(cid).get(aid)
+
+    # pages
+
+    def home(self, sid, token):
+        form = ('<form action="/login" method="post"><input type="email" name="session[email]">'
+                '<input type="password" name="session[password]"><input type="submit" value="Log In"></form>')
+        self.respond(200, page(token, filler(100) + form))
+
+    def login(self, sid, token, data):
+        with self.server.state.lock:
+            # Rails rotates the session (and the token with it) on login
+            del self.server.state.sessions[sid]
+            self._new_sid = self.server.state.new_session(logged_in=True)
+        self.redirect("/account")
+
+    def account(self, sid, token):
+        with self.server.state.lock:
+            boxes = "".join(f'<a class="courseBox" href="/courses/{cid}"><h3 class="courseBox--shortname">CS {cid}</h3>'
+                            f'<div class="courseBox--name">Course {cid}</div>'
+                            f'<div class="courseBox--assignments">{len(assignments)} assignments</div></a>'
+                            for cid, assignments in sorted(self.server.state.courses.items()))
+            enrolled = "".join(f'<a class="courseBox" href="/courses/{cid}"><h3 class="courseBox--shortname">{name}</h3>'
+                               f'<div class="courseBox--name">{name}</div></a>'
+                               for cid, name in sorted(self.server.state.enrolled.items()))
+        student = ('<h1 class="pageHeading">Student Courses</h1><div class="courseList">'
+                   f'<div class="courseList--term pageSubheading">Spring 2022</div>'
+                   f'<div class="courseList--coursesForTerm">{enrolled}</div></div>') if enrolled else ""
+        self.respond(200, page(token, '<h1 class="pageHeading">Instructor Courses</h1><div class="courseList">'
+                                      '<div class="courseList--term pageSubheading">Fall 2021</div>'
+                                      f'<div class="courseList--coursesForTerm">{boxes}'
+                                      '<button class="courseBox courseBox-new">Create a new course</button></div></div>'
+                                      + student))
+
+    def assignments(self, sid, token, cid):
+        with self.server.state.lock:
+            rows = "".join(a.row(cid) for a in self.course(cid).values())
+        table = (f'<table id="assignments-instructor-table" class="table"><thead><tr><th>Name</th><th>Points</th>'
+                 f'<th>Released</th><th>Due</th><th></th></tr></thead><tbody>{rows}</tbody></table>')
+        self.respond(200, page(token, table))
+
+    def create(self, sid, token, data, cid):
+        title = data.get("assignment[title]")
+        if not title:
+            return self.respond(400, "title missing")
+        kind = data.get("assignment[type]") or "PDFAssignment"
+        release = datetime.datetime.strptime(data["assignment[release_date_string]"], "%b %d %Y %I:%M %p")
+        due = datetime.datetime.strptime(data["assignment[due_date_string]"], "%b %d %Y %I:%M %p")
+        with self.server.state.lock:
+            aid = self.server.state.add(cid, title, kind, release, due)
+            self.assignment(cid, aid).settings.update({k: str(v) for k, v in data.items() if k.startswith("assignment[")})
+        then = "configure_autograder" if kind == "ProgrammingAssignment" else "outline/edit"
+        self.redirect(f"/courses/{cid}/assignments/{aid}/{then}")
+
+    def edit(self, sid, token, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        self.respond(200, page(token, a.edit_form()))
+
+    def configure_autograder(self, sid, token, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        form = (f'<form action="/courses/{cid}/assignments/{aid}" method="post">{filler(100)}'
+                f'<input type="hidden" name="assignment[image_name]" value="{a.settings["assignment[image_name]"]}">'
+                f'<input type="file" name="autograder_zip"></form>')
+        self.respond(200, page(token, form))
+
+    def outline_edit(self, sid, token, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        props = html.escape(json.dumps({"assignment": {"id": aid}, "outline": a.outline}))
+        self.respond(200, page(token, f'<div data-react-class="AssignmentOutline" data-react-props="{props}"></div>'))
+
+    def review_grades(self, sid, token, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        now = time.monotonic()
+        def cells(s):
+            queued, done = a.regrading.get(s, (None, None))
+            if queued is not None and queued <= now < done:
+                return '<td></td><td>Autograder Running</td>'
+            # regraded submissions score a point more
+            return f'<td>{(s + (done is not None and now >= done)) % 11}.0</td><td></td>'
+        def row(oid, s):
+            name, email = self.server.state.roster()[oid]
+            if s is None:
+                return f'<tr><td>{name}</td><td>{email}</td><td></td></tr>'
+            return (f'<tr><td class="table--primaryLink"><a href="/courses/{cid}/assignments/{aid}/submissions/{s}">'
+                    f'{name}</a></td><td>{email}</td>{cells(s)}</tr>')
+        # a student's latest upload stands in for their submission; the last student hasn't submitted
+        with self.server.state.lock:
+            latest = {7000 + s % 1000: s for s in self.server.state.submission_ids(aid)}
+            latest.update(a.uploads)
+        rows = "".join(row(oid, latest.get(oid)) for oid in sorted(self.server.state.roster(), key=lambda o: o == 6999))
+        self.respond(200, page(token, f'<table class="table js-reviewGradesTable"><tbody>{rows}</tbody></table>'))
+
+    def submission_file(self, sid, token, cid, aid, sub):
+        a = self.assignment(cid, aid)
+        if a is None or (sub not in self.server.state.submission_ids(aid) and sub not in a.uploads.values()):
+            return self.respond(404, "not found")
+        data = submission_data(sub, self.server.state.submission_size)
+        etag = f'"{sub}-{len(data)}"'
+        m = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if m and self.headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            if start >= len(data):
+                return self.respond(416, "", [("Content-Range", f"bytes */{len(data)}")])
+            self.server.count("download_bytes", len(data) - start)
+            return self.respond(206, data[start:], [("ETag", etag), ("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")],
+                                content_type="application/octet-stream")
+        self.server.count("download_bytes", len(data))
+        self.respond(200, data, [("ETag", etag), ("Accept-Ranges", "bytes")], content_type="application/octet-stream")
+
+    def scores_csv(self, sid, token, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        out = io.StringIO()
+        w = csv.writer(out)
+        w.writerow(["Name", "SID", "Email", "Total Score", "Max Points", "Status", "Submission ID",
+                    "Submission Time", "Lateness (H:M:S)", "1: Question 1 (5.0 pts)"])
+        points = a.settings["assignment[total_points]"]
+        roster = self.server.state.roster()
+        for s in self.server.state.submission_ids(aid):
+            k = s % 1000
+            name, email = roster[7000 + k]
+            when = (RELEASE + datetime.timedelta(hours=k)).strftime("%Y-%m-%d %H:%M:%S -0700")
+            w.writerow([name, k, email, s % 11, points, "Graded", s, when, "00:00:00", s % 5])
+        w.writerow(["Student Missing", "", "missing@example.com", "", points, "Missing", "", "", "", ""])
+        self.respond(200, "\ufeff" + out.getvalue(), content_type="text/csv")
+
+    def manage_submissions(self, sid, token, cid, aid):
+        if self.assignment(cid, aid) is None:
+            return self.respond(404, "not found")
+        options = "".join(f'<option value="{oid}">{html.escape(name)} ({email})</option>'
+                          for oid, (name, email) in sorted(self.server.state.roster().items()))
+        form = (f'<form action="/courses/{cid}/assignments/{aid}/submissions" method="post" enctype="multipart/form-data">'
+                f'{filler(50)}<select name="submission[owner_id]"><option value="">Select a student</option>{options}</select>'
+                '<input type="file" name="pdf_attachment"></form>')
+        self.respond(200, page(token, form))
+
+    def upload_submission(self, sid, token, data, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        owner = data.get("submission[owner_id]", "")
+        if not owner.isdigit() or int(owner) not in self.server.state.roster():
+            return self.respond(400, "unknown student")
+        with self.server.state.lock:
+            a.uploads[int(owner)] = sub = self.server.state.new_question_id()
+        self.server.count("uploads")
+        self.redirect(f"/courses/{cid}/assignments/{aid}/submissions/{sub}")
+
+    def regrade_all(self, sid, token, data, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        now = time.monotonic()
+        spread = self.server.regrade_time
+        with self.server.state.lock:
+            for s in self.server.state.submission_ids(aid):
+                queued = now + random.uniform(0, min(0.5, spread / 4))
+                a.regrading[s] = (queued, queued + random.uniform(0, spread))
+        self.redirect(f"/courses/{cid}/assignments/{aid}/review_grades")
+
+    def outline_patch(self, sid, token, data, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        def assign_ids(questions):
+            for q in questions:
+                if q.get("id") is None:
+                    q["id"] = self.server.state.new_question_id()
+                assign_ids(q.get("children", []))
+        with self.server.state.lock:
+            questions = data.get("question_data", [])
+            assign_ids(questions)
+            a.outline = questions
+        self.respond(200, json.dumps({"status": "ok"}))
+
+    def update(self, sid, token, data, cid, aid):
+        a = self.assignment(cid, aid)
+        if a is None:
+            return self.respond(404, "not found")
+        with self.server.state.lock:
+            a.settings.update({k: str(v) for k, v in data.items() if k.startswith("assignment[") or k == "allow_late_submissions"})
+            a.title = a.settings["assignment[title]"]
+        self.redirect(f"/courses/{cid}/assignments/{aid}/edit")
+
+
+class MockGradescope(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int=0, courses: dict=None, latency: float=0.0, jitter: float=0.0,
+                 error_rate: float=0.0, error_status: int=503, submissions: int=3, submission_size: int=64 * 1024,
+                 regrade_time: float=5.0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.state = State(DEFAULT_COURSES if courses is None else courses, submissions, submission_size)
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.error_rate: float = error_rate
+        self.error_status: int = error_status
+        self.regrade_time: float = regrade_time
+        self.counts: dict = {}
+        self._counts_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, key, n=1):
+        with self._counts_lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def start(self) -> "MockGradescope":
+        """Serves from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--port", type=int, default=0)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--jitter", type=float, default=0.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--error-status", type=int, default=503)
+    args = p.parse_args()
+    server = MockGradescope(args.port, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, error_status=args.error_status)
+    # benchmarks run this as a subprocess and read the url off the first line
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+import gradescrape
+from gradescrape.aio import AsyncSession, AsyncAutograderAssignment, AsyncPDFAssignment
+from gradescrape.assignment import AutograderAssignment, PDFAssignment
+
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+DUE = datetime.datetime(2021, 9, 10, 23, 59)
+
+
+def session(server, concurrency=4) -> AsyncSession:
+    return AsyncSession(gradescrape.Session(base_url=server.url, rate_limiter=None), concurrency=concurrency)
+
+
+def test_login_and_courses(server):
+    async def main():
+        async with session(server) as ases:
+            await ases.login("user@example.com", "hunter2")
+            courses = await ases.get_courses()
+            return sorted(c.cid for c in courses)
+    assert asyncio.run(main()) == [10, 20]
+
+
+def test_concurrent_reads(server):
+    async def main():
+        async with session(server) as ases:
+            await ases.login("user@example.com", "hunter2")
+            course = ases.get_course(10)
+            names = await course.list_assignments()
+            # the mock alternates programming and PDF assignments, starting with "Assignment 0"
+            assgns = [await course.get_assignment_by_name(name, AutograderAssignment if i % 2 == 0 else PDFAssignment)
+                      for i, name in enumerate(sorted(names))]
+            settings = await asyncio.gather(*(a.get_settings() for a in assgns))
+            return names, assgns, settings
+    names, assgns, settings = asyncio.run(main())
+    assert len(names) == 4
+    assert [s["title"] for s in settings] == sorted(names)
+    assert {type(a) for a in assgns} == {AsyncAutograderAssignment, AsyncPDFAssignment}
+
+
+def test_create_and_update(server):
+    async def main():
+        async with session(server) as ases:
+            await ases.login("user@example.com", "hunter2")
+            course = ases.get_course(20)
+            prog = await course.create_prog_assignment("prog", 10, RELEASE, DUE)
+            pdf = await course.create_pdf_assignment("pdf", "t.pdf", b"%PDF-1.4\n", RELEASE, DUE)
+            settings = await prog.get_settings()
+            settings["title"] = "prog renamed"
+            await prog.update_settings(**settings)
+            await pdf.update_outline([{"title": "Q1", "weight": 2}, {"title": "Q2", "weight": 3}])
+            return await course.list_assignments(), await pdf.get_outline()
+    names, outline = asyncio.run(main())
+    assert set(names) == {"prog renamed", "pdf"}
+    assert outline is not None
+
+
+def test_concurrency_limit(server):
+    async def main():
+        async with session(server, concurrency=2) as ases:
+            await ases.login("user@example.com", "hunter2")
+            course = ases.get_course(10)
+            # more calls than workers: they queue on the semaphore rather than failing
+            return await asyncio.gather(*(course.list_assignments() for _ in range(8)))
+    results = asyncio.run(main())
+    assert len(results) == 8 and all(r == results[0] for r in results)
+
+
+def test_run_outside_event_loop_fails():
+    ases = AsyncSession(gradescrape.Session(rate_limiter=None), concurrency=1)
+    try:
+        coro = ases.run(lambda: None)
+        try:
+            coro.send(None)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("run() worked without a running loop")
+        finally:
+            coro.close()
+    finally:
+        ases.close()
+
+
+def test_session_outlives_its_event_loop(server):
+    ases = session(server, concurrency=1)
+    async def main():
+        await ases.login("user@example.com", "hunter2")
+        course = ases.get_course(10)
+        # more calls than the limit, so they have to wait on it
+        return await asyncio.gather(*(course.list_assignments() for _ in range(3)))
+    try:
+        # each asyncio.run() is a new event loop; the limit mustn't stay tied to the first
+        assert len(asyncio.run(main())) == 3
+        assert len(asyncio.run(main())) == 3
+    finally:
+        ases.close()
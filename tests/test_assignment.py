@@ -0,0 +1,84 @@
+import datetime
+import io
+import zipfile
+from bs4 import BeautifulSoup
+import gradescrape
+from gradescrape import util
+from gradescrape.assignment import AutograderAssignment, PDFAssignment
+
+
+def login(server) -> gradescrape.Session:
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses
+
+
+def test_form_helpers_agree_on_soup_and_snapshot(server):
+    ses = login(server)
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    html = ses.get_html(a.get_url() + "/edit")
+    soup, snap = BeautifulSoup(html, features="lxml"), util.FormSnapshot(html)
+    for form in (soup, snap):
+        assert util.form_from_value(form, "assignment[title]") == "Assignment 0"
+        assert util.form_from_date(form, "assignment[due_date_string]") is not None
+    for fn, field in ((util.form_from_checkbox, "assignment[manual_grading]"),
+                      (util.form_from_radio, "assignment[memory_limit]"),
+                      (util.form_from_select, "assignment[autograder_timeout]")):
+        assert fn(soup, field) == fn(snap, field)
+
+
+def test_update_autograder_zip(server):
+    ses = login(server)
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("run_autograder", "#!/bin/sh\n")
+    buf.seek(0)
+    fetches = ses.csrf_fetches
+    a.update_autograder_zip(buf, "autograder.zip")
+    # the token came along with the configure page rather than from a separate fetch
+    assert ses.csrf_fetches == fetches
+
+
+def test_settings_round_trip(server):
+    ses = login(server)
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    settings = a.get_settings()
+    a.update_settings(**settings)
+    a._memo.clear()
+    assert a.get_settings() == settings
+    changed = dict(settings, memory_limit=2048, autograder_timeout=1200, manual_grading=True,
+                   leaderboard_enabled=True, leaderboard_max_entries=5,
+                   due_date=settings["due_date"] + datetime.timedelta(days=1))
+    a.update_settings(**changed)
+    a._memo.clear()
+    assert a.get_settings() == changed
+
+
+def test_pdf_settings_round_trip(server):
+    ses = login(server)
+    a = ses.get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment)
+    settings = a.get_settings()
+    changed = dict(settings, title="Renamed", anon_grading=True, rubric_select_one=True, floor=False,
+                   scoring_type="negative", rubric_visibility_setting="hide_all_rubric_items",
+                   release_date=settings["release_date"] - datetime.timedelta(hours=3))
+    a.update_settings(**changed)
+    a._memo.clear()
+    assert a.get_settings() == changed
+    assert "Renamed" in ses.get_course(10).list_assignments()
+
+
+def test_snapshot_defaults_and_decoding():
+    snap = util.FormSnapshot(
+        '<form><input name="n" value="7"><input name="blank"><input type="checkbox" id="box" checked>'
+        '<input type="radio" name="r" value="a"><input type="radio" name="r" value="b" checked>'
+        '<select name="s"><option>first</option><option value="2" selected>two</option></select>'
+        '<select name="empty"></select><textarea name="t">hi</textarea></form>')
+    assert snap.value("n", int) == 7 and snap.value("blank") is None
+    assert snap.value("missing", default="d") == "d" and not snap.has("missing")
+    assert snap.checkbox("box", use_id=True) and not snap.checkbox("box")
+    assert snap.radio("r") == "b" and snap.radio("nope", default="x") == "x"
+    assert snap.select("s") == "2" and snap.select("empty", default="e") == "e"
+    assert snap.textarea("t") == "hi" and snap.textarea("nope") == ""
+    # an option without a value submits its text
+    assert util.FormSnapshot('<select name="s"><option>first</option></select>').select("s") == "first"
@@ -0,0 +1,21 @@
+import gradescrape
+
+
+def test_course_list_is_cached(server):
+    ses = gradescrape.Session(base_url=server.url, cache=True)
+    ses.login("user@example.com", "hunter2")
+    first = [c.cid for c in ses.get_courses()]
+    fetched = server.counts.get("GET account", 0)
+    assert fetched >= 1
+    assert [c.cid for c in ses.get_courses()] == first
+    assert server.counts.get("GET account", 0) == fetched
+    assert ses.cache.hits >= 1
+
+
+def test_login_probe_skips_the_cache(server):
+    ses = gradescrape.Session(base_url=server.url, cache=True)
+    ses.login("user@example.com", "hunter2")
+    ses.get_courses()
+    ses.req.cookies.clear()
+    # the cached course list mustn't make a logged-out session look alive
+    assert not ses.is_logged_in()
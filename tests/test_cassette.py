@@ -0,0 +1,140 @@
+import gzip
+import os
+import re
+import pytest
+import gradescrape
+from gradescrape.assignment import AutograderAssignment, PDFAssignment
+from gradescrape.cassette import CassetteMiss, _MultipartHasher, cassette_transport, hash_body
+from gradescrape.multipart import FilePart, MultipartEncoder
+from gradescrape.transport import Layer, TransportAdapter
+
+EMAIL, PASSWORD = "user@example.com", "hunter2"
+ZIP = b"PK\x03\x04" + bytes(range(256)) * 300
+FIXTURE = os.path.join(os.path.dirname(__file__), "cassettes", "workflow.jsonl")
+# nothing listens here: a replaying session must never need the network
+DEAD = "http://127.0.0.1:9"
+
+
+class Secrets(Layer):
+    """Collects the session cookies and csrf tokens the server hands out, to look for in the cassette."""
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.seen = set()
+
+    def send(self, request, **kwargs):
+        r = self.inner.send(request, **kwargs)
+        cookie = re.match(r"_gradescope_session=([^;]+)", r.headers.get("Set-Cookie", ""))
+        if cookie:
+            self.seen.add(cookie.group(1))
+        self.seen.update(re.findall(r'name="csrf-token" content="([^"]+)"', r.text))
+        return r
+
+
+def workflow(ses):
+    ses.login(EMAIL, PASSWORD)
+    course = ses.get_course(10)
+    names = course.list_assignments()
+    course.get_assignment_by_name("Assignment 0", AutograderAssignment).update_autograder_zip(ZIP, "ag.zip")
+    a = course.get_assignment_by_name("Assignment 1", PDFAssignment)
+    a.update_outline([{"title": "Q1", "weight": 2}, {"title": "Q2", "weight": 3}]).raise_for_status()
+    return names, [(q.title, q.id) for q in a.get_outline()]
+
+
+def record(server, path):
+    secrets = Secrets(TransportAdapter())
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None,
+                              transport=cassette_transport(path, mode="record", inner=secrets))
+    result = workflow(ses)
+    ses.req.close()
+    return result, secrets.seen
+
+
+def replay(path):
+    ses = gradescrape.Session(base_url=DEAD, rate_limiter=None, transport=cassette_transport(path))
+    return ses, workflow(ses)
+
+
+def test_record_then_replay(server, tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorded, _ = record(server, path)
+    assert server.counts["upload_bytes"]
+    before = dict(server.counts)
+    ses, replayed = replay(path)
+    assert replayed == recorded
+    assert server.counts == before
+    assert ses.transport.stats()["cassette"]["misses"] == 0
+    with pytest.raises(CassetteMiss):
+        ses.get_course(20).list_assignments()
+
+
+def test_a_different_upload_is_a_miss(server, tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    record(server, path)
+    ses = gradescrape.Session(base_url=DEAD, rate_limiter=None, transport=cassette_transport(path))
+    ses.login(EMAIL, PASSWORD)
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    with pytest.raises(CassetteMiss):
+        a.update_autograder_zip(ZIP + b"!", "ag.zip")
+
+
+def test_saved_cassette_holds_no_secrets(server, tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    _, secrets = record(server, path)
+    assert secrets
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        text = f.read()
+    assert "Assignment 1" in text
+    for secret in secrets | {PASSWORD, EMAIL, "_gradescope_session"}:
+        assert secret not in text
+    assert "set-cookie" not in text.lower()
+
+
+def test_committed_cassette_replays_without_a_server():
+    # regenerate with: python tests/test_cassette.py
+    _, (names, outline) = replay(FIXTURE)
+    assert list(names) == [f"Assignment {i}" for i in range(4)]
+    assert [title for title, _ in outline] == ["Q1", "Q2"]
+
+
+def encoder(token="abc"):
+    return MultipartEncoder({"authenticity_token": token, "_method": "patch"},
+                            {"file": FilePart("ag.zip", ZIP, "application/zip")})
+
+
+def chunked_digest(body, boundary, size):
+    h = _MultipartHasher(boundary.encode(), {"authenticity_token"})
+    for i in range(0, len(body), size):
+        h.update(body[i:i + size])
+    return h.hexdigest()
+
+
+def test_multipart_hash_ignores_chunking_boundary_and_token():
+    enc = encoder()
+    body = enc.read()
+    whole = hash_body(body, enc.content_type)
+    # every split of the delimiter and of the part headers across chunks
+    for size in (1, 2, 7, 37, 38, 39, 1000, len(body)):
+        assert chunked_digest(body, enc.boundary, size) == whole
+    other = encoder("a-much-longer-csrf-token")
+    assert other.boundary != enc.boundary
+    assert hash_body(other.read(), other.content_type) == whole
+
+
+def test_multipart_hash_sees_content_and_field_changes():
+    enc = encoder()
+    whole = hash_body(enc.read(), enc.content_type)
+    changed = MultipartEncoder({"authenticity_token": "abc", "_method": "put"},
+                               {"file": FilePart("ag.zip", ZIP, "application/zip")})
+    assert hash_body(changed.read(), changed.content_type) != whole
+    # a delimiter-like run inside the file that isn't the boundary is content
+    tricky = MultipartEncoder({"authenticity_token": "abc", "_method": "patch"},
+                              {"file": FilePart("ag.zip", ZIP[:-4] + b"\r\n--", "application/zip")})
+    body = tricky.read()
+    assert chunked_digest(body, tricky.boundary, 3) == hash_body(body, tricky.content_type) != whole
+
+
+if __name__ == "__main__":
+    from mockserver import MockGradescope
+    os.makedirs(os.path.dirname(FIXTURE), exist_ok=True)
+    with MockGradescope(courses={10: 4, 20: 0}) as server:
+        record(server, FIXTURE)
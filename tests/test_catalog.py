@@ -0,0 +1,84 @@
+import datetime
+import gc
+import pytest
+import gradescrape
+from gradescrape.assignment import Assignment, AutograderAssignment, PDFAssignment
+from gradescrape.catalog import CatalogEntry
+
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+DUE = datetime.datetime(2021, 9, 10, 23, 59)
+
+
+def login(server) -> gradescrape.Session:
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses
+
+
+def test_one_object_per_id(server):
+    ses = login(server)
+    course = ses.get_course(10)
+    assert ses.get_course("10") is course
+    a = course.get_assignment_by_name("Assignment 0")
+    assert type(a) is Assignment and course.get_assignment(a.aid) is a
+    # asking for the subclass narrows the existing object rather than making a second one
+    assert course.get_assignment(a.aid, AutograderAssignment) is a and type(a) is AutograderAssignment
+    assert course.get_assignment(a.aid) is a and course.get_assignment(a.aid, Assignment) is a
+    aid = a.aid
+    del a
+    gc.collect()
+    assert aid not in course._assignments
+
+
+def test_objects_are_slotted(server):
+    a = login(server).get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment)
+    with pytest.raises(AttributeError):
+        a.whatever = 1
+    assert not hasattr(a, "__dict__")
+
+
+def test_settings_load_once_and_are_shared(server):
+    ses = login(server)
+    course = ses.get_course(10)
+    a = course.get_assignment_by_name("Assignment 0", AutograderAssignment)
+    assert a.settings["memory_limit"] == 768
+    assert course.get_assignment(a.aid).settings is a.settings
+    assert server.counts["GET edit"] == 1
+    a.invalidate()
+    a.settings
+    assert server.counts["GET edit"] == 2
+    # a write drops the memo and brings the catalog entry up to date, without reloading the catalog
+    a.update_settings(**dict(a.get_settings(), title="Renamed"))
+    assert "settings" not in a._memo
+    assert a.title == "Renamed" and course.catalog.get_by_name("Renamed").aid == a.aid
+    assert server.counts["GET assignments"] == 1
+
+
+def test_type_comes_from_the_catalog_or_the_edit_page(server):
+    ses = login(server)
+    course = ses.get_course(10)
+    plain = course.get_assignment_by_name("Assignment 1")
+    # the assignments table doesn't say, so the edit page does
+    assert plain.type == "PDFAssignment" and server.counts["GET edit"] == 1
+    created = course.create_prog_assignment("New prog", 10, RELEASE, DUE)
+    # created assignments' types are known, so lookups hand out the right class straight away
+    assert isinstance(course.get_assignment_by_name("New prog", None), AutograderAssignment)
+    assert course.get_assignment_by_name("New prog", None) is created
+    assert server.counts["GET assignments"] == 1
+    # a reload keeps the types it knew
+    course.refresh()
+    assert course.catalog.get_by_id(created.aid).type == "ProgrammingAssignment"
+
+
+def test_catalog_reloads_when_stale(server):
+    ses = login(server)
+    course = ses.get_course(10)
+    catalog = course.catalog
+    # nothing to add to before the first load
+    catalog.add(CatalogEntry(1, "x"))
+    assert catalog.loaded_at is None
+    assert "Assignment 2" in catalog and len(catalog) == 4
+    assert server.counts["GET assignments"] == 1
+    catalog.max_age = 0
+    assert catalog.get_by_name("Assignment 3").aid == course.list_assignments()["Assignment 3"]
+    assert server.counts["GET assignments"] >= 2
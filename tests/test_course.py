@@ -0,0 +1,39 @@
+import datetime
+import gradescrape
+
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+DUE = datetime.datetime(2021, 9, 10, 23, 59)
+
+
+def test_bulk_keeps_assignments_whose_follow_up_failed(server, tmp_path):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    course = ses.get_course(20)
+    results = course.create_assignments_bulk([
+        {"type": "pdf", "title": "empty outline", "template_pdf_name": "t.pdf", "template_pdf_data": b"%PDF-1.4\n",
+         "release_date": RELEASE, "due_date": DUE, "outline": []},
+        {"type": "prog", "title": "missing zip", "total_points": 10, "release_date": RELEASE, "due_date": DUE,
+         "autograder_zip": str(tmp_path / "nope.zip")},
+        {"type": "quiz", "title": "bad type"},
+    ])
+    empty, missing, bad = results
+    assert empty.ok and empty.assignment is not None
+    # created, then the upload failed: the result still says which assignment was made
+    assert not missing.ok and missing.assignment is not None
+    assert isinstance(missing.error, OSError)
+    assert not bad.ok and bad.assignment is None
+    assert set(course.list_assignments()) == {"empty outline", "missing zip"}
+
+
+def test_list_assignments_uses_the_catalog(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    course = ses.get_course(10)
+    names = course.list_assignments()
+    assert names == course.list_assignments() and len(names) == 4
+    assert server.counts["GET assignments"] == 1
+    assert course.list_assignments(refresh=True) == names
+    assert server.counts["GET assignments"] == 2
+    course.catalog.max_age = 0
+    course.list_assignments()
+    assert server.counts["GET assignments"] == 3
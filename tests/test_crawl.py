@@ -0,0 +1,80 @@
+import collections
+import re
+import threading
+import time
+import requests
+import gradescrape
+from gradescrape.transport import Layer
+
+
+class PerCourse(Layer):
+    """Tracks the most requests any one course had in flight, and fails the edit pages of broken_aids."""
+    def __init__(self, inner, broken_aids=()):
+        super().__init__(inner)
+        self.broken_aids = set(broken_aids)
+        self.lock = threading.Lock()
+        self.now = collections.Counter()
+        self.peak = collections.Counter()
+
+    def send(self, request, **kwargs):
+        m = re.search(r"/courses/(\d+)(?:/assignments/(\d+))?", request.url)
+        if m is None:
+            return self.inner.send(request, **kwargs)
+        cid = int(m.group(1))
+        if m.group(2) and int(m.group(2)) in self.broken_aids:
+            raise requests.ConnectionError("connection reset")
+        with self.lock:
+            self.now[cid] += 1
+            self.peak[cid] = max(self.peak[cid], self.now[cid])
+        try:
+            time.sleep(0.02)
+            return self.inner.send(request, **kwargs)
+        finally:
+            with self.lock:
+                self.now[cid] -= 1
+
+
+def login(server) -> gradescrape.Session:
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses
+
+
+def test_get_courses(server):
+    server.state.enrolled[30] = "MATH 1"
+    ses = login(server)
+    courses = ses.get_courses()
+    assert [(c.cid, c.short_name, c.name, c.term, c.role) for c in courses] == [
+        (10, "CS 10", "Course 10", "Fall 2021", "instructor"), (20, "CS 20", "Course 20", "Fall 2021", "instructor"),
+        (30, "MATH 1", "MATH 1", "Spring 2022", "student")]
+    # the same objects get_course hands out
+    assert courses[0] is ses.get_course(10)
+    assert [c.cid for c in ses.get_courses(role="student")] == [30]
+
+
+def test_crawl_yields_every_catalog_and_setting(server):
+    server.state.enrolled[30] = "MATH 1"
+    ses = login(server)
+    results = list(ses.crawl(settings=True))
+    assert all(r.ok for r in results)
+    catalogs = {r.course.cid: r.data for r in results if r.kind == "catalog"}
+    # only the courses this user teaches, by default
+    assert sorted(catalogs) == [10, 20] and len(catalogs[10]) == 4 and catalogs[20] == []
+    settings = {r.entry.name: r.data for r in results if r.kind == "settings"}
+    assert sorted(settings) == [f"Assignment {i}" for i in range(4)]
+    assert settings["Assignment 0"]["type"] == "ProgrammingAssignment" and settings["Assignment 1"]["type"] == "PDFAssignment"
+    # a course's catalog comes before its settings
+    assert [r.kind for r in results if r.course.cid == 10][0] == "catalog"
+
+
+def test_failures_and_per_course_limit(server):
+    ses = login(server)
+    course = ses.get_course(10)
+    broken = course.catalog.get_by_name("Assignment 2").aid
+    layer = ses.add_layer(PerCourse, broken_aids=[broken])
+    results = list(ses.crawl([course, ses.get_course(20)], settings=True, max_workers=8, per_course=2))
+    failed = [r for r in results if not r.ok]
+    assert len(failed) == 1 and failed[0].entry.aid == broken and isinstance(failed[0].error, requests.ConnectionError)
+    assert "failed" in repr(failed[0])
+    assert sum(r.kind == "settings" for r in results) == 4
+    assert layer.peak[10] == 2
@@ -0,0 +1,74 @@
+import json
+import os
+import stat
+import threading
+import pytest
+import gradescrape
+from gradescrape import cli, daemon
+
+
+@pytest.fixture
+def running(server, tmp_path):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    path = str(tmp_path / "d.sock")
+    ready = threading.Event()
+    thread = threading.Thread(target=daemon.serve, args=(path, daemon.Workspace(ses, state_dir=str(tmp_path / "state")),
+                                                         ready.set), daemon=True)
+    thread.start()
+    ready.wait(10)
+    yield path
+    if thread.is_alive():
+        cli.send("shutdown", path=path, timeout=5)
+    thread.join(10)
+
+
+def test_request_and_response(running, server):
+    assert stat.S_IMODE(os.stat(running).st_mode) & 0o077 == 0
+    reply = cli.send("list-assignments", {"course": 10}, running)
+    assert reply["ok"] and [a["name"] for a in reply["result"]] == [f"Assignment {i}" for i in range(4)]
+    assert reply["result"][0]["release_date"] == "2021-09-03T20:00:00"
+    # the catalog stays warm between commands
+    cli.send("list-assignments", {"course": 10}, running)
+    assert server.counts["GET assignments"] == 1
+    settings = cli.send("get-settings", {"course": 10, "assignment": "Assignment 1"}, running)["result"]
+    assert settings["type"] == "PDFAssignment" and settings["title"] == "Assignment 1"
+    reply = cli.send("set-due-date", {"course": 10, "assignment": "Assignment 1", "due_date": "2021-12-01T09:30"}, running)
+    assert reply["ok"] and reply["result"]["due_date"] == "2021-12-01T09:30:00" and reply["result"]["late_due_date"] is None
+    assert cli.send("get-settings", {"course": 10, "assignment": reply["result"]["aid"]}, running)["result"]["due_date"] == \
+        "2021-12-01T09:30:00"
+
+
+def test_errors_come_back_as_replies(running):
+    assert cli.send("nope", {}, running) == {"ok": False, "error": "ValueError: unknown command 'nope'"}
+    reply = cli.send("get-settings", {"course": 10, "assignment": "Missing"}, running)
+    assert not reply["ok"] and reply["error"].startswith("KeyError")
+    # and the daemon keeps serving
+    assert cli.send("stats", {}, running)["ok"]
+
+
+def test_cli_talks_to_the_daemon(running, capsys):
+    assert cli.main(["--socket", running, "list-assignments", "10"]) == 0
+    assert len(json.loads(capsys.readouterr().out)) == 4
+    assert cli.main(["--socket", running, "get-settings", "10", "Missing"]) == 1
+    assert "no assignment named" in capsys.readouterr().err
+    assert cli.main(["daemon", "status", "--socket", running]) == 0
+    assert cli.main(["daemon", "stop", "--socket", running]) == 0
+    for _ in range(100):
+        if not os.path.exists(running):
+            break
+        threading.Event().wait(0.05)
+    # serve() removes the socket on the way out
+    assert not os.path.exists(running)
+    assert cli.main(["daemon", "status", "--socket", running]) == 1
+
+
+def test_cli_runs_locally_without_a_daemon(server, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("GRADESCRAPE_EMAIL", "user@example.com")
+    monkeypatch.setenv("GRADESCRAPE_PASSWORD", "hunter2")
+    monkeypatch.setenv("GRADESCRAPE_BASE_URL", server.url)
+    monkeypatch.setenv("GRADESCRAPE_DIR", str(tmp_path))
+    monkeypatch.delenv("GRADESCRAPE_STORE_KEY", raising=False)
+    assert cli.main(["--socket", str(tmp_path / "none.sock"), "list-assignments", "10"]) == 0
+    assert len(json.loads(capsys.readouterr().out)) == 4
+    assert server.counts["POST login"] == 1
@@ -0,0 +1,30 @@
+import os
+import gradescrape
+from gradescrape.assignment import AutograderAssignment
+from gradescrape.deploy import Deployer
+
+
+def autograder(tmp_path):
+    src = tmp_path / "autograder"
+    src.mkdir()
+    (src / "run_autograder").write_text("#!/bin/sh\necho ok\n")
+    return str(src)
+
+
+def test_temporary_build_dir_is_removed(server, tmp_path):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    with Deployer(str(tmp_path / "manifest.json")) as deployer:
+        assert deployer.deploy(a, autograder(tmp_path)).uploaded
+        build_dir = deployer.build_dir
+        assert os.listdir(build_dir)
+    assert not os.path.exists(build_dir)
+
+
+def test_given_build_dir_is_kept(tmp_path):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    with Deployer(str(tmp_path / "manifest.json"), build_dir=str(build_dir)) as deployer:
+        path, _ = deployer.prepare(autograder(tmp_path))
+    assert os.path.exists(path)
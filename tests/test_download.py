@@ -0,0 +1,66 @@
+import json
+import os
+import pytest
+import requests
+import gradescrape
+from gradescrape.assignment import PDFAssignment
+from gradescrape.download import MANIFEST_NAME
+from mockserver import submission_data
+
+SIZE = 64 * 1024
+
+
+def assignment(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses.get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment)
+
+
+def partial(dest, a, sid, data):
+    """Leaves dest as a killed run would: sid's download started, with data written so far."""
+    os.makedirs(dest, exist_ok=True)
+    with open(os.path.join(dest, MANIFEST_NAME), "w") as f:
+        f.write(json.dumps({"sid": sid, "done": False, "validator": f'"{sid}-{SIZE}"'}) + "\n")
+    with open(os.path.join(dest, f"{sid}.pdf.part"), "wb") as f:
+        f.write(data)
+
+
+def test_download_all_then_skip(server, tmp_path):
+    a = assignment(server)
+    report = a.download_submissions(str(tmp_path))
+    assert report.ok and report.downloaded == 3 and report.bytes == 3 * SIZE
+    for sub in a.list_submissions():
+        with open(tmp_path / f"{sub['sid']}.pdf", "rb") as f:
+            assert f.read() == submission_data(sub["sid"], SIZE)
+    again = a.download_submissions(str(tmp_path))
+    assert again.skipped == 3 and again.downloaded == 0
+
+
+def test_resume_fetches_only_the_rest(server, tmp_path):
+    a = assignment(server)
+    sid = a.list_submissions()[0]["sid"]
+    partial(str(tmp_path), a, sid, submission_data(sid, SIZE)[:1000])
+    report = a.download_submissions(str(tmp_path), submissions=[{"sid": sid}])
+    assert report.ok and report.resumed == 1 and report.bytes == SIZE - 1000
+    assert server.counts["download_bytes"] == SIZE - 1000
+    with open(tmp_path / f"{sid}.pdf", "rb") as f:
+        assert f.read() == submission_data(sid, SIZE)
+
+
+def test_partial_file_longer_than_the_submission_starts_over(server, tmp_path):
+    a = assignment(server)
+    sid = a.list_submissions()[0]["sid"]
+    # a range starting past the end gets a 416
+    partial(str(tmp_path), a, sid, b"x" * (SIZE + 10))
+    report = a.download_submissions(str(tmp_path), submissions=[{"sid": sid}])
+    assert report.ok and report.resumed == 0 and report.bytes == SIZE
+    with open(tmp_path / f"{sid}.pdf", "rb") as f:
+        assert f.read() == submission_data(sid, SIZE)
+
+
+def test_get_stream_closes_error_responses(server):
+    a = assignment(server)
+    with pytest.raises(requests.HTTPError) as e:
+        a.ses.get_stream(a.get_url() + "/submissions/1.pdf")
+    assert e.value.response.status_code == 404
+    assert e.value.response.raw.closed
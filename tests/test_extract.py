@@ -0,0 +1,56 @@
+import datetime
+import pytest
+from gradescrape import extract
+
+RELEASE = datetime.datetime(2021, 9, 3, 20, 0)
+DUE = datetime.datetime(2021, 9, 10, 23, 59)
+
+
+def page(head, rows):
+    return f'<html><body><table id="assignments-instructor-table">{head}{"".join(rows)}</table></body></html>'
+
+
+def row(aid, *cells):
+    tds = "".join(f"<td>{c}</td>" for c in cells)
+    return f'<tr><td><a href="/courses/1/assignments/{aid}">HW{aid}</a></td>{tds}</tr>'
+
+
+@pytest.mark.parametrize("backend", ["lxml", "bs4"])
+def test_dates_come_from_the_header_columns(backend):
+    head = "<thead><tr><th>Name</th><th>Points</th><th>Released</th><th>Due</th></tr></thead>"
+    html = page(head, [row(1, "10.0", "Sep 3 2021 08:00 PM", "<span>Sep 10 2021\n 11:59 PM</span>"),
+                       row(2, "Sep 1 2021 08:00 PM", "", "Sep 10 2021 11:59 PM")])
+    first, second = extract.assignment_rows(html, 1, backend)
+    assert first == {"aid": 1, "name": "HW1", "release_date": RELEASE, "due_date": DUE}
+    # a date-looking cell outside the date columns is left alone, and an empty date is None
+    assert (second["release_date"], second["due_date"]) == (None, DUE)
+
+
+@pytest.mark.parametrize("backend", ["lxml", "bs4"])
+def test_dates_without_a_header(backend):
+    html = page("", [row(1, "10.0", "Sep 3 2021 08:00 PM", "Sep 10 2021 11:59 PM"),
+                     row(2, "5.0", "Sep 3 2021 08:00 PM", "")])
+    first, second = extract.assignment_rows(html, 1, backend)
+    assert (first["release_date"], first["due_date"]) == (RELEASE, DUE)
+    assert (second["release_date"], second["due_date"]) == (RELEASE, None)
+
+
+def test_mock_listing_dates(server):
+    import gradescrape
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    rows = extract.assignment_rows(ses.get_html(f"{server.url}/courses/10/assignments"), 10)
+    assert len(rows) == 4
+    assert all(isinstance(a["release_date"], datetime.datetime) for a in rows)
+    assert all(a["due_date"] > a["release_date"] for a in rows)
+
+
+@pytest.mark.parametrize("backend", ["lxml", "bs4", "selectolax"])
+def test_quotes_in_names_are_not_part_of_the_query(backend):
+    name = 'assignment["kind\'s"]'
+    html = f'<select name="other"><option value="x">X</option></select><select name="{name.replace(chr(34), "&quot;")}">' \
+           '<option value="1">One</option><option>Two</option></select>'
+    assert extract.select_options(html, name, backend) == [("1", "One"), ("Two", "Two")]
+    assert extract.select_options(html, 'x"] | //option | //*[@a="', backend) == []
+    table = '<table id="a&quot;b"><tr><td>in</td></tr></table><table id="c"><tr><td>out</td></tr></table>'
+    assert [list(cells) for _, cells in extract._table_rows(table, backend, 'a"b')] == [["in"]]
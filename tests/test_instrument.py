@@ -0,0 +1,71 @@
+import json
+import gradescrape
+from gradescrape.instrument import HistogramSink, JSONLSink, Record, SpanSink, percentile, route_template
+
+
+def test_route_template():
+    assert route_template("https://x/courses/123/assignments/456/edit?a=1") == "/courses/{id}/assignments/{id}/edit"
+    assert route_template("https://x") == "/"
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+    assert [percentile(values, p) for p in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_histogram_summary():
+    sink = HistogramSink()
+    for k in range(1, 101):
+        sink(Record("http", "GET", f"https://x/courses/{k}", 0.0, status=500 if k % 10 == 0 else 200,
+                    bytes=10, ttfb=k / 2000, total=k / 1000, connect=0.001 if k == 1 else None))
+    sink(Record("parse", "GET", "https://x/courses/1", 0.0, total=0.5))
+    (route, phases), = sink.summary().items()
+    assert route == "GET /courses/{id}"
+    http = phases["http"]
+    assert (http["count"], http["errors"], http["new_connections"], http["bytes"]) == (100, 10, 1, 1000)
+    assert (http["p50"], http["p95"], http["p99"]) == (0.05, 0.095, 0.099)
+    assert http["ttfb_p50"] == 0.025
+    assert phases["parse"] == {"count": 1, "mean": 0.5, "p50": 0.5, "p95": 0.5, "p99": 0.5}
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time, attributes):
+        tracer = self
+        class Span:
+            def end(self, end_time):
+                tracer.spans.append((name, attributes, end_time - start_time))
+        return Span()
+
+
+def test_sinks_and_stats_against_the_server(server, tmp_path):
+    seen, tracer = [], Tracer()
+    jsonl = JSONLSink(str(tmp_path / "trace.jsonl"))
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None, trace_sinks=[seen.append, jsonl])
+    ses.instrumentation.add_sink(SpanSink(tracer))
+    ses.login("user@example.com", "hunter2")
+    for _ in range(3):
+        ses.get_course(10).list_assignments(refresh=True)
+    assert ses.req.get(server.url + "/nowhere/1").status_code == 404
+    jsonl.close()
+
+    stats = ses.stats()
+    listing = stats["GET /courses/{id}/assignments"]
+    assert listing["http"]["count"] == server.counts["GET assignments"] == 3
+    assert listing["parse"]["count"] == 3
+    for phase in listing.values():
+        assert 0 <= phase["p50"] <= phase["p95"] <= phase["p99"]
+    assert listing["http"]["bytes"] > 0 and listing["http"]["errors"] == 0
+    assert stats["GET /nowhere/{id}"]["http"]["errors"] == 1
+    assert "parse" not in stats["GET /nowhere/{id}"]
+    assert stats["POST /login"]["http"]["count"] == 1
+
+    lines = [json.loads(line) for line in open(tmp_path / "trace.jsonl")]
+    assert lines == [rec.as_dict() for rec in seen]
+    assert sum(phase["count"] for route in stats.values() for phase in route.values()) == len(seen)
+    assert [name for name, *_ in tracer.spans] == [f"{r.phase} {r.method} {r.route}" for r in seen]
+    assert all(attrs["gradescrape.phase"] in ("http", "parse") for _, attrs, _ in tracer.spans)
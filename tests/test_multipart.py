@@ -0,0 +1,83 @@
+import email.parser
+import io
+import pytest
+import requests
+import gradescrape
+from gradescrape.assignment import AutograderAssignment
+from gradescrape.multipart import FilePart, MultipartEncoder, file_parts
+
+
+def parse(enc):
+    body = enc.read()
+    msg = email.parser.BytesParser().parsebytes(b"Content-Type: " + enc.content_type.encode() + b"\r\n\r\n" + body)
+    return [(p.get_param("name", header="content-disposition"), p.get_filename(), p.get_payload(decode=True))
+            for p in msg.get_payload()]
+
+
+def test_quotes_and_line_breaks_are_escaped():
+    enc = MultipartEncoder({'we"ird\r\nX-Injected: 1': "v"},
+                           {"file": FilePart('a"b\r\nContent-Type: text/html.pdf', b"data")})
+    body = enc.read()
+    assert not any(line.startswith(b"X-Injected") for line in body.split(b"\r\n"))
+    assert b'name="we%22ird%0D%0AX-Injected: 1"' in body
+    assert b'filename="a%22b%0D%0AContent-Type: text/html.pdf"' in body
+    assert [name for name, *_ in parse(MultipartEncoder({'we"ird': "v"}, {"f": FilePart('a"b', b"")}))] == ["we%22ird", "f"]
+
+
+def test_str_is_content_and_paths_are_pathlike(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"from disk")
+    parts = file_parts({"a": ("a.txt", str(path)), "b": ("b.txt", path), "c": ("c.txt", "hé")})
+    assert parse(MultipartEncoder({}, parts)) == [
+        ("a", "a.txt", str(path).encode()), ("b", "b.txt", b"from disk"), ("c", "c.txt", "hé".encode())]
+    assert parts["c"].size == 3
+
+
+def test_length_matches_the_body_and_requests_encoding(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(bytes(range(256)) * 1000)
+    fh = io.BytesIO(b"skipped" + b"file object")
+    fh.seek(7)
+    parts = {"p": FilePart("big.bin", path), "f": FilePart("f.txt", fh, "text/plain"), "b": FilePart("b", b"")}
+    seen = []
+    enc = MultipartEncoder({"a": 1, "none": None, "u": "✓"}, parts, lambda *a: seen.append(a), chunk_size=1000)
+    body = b"".join(enc)
+    assert len(body) == len(enc) == enc.len
+    assert parse(MultipartEncoder({"a": 1, "none": None, "u": "✓"}, parts)) == [
+        ("a", None, b"1"), ("u", None, "✓".encode()),
+        ("p", "big.bin", path.read_bytes()), ("f", "f.txt", b"file object"), ("b", "b", b"")]
+    # the same fields through requests' own (in-memory) encoder give a body of the same length
+    prepared = requests.Request("POST", "http://x/", data={"a": "1", "u": "✓"},
+                                files={"p": ("big.bin", path.read_bytes(), "application/octet-stream"),
+                                       "f": ("f.txt", b"file object", "text/plain"),
+                                       "b": ("b", b"", "application/octet-stream")}).prepare()
+    assert len(prepared.body) == len(body)
+    assert [s for s, *_ in seen] == sorted(s for s, *_ in seen) and seen[-1][:2] == (len(body), len(body))
+
+
+def test_truncated_file_is_an_error(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b"x" * 100)
+    enc = MultipartEncoder({}, {"f": FilePart("f", path)})
+    path.write_bytes(b"x" * 10)
+    with pytest.raises(IOError, match="truncated"):
+        enc.read()
+
+
+def test_upload_streams_with_a_content_length(server, tmp_path):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    path = tmp_path / "autograder.zip"
+    path.write_bytes(b"PK" + b"\0" * 300_000)
+    progress = []
+    a.update_autograder_zip(str(path), progress=lambda sent, total, bps: progress.append((sent, total)))
+    # the mock counts the Content-Length of every multipart body
+    assert server.counts["upload_bytes"] == progress[-1][0] == progress[-1][1] > 300_000
+    before, sizes = server.counts["upload_bytes"], []
+    ses._csrf_token = "stale"
+    ses.post_soup(a.get_url(), data={"_method": "patch", "configuration": "zip"},
+                  files={"autograder_zip": ("autograder.zip", path, "application/zip")},
+                  _csrf=a.get_url() + "/configure_autograder", _progress=lambda sent, total, bps: sizes.append(total))
+    # the stale token was rejected and the file sent again from the start
+    assert server.counts["upload_bytes"] - before == sizes[0] + sizes[-1] and sizes[0] > 300_000
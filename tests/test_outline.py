@@ -0,0 +1,80 @@
+import pytest
+import gradescrape
+from gradescrape.assignment import PDFAssignment
+from gradescrape.outline import Outline
+
+
+def live():
+    return Outline.from_raw([
+        {"id": 1, "title": "Warmup", "weight": 2},
+        {"id": 2, "title": "Proofs", "weight": 10, "children": [
+            {"id": 21, "title": "a", "weight": 4}, {"id": 22, "title": "b", "weight": 6}]},
+        {"id": 3, "title": "Essay", "weight": 5},
+    ])
+
+
+def ids(outline):
+    return [(q.title, q.id, [(c.title, c.id) for c in q.children]) for q in outline]
+
+
+def test_unchanged_outline_has_no_diff():
+    assert not live().diff(Outline.from_spec(live().to_spec()))
+
+
+def test_matched_questions_keep_their_ids():
+    d = live().diff(Outline.from_spec([
+        {"title": "Essay", "weight": 5},
+        {"title": "Warmup", "weight": 3},
+        {"title": "Proofs", "children": [{"title": "a", "weight": 4}, {"title": "b", "weight": 6}]},
+    ]))
+    assert ids(d.merged) == [("Essay", 3, []), ("Warmup", 1, []), ("Proofs", 2, [("a", 21), ("b", 22)])]
+    assert ("weight", "Warmup", 2.0, 3.0) in d.changes
+    assert any(kind == "move" for kind, *_ in d.changes)
+
+
+def test_new_title_is_a_remove_and_an_add():
+    # "delete Proofs, add Short answer" must not hand Proofs' id (and rubric) to the new question
+    d = live().diff(Outline.from_spec([
+        {"title": "Warmup", "weight": 2}, {"title": "Short answer", "weight": 10}, {"title": "Essay", "weight": 5}]))
+    assert ids(d.merged)[1] == ("Short answer", None, [])
+    assert ("add", "Short answer", None, 10.0) in d.changes
+    assert ("remove", "Proofs", 10.0, None) in d.changes
+    assert not any(kind == "title" for kind, *_ in d.changes)
+
+
+def test_renames_by_id_or_by_name():
+    spec = [{"title": "Warm-up", "weight": 2, "id": 1},
+            {"title": "Proofs", "children": [{"title": "part a", "weight": 4}, {"title": "b", "weight": 6}]},
+            {"title": "Essay", "weight": 5}]
+    d = live().diff(Outline.from_spec(spec), renames={"Proofs/a": "part a"})
+    assert ids(d.merged) == [("Warm-up", 1, []), ("Proofs", 2, [("part a", 21), ("b", 22)]), ("Essay", 3, [])]
+    assert sorted(d.changes) == [("title", "Proofs/part a", "a", "part a"), ("title", "Warm-up", "Warmup", "Warm-up")]
+
+
+def test_renames_that_match_nothing_are_errors():
+    spec = live().to_spec()
+    with pytest.raises(ValueError, match="Nope"):
+        live().diff(Outline.from_spec(spec), renames={"Nope": "Essay"})
+    spec[0]["id"] = 99
+    with pytest.raises(ValueError, match="99"):
+        live().diff(Outline.from_spec(spec))
+
+
+def test_validation():
+    for bad in ([{"title": "", "weight": 1}], [{"title": "Q", "weight": -1}], [{"title": "Q"}],
+                [{"title": "Q", "weight": 3, "children": [{"title": "a", "weight": 1}]}],
+                [{"title": "Q", "weight": 1, "id": "12"}]):
+        with pytest.raises(ValueError):
+            Outline.from_spec(bad)
+
+
+def test_update_outline_against_the_server(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    a = ses.get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment)
+    a.update_outline([{"title": "Q1", "weight": 2}, {"title": "Q2", "weight": 3}]).raise_for_status()
+    before = {q.title: q.id for q in a.get_outline()}
+    assert a.update_outline([{"title": "Q1", "weight": 2}, {"title": "Q2", "weight": 3}]) is None
+    a.update_outline([{"title": "Q1", "weight": 2}, {"title": "Question 2", "weight": 3}],
+                     renames={"Q2": "Question 2"}).raise_for_status()
+    assert {q.title: q.id for q in a.get_outline()} == {"Q1": before["Q1"], "Question 2": before["Q2"]}
@@ -0,0 +1,62 @@
+import datetime
+import json
+import os
+import pytest
+import gradescrape
+from gradescrape.plan import apply, load_desired, plan
+
+
+def course(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses.get_course(10)
+
+
+def test_one_bad_entry_does_not_abort_the_plan(server):
+    p = plan(course(server), {"assignments": [
+        {"type": "prog", "title": "Assignment 0", "total_points": 99},
+        # a PDF assignment declared as programming: its settings can't be read as such
+        {"type": "prog", "title": "Assignment 1", "total_points": 5},
+        {"type": "pdf", "title": "New one", "template_pdf": "x.pdf"},
+    ]})
+    assert not p.ok
+    assert list(p.errors) == ["Assignment 1"]
+    assert [(c.action, c.title) for c in p.changes] == [("update", "Assignment 0"), ("create", "New one")]
+    assert "failed to check" in str(p)
+
+
+def test_unknown_keys_are_rejected_up_front(server):
+    # memory_limit is a programming assignment setting
+    with pytest.raises(ValueError, match="memory_limit"):
+        plan(course(server), {"assignments": [{"type": "pdf", "title": "Assignment 1", "memory_limit": 1024}]})
+
+
+def test_dates_compare_in_the_course_time_zone(server):
+    pacific = datetime.timezone(datetime.timedelta(hours=-7))
+    c = course(server)
+    # Assignment 0 is released Sep 3 2021 8:00 PM course time
+    same = [{"type": "prog", "title": "Assignment 0", "release_date": "2021-09-03T20:00"},
+            {"type": "pdf", "title": "Assignment 1", "release_date": "2021-09-05T03:00+00:00"}]
+    assert not plan(c, {"assignments": same}, tz=pacific).changes
+    p = plan(c, {"assignments": [{"type": "prog", "title": "Assignment 0", "release_date": "2021-09-03T20:00+00:00"}]},
+             tz=pacific)
+    (change,) = p.changes
+    assert change.diff["release_date"][1] == datetime.datetime(2021, 9, 3, 13, 0, tzinfo=pacific)
+    apply(p)
+    assert c.get_assignment_by_name("Assignment 0").get_settings()["release_date"] == datetime.datetime(2021, 9, 3, 13, 0)
+    # without a tz, naive dates on both sides are this machine's local time
+    assert not plan(c, {"assignments": [{"type": "prog", "title": "Assignment 0", "release_date": "2021-09-03T13:00"}]}).changes
+
+
+def test_template_pdf_is_relative_to_the_desired_file(server, tmp_path, monkeypatch):
+    (tmp_path / "conf").mkdir()
+    (tmp_path / "conf" / "exam.pdf").write_bytes(b"%PDF-1.4\n")
+    (tmp_path / "conf" / "course.json").write_text(json.dumps({"assignments": [
+        {"type": "pdf", "title": "Exam", "template_pdf": "exam.pdf",
+         "release_date": "2021-10-01T09:00", "due_date": "2021-10-01T12:00"}]}))
+    monkeypatch.chdir(tmp_path)
+    desired = load_desired(os.path.join("conf", "course.json"))
+    assert desired["assignments"][0]["template_pdf"] == str(tmp_path / "conf" / "exam.pdf")
+    c = course(server)
+    assert not apply(plan(c, desired))
+    assert "Exam" in c.list_assignments()
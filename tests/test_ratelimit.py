@@ -0,0 +1,74 @@
+import time
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from gradescrape.ratelimit import RateLimiter, RateLimitLayer, retryable
+
+
+class Canned(BaseAdapter):
+    """Answers every request with the next of statuses, counting what it was sent."""
+    def __init__(self, statuses, headers=None):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        r = requests.Response()
+        r.status_code = self.statuses[min(self.sent, len(self.statuses) - 1)]
+        r.headers.update(self.headers)
+        r._content = b""
+        r._content_consumed = True
+        r.request = request
+        self.sent += 1
+        return r
+
+    def close(self):
+        pass
+
+
+def send(method, statuses, headers=None):
+    inner = Canned(statuses, headers)
+    limiter = RateLimiter(rate=1000, burst=1000, backoff_base=0, target_latency=None)
+    layer = RateLimitLayer(inner, limiter)
+    req = requests.Request(method, "http://gs.invalid/courses/1/assignments", data={"a": "1"}).prepare()
+    return layer.send(req), inner.sent
+
+
+def test_idempotent_requests_retry_on_5xx():
+    r, sent = send("GET", [503, 502, 200])
+    assert r.status_code == 200 and sent == 3
+
+
+def test_posts_are_not_retried_on_5xx():
+    r, sent = send("POST", [502, 200])
+    assert r.status_code == 502 and sent == 1
+
+
+def test_posts_retry_on_429_with_retry_after():
+    r, sent = send("POST", [429, 200], {"Retry-After": "0"})
+    assert r.status_code == 200 and sent == 2
+    r, sent = send("POST", [429, 200])
+    assert r.status_code == 429 and sent == 1
+
+
+def test_retry_after_is_not_capped():
+    limiter = RateLimiter(backoff_base=0.1, backoff_max=1)
+    assert limiter.backoff(0, 30) == 30
+    assert limiter.backoff(10, None) <= 1
+
+
+def test_retryable():
+    assert retryable("delete", 503, None)
+    assert not retryable("PATCH", 503, 5)
+    assert not retryable("GET", 500, None)
+
+
+@pytest.mark.parametrize("status,latency,rate", [(200, 0.1, 2.0), (429, 0.1, 0.5)])
+def test_rate_change_keeps_tokens_earned_at_the_old_rate(status, latency, rate):
+    limiter = RateLimiter(rate=1.0, burst=100, increase=1.0, decrease=0.5, target_latency=1.0)
+    bucket = limiter.host_bucket("gs.invalid")
+    bucket.tokens, bucket.stamp = 0.0, time.monotonic() - 10
+    limiter.observe("http://gs.invalid/", status, latency)
+    assert bucket.rate == rate
+    assert bucket.tokens == pytest.approx(10, abs=0.1)
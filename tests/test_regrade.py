@@ -0,0 +1,77 @@
+import pytest
+import gradescrape
+from mockserver import MockGradescope
+from gradescrape.assignment import AutograderAssignment
+from gradescrape.regrade import RegradeWatcher
+
+
+def autograded(srv):
+    ses = gradescrape.Session(base_url=srv.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+
+
+def test_regrade_all_yields_each_submission_once():
+    with MockGradescope(courses={10: 1}, submissions=40, regrade_time=1.0) as srv:
+        a = autograded(srv)
+        before = {row["sid"]: row["score"] for row in a.list_submissions()}
+        watcher = a.regrade_all(min_interval=0.05, max_interval=0.2, settle=0.6, timeout=30)
+        results = list(watcher)
+        assert sorted(r.sid for r in results) == sorted(before)
+        # the mock's regraded submissions score a point more
+        assert all(r.score == (before[r.sid] + 1) % 11 and r.status == "graded" for r in results)
+        assert watcher.stats()["remaining"] == 0 and watcher.stats()["finished"] == 40
+        # one page load per poll, however many submissions there are
+        assert srv.counts["GET review_grades"] == watcher.polls + 1 < 40
+
+
+def test_timeout():
+    with MockGradescope(courses={10: 1}, regrade_time=1000) as srv:
+        watcher = autograded(srv).regrade_all(min_interval=0.05, settle=10, timeout=0.5)
+        with pytest.raises(TimeoutError, match="still grading"):
+            watcher.wait()
+
+
+class Scripted:
+    """Stands in for an assignment, answering list_submissions() from a script of pages."""
+    aid = 1
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.polls = 0
+
+    def list_submissions(self):
+        page = self.pages[min(self.polls, len(self.pages) - 1)]
+        self.polls += 1
+        return [{"sid": sid, "name": f"s{sid}", "email": None, "score": score,
+                 "status": "pending" if score is None else "graded"} for sid, score in page]
+
+
+def test_old_results_only_count_once_seen_pending_or_settled():
+    w = RegradeWatcher(Scripted([[(1, 5.0), (2, 5.0)], [(1, None), (2, 5.0)], [(1, 6.0), (2, 5.0)]]),
+                       min_interval=0, settle=1000)
+    # still showing the results from before the regrade
+    assert w.poll() == [] and w.remaining == 2
+    assert w.poll() == []
+    (done,) = w.poll()
+    assert (done.sid, done.score) == (1, 6.0) and w.remaining == 1
+    w.settle = 0
+    assert [r.sid for r in w.poll()] == [2] and w.remaining == 0
+
+
+def test_deleted_submissions_stop_being_waited_for():
+    w = RegradeWatcher(Scripted([[(1, None), (2, None)], [(1, None)]]), min_interval=0)
+    w.poll()
+    assert w.poll() == [] and w.remaining == 1
+
+
+def test_interval_backs_off_and_recovers():
+    w = RegradeWatcher(Scripted([[]]), min_interval=1, max_interval=5, backoff=2)
+    for expected in (2, 4, 5, 5):
+        w._adapt(False)
+        assert w.interval == expected
+    w._adapt(True)
+    assert w.interval == 2.5
+    for _ in range(5):
+        w._adapt(True)
+    assert w.interval == 1
@@ -0,0 +1,62 @@
+import io
+import numpy as np
+import gradescrape
+from gradescrape.assignment import PDFAssignment
+from gradescrape.scores import Gradebook, parse_scores
+
+HEADER = "Name,SID,Email,Total Score,Max Points,Status,Submission ID,Submission Time,Lateness (H:M:S),1: Q1 (5.0 pts)\r\n"
+# names with characters str.splitlines breaks at, and a quoted line break
+NAMES = ["Lee Ann", "Zo\x85e", "Sep\x1carated", "Two\nLines, Jr."]
+
+
+def csv_text():
+    rows = [f'"{name}",{k},s{k}@example.com,{k}.5,10.0,Graded,{100 + k},2021-09-0{k + 1} 12:00:00 -0700,0:00:00,{k}\r\n'
+            for k, name in enumerate(NAMES)]
+    rows.append('"Missing, Student",,missing@example.com,,10.0,Missing,,,,\r\n')
+    return HEADER + "".join(rows)
+
+
+def test_parse_scores_keeps_rows_whole():
+    t = parse_scores(io.StringIO(csv_text(), newline=""), aid=5)
+    assert len(t) == 5
+    assert list(t.names[t.student]) == NAMES + ["Missing, Student"]
+    assert list(t.score[:4]) == [0.5, 1.5, 2.5, 3.5] and np.isnan(t.score[4])
+    assert list(t.submission_id) == [100, 101, 102, 103, -1]
+    assert t.submitted_at[0] == np.datetime64("2021-09-01T19:00:00")
+    assert np.isnat(t.submitted_at[4])
+    assert list(t.statuses[t.status]) == ["Graded"] * 4 + ["Missing"]
+
+
+def test_export_scores_streams_the_csv(server):
+    server.state.students[7001] = ("O'Neil \"Jr\"", "student1@example.com")
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    t = ses.get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment).export_scores()
+    assert len(t) == 4
+    assert list(t.students[t.student]) == ["student0@example.com", "student1@example.com",
+                                           "student2@example.com", "missing@example.com"]
+    assert t.names[1] == "O'Neil \"Jr\""
+    assert np.isnan(t.score[3]) and not np.isnan(t.score[:3]).any()
+
+
+def test_gradebook_join():
+    a = parse_scores(io.StringIO(csv_text(), newline=""), aid=1)
+    b = parse_scores(io.StringIO(HEADER + "Solo,9,s9@example.com,7,8,Graded,900,2021-09-01 12:00:00 -0700,,\r\n"
+                                 "Lee,0,s0@example.com,4,8,Graded,901,,,\r\n", newline=""), aid=2)
+    g = Gradebook.join([a, b], ["HW1", "HW2"])
+    assert g.shape == (6, 2)
+    assert list(g.students) == sorted(g.students)
+    row = list(g.students).index("s0@example.com")
+    assert list(g.scores[row]) == [0.5, 4.0]
+    solo = list(g.students).index("s9@example.com")
+    assert np.isnan(g.scores[solo, 0]) and g.scores[solo, 1] == 7.0
+    assert list(g.max_points) == [10.0, 8.0]
+    assert list(g.aids) == [1, 2] and g.column(2) == 1
+
+
+def test_export_gradebook(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    g = ses.get_course(10).export_gradebook()
+    assert g.shape == (4, 4)
+    assert sorted(g.assignment_names) == [f"Assignment {i}" for i in range(4)]
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import gradescrape
+from gradescrape.assignment import AutograderAssignment
+from gradescrape.session import csrf_rejected
+
+
+def response(status: int, body: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = body.encode()
+    r.encoding = "utf-8"
+    return r
+
+
+def test_csrf_rejected():
+    assert csrf_rejected(response(422, "ActionController::InvalidAuthenticityToken"))
+    assert csrf_rejected(response(422, "Can't verify CSRF token authenticity."))
+    # a validation failure is not a stale token
+    assert not csrf_rejected(response(422, '{"errors": {"title": ["can\'t be blank"]}}'))
+    assert not csrf_rejected(response(200, "InvalidAuthenticityToken"))
+
+
+def test_stale_token_is_refetched(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    a = ses.get_course(10).get_assignment_by_name("Assignment 0", AutograderAssignment)
+    settings = a.get_settings()
+    ses._csrf_token, ses._csrf_time = "stale", time.monotonic()
+    fetches = ses.csrf_fetches
+    r = ses.request_csrf("POST", a.get_url(), csrf_url=a.get_url() + "/edit", allow_redirects=False,
+                         data={"_method": "patch", "assignment[title]": settings["title"]})
+    assert r.status_code < 400
+    assert ses.csrf_fetches == fetches + 1
+
+
+def test_concurrent_misses_share_one_fetch(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    ses.invalidate_csrf()
+    server.latency = 0.2
+    before = dict(server.counts)
+    with ThreadPoolExecutor(8) as pool:
+        tokens = list(pool.map(lambda _: ses.get_csrf(f"{server.url}/courses/10/assignments"), range(8)))
+    assert len(set(tokens)) == 1 and tokens[0] == ses._csrf_token
+    fetched = {k: v - before.get(k, 0) for k, v in server.counts.items() if v != before.get(k, 0)}
+    assert list(fetched.values()) == [1]
+    assert ses.csrf_fetches == 1 and ses.csrf_fetches_saved == 7
+
+
+def test_failed_fetch_reaches_every_waiter(server):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    ses.invalidate_csrf()
+    server.latency = 0.2
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(ses.get_csrf, f"{server.url}/nowhere") for _ in range(4)]
+    for f in futures:
+        assert isinstance(f.exception(), requests.HTTPError)
+    assert ses._csrf_fetch is None
@@ -0,0 +1,53 @@
+import csv
+import datetime
+import numpy as np
+import pytest
+import gradescrape
+
+
+def snapshot(server, **kwargs):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    return ses.get_course(10).snapshot_settings(**kwargs)
+
+
+def test_snapshot_reads_every_assignment(server):
+    table = snapshot(server)
+    assert len(table) == 4
+    rows = {r["name"]: r for r in table.rows()}
+    assert [rows[f"Assignment {i}"]["type"] for i in range(4)] == ["ProgrammingAssignment", "PDFAssignment"] * 2
+    assert rows["Assignment 0"]["memory_limit"] == 768 and rows["Assignment 0"]["submission_methods"] == "upload,github"
+    # settings only one type has are None for the other
+    assert rows["Assignment 1"]["memory_limit"] is None and rows["Assignment 0"]["scoring_type"] is None
+    assert rows["Assignment 2"]["release_date"] == datetime.datetime(2021, 9, 5, 20, 0)
+    assert server.counts["GET edit"] == 4
+
+
+def test_snapshot_of_some_names(server):
+    table = snapshot(server, names=["Assignment 1", "nope"])
+    assert table["name"] == ["Assignment 1"] and table["type"] == ["PDFAssignment"]
+
+
+def test_column_kinds_and_exports(server, tmp_path):
+    table = snapshot(server)
+    assert (table.kind("release_date"), table.kind("aid"), table.kind("manual_grading"), table.kind("title")) == \
+        ("datetime", "int", "bool", "str")
+    arrays = table.to_numpy()
+    assert arrays["release_date"].dtype == np.dtype("datetime64[m]")
+    assert arrays["aid"].dtype == np.int64 and arrays["manual_grading"].dtype == bool
+    # memory_limit is missing for PDF assignments
+    assert arrays["memory_limit"].dtype == np.float64 and np.isnan(arrays["memory_limit"][1])
+    assert table.to_pandas().shape == (4, len(table.columns))
+    table.to_csv(str(tmp_path / "s.csv"))
+    with open(tmp_path / "s.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["name"] for r in rows] == table["name"]
+    assert rows[0]["release_date"] == table["release_date"][0].isoformat() and rows[1]["memory_limit"] == ""
+
+
+def test_to_parquet(server, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = snapshot(server)
+    table.to_parquet(str(tmp_path / "s.parquet"))
+    read = pq.read_table(str(tmp_path / "s.parquet")).to_pydict()
+    assert read["name"] == table["name"] and read["memory_limit"] == table["memory_limit"]
@@ -0,0 +1,51 @@
+import os
+import stat
+import pytest
+import gradescrape
+from gradescrape.store import SessionStore
+
+pytest.importorskip("cryptography")
+from cryptography.fernet import InvalidToken
+
+
+def store(tmp_path, key):
+    return SessionStore(str(tmp_path / "store" / "session"), key=key)
+
+
+def test_round_trip_skips_the_login(server, tmp_path):
+    key = SessionStore.generate_key()
+    first = store(tmp_path, key).session("user@example.com", "hunter2", base_url=server.url, rate_limiter=None)
+    assert server.counts["POST login"] == 1
+    path = tmp_path / "store" / "session"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    cookie = first.req.cookies["_gradescope_session"]
+    assert cookie.encode() not in path.read_bytes()
+
+    second = store(tmp_path, key).session("user@example.com", "hunter2", base_url=server.url, rate_limiter=None)
+    assert second.req.cookies["_gradescope_session"] == cookie
+    assert second.is_logged_in() and server.counts["POST login"] == 1
+    with pytest.raises(InvalidToken):
+        store(tmp_path, SessionStore.generate_key()).load(gradescrape.Session(base_url=server.url))
+
+
+def test_expired_session_logs_in_once_and_is_shared(server, tmp_path):
+    key = SessionStore.generate_key()
+    ses = store(tmp_path, key).session("user@example.com", "hunter2", base_url=server.url, rate_limiter=None)
+    other = store(tmp_path, key).session("user@example.com", "hunter2", base_url=server.url, rate_limiter=None)
+    server.state.sessions.clear()
+    # the page load finds the session gone, logs back in and retries
+    assert len(ses.get_course(10).list_assignments()) == 4
+    assert server.counts["POST login"] == 2
+    # the other holder of the store picks up the new session rather than logging in itself
+    other.get_course(10).list_assignments()
+    assert server.counts["POST login"] == 2
+    assert other.req.cookies["_gradescope_session"] == ses.req.cookies["_gradescope_session"]
+
+
+def test_needs_a_key_and_credentials(tmp_path, monkeypatch):
+    monkeypatch.delenv("GRADESCRAPE_STORE_KEY", raising=False)
+    with pytest.raises(ValueError, match="key"):
+        SessionStore(str(tmp_path / "s"))
+    monkeypatch.setenv("GRADESCRAPE_STORE_KEY", SessionStore.generate_key())
+    with pytest.raises(ValueError, match="username and password"):
+        SessionStore(str(tmp_path / "s")).session(username="x")
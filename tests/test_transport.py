@@ -0,0 +1,81 @@
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+import gradescrape
+from gradescrape.assignment import AutograderAssignment
+from gradescrape.transport import HTTP2Adapter, TransportAdapter, connection_timings
+
+
+def test_new_connections_resolve_the_host_once(server, monkeypatch):
+    lookups = []
+    getaddrinfo = socket.getaddrinfo
+    def counting(host, *args, **kwargs):
+        lookups.append(host)
+        return getaddrinfo(host, *args, **kwargs)
+    monkeypatch.setattr(socket, "getaddrinfo", counting)
+
+    port = server.url.rsplit(":", 1)[1]
+    ses = gradescrape.Session(base_url=f"http://localhost:{port}", rate_limiter=None)
+    connection_timings(reset=True)
+    ses.req.get(ses.base_url + "/login").close()
+    timings = connection_timings()
+    assert lookups.count("localhost") == 1
+    assert timings["dns"] >= 0 and timings["connect"] >= 0
+    # the next request reuses the pooled connection, and looks nothing up
+    ses.req.get(ses.base_url + "/login").close()
+    assert lookups.count("localhost") == 1
+    assert ses.transport.stats()["reused_connections"] == 1
+
+
+def login(server, **kwargs):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None, **kwargs)
+    ses.login("user@example.com", "hunter2")
+    return ses
+
+
+@pytest.mark.parametrize("http2", [True, False])
+def test_http2_adapter_behaves_like_requests(server, tmp_path, http2):
+    pytest.importorskip("httpx")
+    # the mock only speaks HTTP/1.1, so with http2=True httpx negotiates down: this checks the adapter, not h2
+    ses = login(server, transport=HTTP2Adapter(http2=http2))
+    course = ses.get_course(10)
+    assert len(course.list_assignments()) == 4
+    a = course.get_assignment_by_name("Assignment 0", AutograderAssignment)
+    zip_path = tmp_path / "autograder.zip"
+    zip_path.write_bytes(b"PK" + b"\0" * 200_000)
+    a.update_autograder_zip(str(zip_path))
+    assert server.counts["upload_bytes"] > 200_000
+    # a streamed body, read through the adapter's raw stand-in
+    assert len(a.export_scores()) == 4
+    stats = ses.transport.stats()
+    assert stats["new_connections"] >= 1 and stats["reused_connections"] > 0
+    # errors come back as requests' exceptions, so the layers above can tell them apart
+    server.latency = 0.5
+    with pytest.raises(requests.Timeout):
+        ses.req.get(ses.base_url + "/login", timeout=0.1)
+    with pytest.raises(requests.ConnectionError):
+        gradescrape.Session(base_url="http://127.0.0.1:9", transport=HTTP2Adapter(http2=http2)).req.get(
+            "http://127.0.0.1:9/login", timeout=2)
+
+
+def test_idle_connections_are_replaced(server):
+    ses = login(server, transport=TransportAdapter(idle_timeout=0))
+    before = ses.transport.stats()
+    time.sleep(0.01)
+    ses.req.get(ses.base_url + "/login").close()
+    after = ses.transport.stats()
+    assert after["idle_closed"] == before["idle_closed"] + 1
+    assert after["new_connections"] == before["new_connections"] + 1
+
+
+def test_accept_encoding_and_pool_size(server):
+    ses = login(server, transport=TransportAdapter(accept_encoding="identity"))
+    r = ses.req.get(ses.base_url + "/login")
+    assert r.request.headers["Accept-Encoding"] == "identity"
+    # a caller's own header wins
+    assert ses.req.get(ses.base_url + "/login", headers={"Accept-Encoding": "gzip"}).request.headers["Accept-Encoding"] == "gzip"
+    ses.set_pool_size(2)
+    with ThreadPoolExecutor(4) as pool:
+        assert all(r.ok for r in pool.map(lambda _: ses.req.get(ses.base_url + "/login"), range(8)))
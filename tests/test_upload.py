@@ -0,0 +1,85 @@
+import pytest
+import requests
+import gradescrape
+from gradescrape.assignment import PDFAssignment
+from gradescrape.transport import Layer
+from gradescrape.upload import SubmissionUploader
+
+
+class FailFirstUpload(Layer):
+    """Fails the first submission upload: after sending it on (commit=True), or before anything is sent."""
+    def __init__(self, inner, commit: bool, error=None):
+        super().__init__(inner)
+        self.commit = commit
+        self.error = error
+        self.failed = False
+
+    def send(self, request, **kwargs):
+        if self.failed or request.method != "POST" or not request.url.endswith("/submissions"):
+            return self.inner.send(request, **kwargs)
+        self.failed = True
+        if not self.commit:
+            raise requests.ConnectionError("connection refused")
+        r = self.inner.send(request, **kwargs)
+        if self.error is not None:
+            r.close()
+            raise self.error
+        r.status_code = 502
+        return r
+
+
+def assignment(server, layer=None, **kwargs):
+    ses = gradescrape.Session(base_url=server.url, rate_limiter=None)
+    ses.login("user@example.com", "hunter2")
+    if layer is not None:
+        ses.add_layer(layer, **kwargs)
+    return ses.get_course(10).get_assignment_by_name("Assignment 1", PDFAssignment)
+
+
+def pdf(tmp_path, size=200_000):
+    path = tmp_path / "exam.pdf"
+    path.write_bytes(b"%PDF-1.4\n" + b"x" * (size - 9))
+    return str(path)
+
+
+def test_shared_names_must_be_told_apart(server, tmp_path):
+    server.state.students[6998] = ("Student 0", "other0@example.com")
+    up = SubmissionUploader(assignment(server))
+    with pytest.raises(ValueError, match="email or owner id"):
+        up.resolve("Student 0")
+    assert up.resolve("student0@example.com") == 7000
+    assert up.resolve("other0@example.com") == 6998
+    assert up.resolve("Student 1") == 7001
+    report = up.run({"Student 0": pdf(tmp_path)})
+    assert isinstance(report.failed["Student 0"], ValueError)
+    assert server.counts.get("uploads", 0) == 0
+
+
+@pytest.mark.parametrize("error", [None, requests.ConnectionError("connection reset")])
+def test_committed_upload_is_not_sent_twice(server, tmp_path, error):
+    up = SubmissionUploader(assignment(server, FailFirstUpload, commit=True, error=error), backoff_base=0)
+    res = up.upload("student1@example.com", pdf(tmp_path))
+    assert server.counts["uploads"] == 1
+    assert res.attempts == 1 and res.submission_id is not None
+    assert res.submission_id == up.submissions()[7001]
+
+
+def test_upload_that_never_left_is_retried(server, tmp_path):
+    up = SubmissionUploader(assignment(server, FailFirstUpload, commit=False), backoff_base=0)
+    res = up.upload("Student 2", pdf(tmp_path))
+    assert server.counts["uploads"] == 1
+    assert res.attempts == 2 and res.submission_id == up.submissions()[7002]
+
+
+def test_progress_only_goes_forward(server, tmp_path):
+    seen = []
+    up = SubmissionUploader(assignment(server), max_workers=1, progress=lambda sent, total, bps: seen.append((sent, total)))
+    paths = {}
+    for k in range(3):
+        (tmp_path / str(k)).mkdir()
+        paths[f"student{k}@example.com"] = pdf(tmp_path / str(k))
+    report = up.run(paths)
+    assert report.ok and report.uploaded == 3
+    sent = [s for s, _ in seen]
+    assert sent == sorted(sent)
+    assert seen[-1] == (report.bytes, report.bytes)